@@ -48,7 +48,7 @@ def build_dataloader(cfg, dataset_py="lerobot_datasets_oxe"): # TODO now here on
             vla_dataset,
             batch_size=cfg.datasets.vla_data.per_device_batch_size,
             collate_fn=collate_fn,
-            num_workers=8,
+            num_workers=vla_dataset_cfg.get("num_workers", 8),
             # shuffle=True
         )        
         if dist.get_rank() == 0: 
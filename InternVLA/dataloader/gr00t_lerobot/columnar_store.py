@@ -0,0 +1,281 @@
+"""
+Memory-mapped columnar store for the low-dimensional LeRobot columns.
+
+The per-episode parquet files are consolidated into one `.npy` array per column under
+`<dataset>/columnar/`: every numeric column (state / action vectors, timestamp, frame / episode / task indices)
+is concatenated over episodes, floats as float32 and integers as int64 (so that task / frame indices stay exact),
+next to an episode offset table. Non-numeric columns (pickled annotations) are not stored.
+
+Layout:
+    columnar/manifest.json        columns (dtype, per-row shape) and per-episode offset, length, checksum, size, mtime
+    columnar/episode_index.npy    [E] episode ids in store order
+    columnar/episode_offsets.npy  [E + 1] row offsets, episode e is rows offsets[e]:offsets[e + 1]
+    columnar/columns/<column>.npy [N, ...] concatenated column
+
+LeRobotSingleDataset reads trajectories as zero-copy slices of these arrays when the store exists, so all
+dataloader workers share the same page cache instead of each holding decoded copies.
+
+Conversion is incremental: episodes whose parquet checksum did not change are copied from the previous store
+instead of being decoded again.
+
+    python -m InternVLA.dataloader.gr00t_lerobot.columnar_store --dataset_paths playground/demo_data/sim_pick_place
+    python -m InternVLA.dataloader.gr00t_lerobot.columnar_store --data_root_dir playground/demo_data \\
+        --data_mix demo_sim_pick_place
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from tqdm import tqdm
+
+COLUMNAR_STORE_DIRNAME = "columnar"
+COLUMNAR_STORE_FORMAT = 1
+
+
+def trajectory_columns(df: pd.DataFrame) -> dict[str, np.ndarray]:
+    """Decode a trajectory dataframe into column name -> contiguous array.
+    Columns holding one array per row (state / action vectors) are stacked into a (T, D) array once,
+    instead of on every access."""
+    columns = {}
+    for name in df.columns:
+        values = df[name].to_numpy()
+        if values.dtype == object and len(values) > 0 and isinstance(values[0], (np.ndarray, list)):
+            values = np.stack(values)
+        columns[name] = np.ascontiguousarray(values)
+    return columns
+
+
+def episode_checksum(path: Path) -> str:
+    """blake2b of the parquet file content."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _column_dtype(arrow_type: pa.DataType) -> str | None:
+    """Store dtype of a parquet column, None for columns that are not stored."""
+    if pa.types.is_list(arrow_type) or pa.types.is_large_list(arrow_type) or pa.types.is_fixed_size_list(arrow_type):
+        arrow_type = arrow_type.value_type
+    if pa.types.is_floating(arrow_type):
+        return "float32"
+    if pa.types.is_integer(arrow_type) or pa.types.is_boolean(arrow_type):
+        return "int64"
+    return None
+
+
+def _episode_paths(dataset_path: Path) -> list[tuple[int, Path]]:
+    with open(dataset_path / "meta" / "info.json", "r") as f:
+        info = json.load(f)
+    with open(dataset_path / "meta" / "episodes.jsonl", "r") as f:
+        episode_ids = [json.loads(line)["episode_index"] for line in f]
+    return [
+        (
+            episode_id,
+            dataset_path
+            / info["data_path"].format(episode_chunk=episode_id // info["chunks_size"], episode_index=episode_id),
+        )
+        for episode_id in episode_ids
+    ]
+
+
+def _column_schema(parquet_path: Path) -> dict[str, dict]:
+    """column -> {"dtype", "shape"} of the stored columns, per-row shapes read from the first row."""
+    schema = pq.read_schema(parquet_path)
+    dtypes = {field.name: _column_dtype(field.type) for field in schema}
+    dtypes = {name: dtype for name, dtype in dtypes.items() if dtype is not None}
+    first_row = trajectory_columns(pq.read_table(parquet_path, columns=list(dtypes)).slice(0, 1).to_pandas())
+    return {name: {"dtype": dtype, "shape": list(first_row[name].shape[1:])} for name, dtype in dtypes.items()}
+
+
+def build_columnar_store(dataset_path: Path | str, force: bool = False) -> dict:
+    """
+    Convert (or incrementally update) the columnar store of one LeRobot dataset.
+
+    Args:
+        dataset_path: LeRobot dataset root (with meta/ and data/).
+        force: Decode every episode even if its checksum matches the previous store.
+
+    Returns:
+        dict: {"episodes", "rows", "decoded", "reused"} counts.
+    """
+    dataset_path = Path(dataset_path)
+    store_dir = dataset_path / COLUMNAR_STORE_DIRNAME
+    episodes = _episode_paths(dataset_path)
+    assert len(episodes) > 0, f"No episodes listed in {dataset_path / 'meta' / 'episodes.jsonl'}"
+    columns = _column_schema(episodes[0][1])
+
+    previous = None if force else ColumnarStore.open(dataset_path, validate=False)
+    if previous is not None and previous.columns != columns:
+        print(f"Column schema changed, rebuilding {store_dir}")
+        previous = None
+    previous_episodes = previous.episodes if previous is not None else {}
+
+    # offsets from the parquet footers, no decoding needed
+    manifest_episodes = []
+    offset = 0
+    for episode_id, path in episodes:
+        stat = path.stat()
+        length = pq.ParquetFile(path).metadata.num_rows
+        manifest_episodes.append(
+            {
+                "episode_index": episode_id,
+                "offset": offset,
+                "length": length,
+                "checksum": episode_checksum(path),
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+            }
+        )
+        offset += length
+
+    tmp_dir = store_dir.with_name(COLUMNAR_STORE_DIRNAME + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    (tmp_dir / "columns").mkdir(parents=True)
+    arrays = {
+        name: np.lib.format.open_memmap(
+            tmp_dir / "columns" / f"{name}.npy", mode="w+", dtype=spec["dtype"], shape=(offset, *spec["shape"])
+        )
+        for name, spec in columns.items()
+    }
+
+    decoded = reused = 0
+    progress = tqdm(zip(episodes, manifest_episodes), total=len(episodes), desc=f"Converting {dataset_path.name}")
+    for (episode_id, path), entry in progress:
+        rows = slice(entry["offset"], entry["offset"] + entry["length"])
+        old = previous_episodes.get(episode_id)
+        if old is not None and old["checksum"] == entry["checksum"] and old["length"] == entry["length"]:
+            source = previous.trajectory(episode_id)
+            reused += 1
+        else:
+            source = trajectory_columns(pd.read_parquet(path, columns=list(columns)))
+            decoded += 1
+        for name, array in arrays.items():
+            assert source[name].shape[1:] == array.shape[1:], (
+                f"{path}: column {name} has per-row shape {source[name].shape[1:]}, expected {array.shape[1:]}"
+            )
+            array[rows] = source[name]
+    for array in arrays.values():
+        array.flush()
+    del arrays, source
+
+    episode_index = np.array([entry["episode_index"] for entry in manifest_episodes], dtype=np.int64)
+    np.save(tmp_dir / "episode_index.npy", episode_index)
+    np.save(
+        tmp_dir / "episode_offsets.npy",
+        np.array([0] + [entry["offset"] + entry["length"] for entry in manifest_episodes], dtype=np.int64),
+    )
+    with open(tmp_dir / "manifest.json", "w") as f:
+        json.dump({"format": COLUMNAR_STORE_FORMAT, "columns": columns, "episodes": manifest_episodes}, f)
+
+    # swap in the new store; the previous one is only removed once the new one is complete
+    del previous
+    old_dir = store_dir.with_name(COLUMNAR_STORE_DIRNAME + ".old")
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if store_dir.exists():
+        os.replace(store_dir, old_dir)
+    os.replace(tmp_dir, store_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return {"episodes": len(episodes), "rows": offset, "decoded": decoded, "reused": reused}
+
+
+class ColumnarStore:
+    """Read side of the columnar store. Arrays are memory-mapped lazily in each process."""
+
+    def __init__(self, store_dir: Path, manifest: dict, episodes: dict[int, dict]):
+        self.store_dir = store_dir
+        self.columns: dict[str, dict] = manifest["columns"]
+        self.episodes = episodes
+        self._arrays: dict[str, np.ndarray] = {}
+
+    @classmethod
+    def open(cls, dataset_path: Path | str, validate: bool = True) -> "ColumnarStore | None":
+        """
+        Open the store of a dataset, None if there is none.
+
+        Args:
+            dataset_path: LeRobot dataset root.
+            validate: Drop episodes whose parquet file changed (size / mtime) since the conversion,
+                so that they are read from parquet instead.
+        """
+        dataset_path = Path(dataset_path)
+        store_dir = dataset_path / COLUMNAR_STORE_DIRNAME
+        manifest_path = store_dir / "manifest.json"
+        if not manifest_path.exists():
+            return None
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+        if manifest.get("format") != COLUMNAR_STORE_FORMAT:
+            print(f"Ignoring columnar store {store_dir} with format {manifest.get('format')}")
+            return None
+        episodes = {entry["episode_index"]: entry for entry in manifest["episodes"]}
+        if validate:
+            stale = []
+            for episode_id, path in _episode_paths(dataset_path):
+                entry = episodes.get(episode_id)
+                if entry is None:
+                    continue
+                stat = path.stat() if path.exists() else None
+                if stat is None or stat.st_size != entry["size"] or stat.st_mtime_ns != entry["mtime_ns"]:
+                    stale.append(episode_id)
+            if stale:
+                print(
+                    f"{len(stale)} episodes changed since the columnar store of {dataset_path} was built, "
+                    "reading them from parquet"
+                )
+                for episode_id in stale:
+                    episodes.pop(episode_id)
+        return cls(store_dir, manifest, episodes)
+
+    def __contains__(self, episode_id: int) -> bool:
+        return int(episode_id) in self.episodes
+
+    def __getstate__(self):
+        # never pickle the mapped arrays into spawned dataloader workers
+        state = self.__dict__.copy()
+        state["_arrays"] = {}
+        return state
+
+    def array(self, name: str) -> np.ndarray:
+        """Full memory-mapped column [N, ...]."""
+        if name not in self._arrays:
+            self._arrays[name] = np.load(self.store_dir / "columns" / f"{name}.npy", mmap_mode="r")
+        return self._arrays[name]
+
+    def trajectory(self, episode_id: int) -> dict[str, np.ndarray]:
+        """column name -> zero-copy (read-only) slice of one episode."""
+        entry = self.episodes[int(episode_id)]
+        rows = slice(entry["offset"], entry["offset"] + entry["length"])
+        return {name: self.array(name)[rows] for name in self.columns}
+
+
+if __name__ == "__main__":
+    from InternVLA.dataloader.gr00t_lerobot.mixtures import DATASET_NAMED_MIXTURES
+
+    parser = argparse.ArgumentParser(description="Build or update the columnar store of LeRobot datasets")
+    parser.add_argument("--dataset_paths", nargs="*", type=str, default=[])
+    parser.add_argument(
+        "--data_root_dir", type=str, default=None, help="convert every dataset of --data_mix under this root"
+    )
+    parser.add_argument("--data_mix", type=str, default=None)
+    parser.add_argument("--force", action="store_true", help="decode every episode even if unchanged")
+    args = parser.parse_args()
+
+    dataset_paths = list(args.dataset_paths)
+    if args.data_mix is not None:
+        assert args.data_root_dir is not None, "--data_mix needs --data_root_dir"
+        mixture = DATASET_NAMED_MIXTURES[args.data_mix]
+        dataset_paths += sorted({str(Path(args.data_root_dir) / name) for name, _, _ in mixture})
+    assert dataset_paths, "pass --dataset_paths or --data_root_dir with --data_mix"
+    for dataset_path in dataset_paths:
+        summary = build_columnar_store(dataset_path, force=args.force)
+        print(f"{dataset_path}: {json.dumps(summary)}")
@@ -0,0 +1,534 @@
+"""
+Streaming, mergeable statistics of the low-dimensional LeRobot columns (the `meta/stats_gr00t.json` format).
+
+The statistics used to be computed by concatenating every parquet file of a dataset into one DataFrame, which needs
+memory proportional to the dataset. Here every episode is reduced on its own to a mergeable summary per column:
+  - count, mean and sum of squared deviations (merged with Chan's parallel update), min and max: mean / std / min /
+    max as before, up to float rounding
+  - a log-bucketed histogram (DDSketch): its q01 / q99 estimates are within `relative_accuracy` of the exact
+    np.quantile values (|estimate - exact| <= relative_accuracy x |exact|, up to `min_value` around zero); merging two
+    sketches adds their bucket counts, so the result does not depend on how episodes are grouped
+
+That error scales with the magnitude, not with the range the normalizers divide by: a narrow range far from zero
+(e.g. q01..q99 = 2.0..2.0001) can fall in one bucket, making q01 == q99. The reported q01 / q99 are therefore within
+`range_accuracy` x (q99 - q01) of the exact values: the dimensions whose buckets are wider than that get their exact
+quantiles from a second pass over the episodes of their columns (`exact_quantiles`).
+
+Episodes are reduced in parts of up to `part_size` episodes, in parallel processes. The part summaries are
+persisted (`meta/stats_partials.pkl`) together with the size and mtime of their episodes: on the next run only the
+new episodes, and the parts holding a changed or removed episode, are processed again.
+
+    python -m InternVLA.dataloader.gr00t_lerobot.dataset_statistics --dataset_paths playground/demo_data/sim_pick_place
+    python -m InternVLA.dataloader.gr00t_lerobot.dataset_statistics --data_root_dir playground/demo_data \\
+        --data_mix demo_sim_pick_place
+"""
+
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import pickle
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from tqdm import tqdm
+
+from InternVLA.dataloader.gr00t_lerobot.columnar_store import _column_dtype
+
+STATS_PARTIALS_FILENAME = "meta/stats_partials.pkl"
+STATS_PARTIALS_FORMAT = 1
+DEFAULT_RELATIVE_ACCURACY = 0.005
+DEFAULT_RANGE_ACCURACY = 0.01
+DEFAULT_MIN_VALUE = 1e-8
+DEFAULT_MAX_VALUE = 1e12
+DEFAULT_PART_SIZE = 256
+QUANTILES = {"q01": 0.01, "q99": 0.99}
+
+
+class QuantileSketch:
+    """
+    Per-dimension histogram over logarithmic buckets of relative width 2 x relative_accuracy (DDSketch).
+
+    Bucket e holds the magnitudes in (gamma^(e - 1), gamma^e], gamma = (1 + a) / (1 - a), and is represented by
+    2 gamma^e / (gamma + 1), which is within a relative error a of every value of the bucket. Magnitudes below
+    `min_value` fall in a zero bucket, magnitudes above `max_value` in the last bucket. The buckets are dense,
+    ordered from the most negative to the most positive value.
+    """
+
+    def __init__(
+        self,
+        num_dims: int,
+        relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY,
+        min_value: float = DEFAULT_MIN_VALUE,
+        max_value: float = DEFAULT_MAX_VALUE,
+    ):
+        assert 0 < relative_accuracy < 1, f"{relative_accuracy=}"
+        assert 0 < min_value < max_value, f"{min_value=}, {max_value=}"
+        self.num_dims = num_dims
+        self.relative_accuracy, self.min_value, self.max_value = relative_accuracy, min_value, max_value
+        self.log_gamma = math.log((1 + relative_accuracy) / (1 - relative_accuracy))
+        self.min_exponent = math.ceil(math.log(min_value) / self.log_gamma)
+        self.num_buckets = math.ceil(math.log(max_value) / self.log_gamma) - self.min_exponent + 1
+        # [negative buckets (decreasing magnitude), zero, positive buckets (increasing magnitude)]
+        self.counts = np.zeros((num_dims, 2 * self.num_buckets + 1), dtype=np.int64)
+
+    @property
+    def params(self) -> tuple:
+        return (self.num_dims, self.relative_accuracy, self.min_value, self.max_value)
+
+    def _bucket_indices(self, values: np.ndarray) -> np.ndarray:
+        magnitudes = np.abs(values)
+        exponents = np.ceil(np.log(np.maximum(magnitudes, self.min_value)) / self.log_gamma).astype(np.int64)
+        keys = np.clip(exponents - self.min_exponent, 0, self.num_buckets - 1)
+        indices = self.num_buckets + np.where(values > 0, 1 + keys, -1 - keys)
+        indices[magnitudes < self.min_value] = self.num_buckets
+        return indices
+
+    def _bucket_values(self) -> np.ndarray:
+        gamma = math.exp(self.log_gamma)
+        positive = 2 * np.exp((np.arange(self.num_buckets) + self.min_exponent) * self.log_gamma) / (gamma + 1)
+        return np.concatenate([-positive[::-1], [0.0], positive])
+
+    def update(self, values: np.ndarray):
+        """Add the rows of a [N, num_dims] array; non-finite values are skipped."""
+        finite = np.isfinite(values)
+        indices = self._bucket_indices(np.where(finite, values, 0.0))
+        indices += np.arange(self.num_dims) * self.counts.shape[1]
+        self.counts += np.bincount(indices[finite], minlength=self.counts.size).reshape(self.counts.shape)
+
+    def merge(self, other: "QuantileSketch"):
+        assert self.params == other.params, f"Cannot merge sketches {self.params} and {other.params}"
+        self.counts += other.counts
+
+    def _bucket_bounds(self) -> tuple[np.ndarray, np.ndarray]:
+        """Lower / upper bound of the values of every bucket."""
+        exponents = np.arange(self.num_buckets) + self.min_exponent
+        low, high = np.exp((exponents - 1) * self.log_gamma), np.exp(exponents * self.log_gamma)
+        low[0], high[-1] = self.min_value, np.inf
+        lower = np.concatenate([-high[::-1], [-self.min_value], low])
+        upper = np.concatenate([-low[::-1], [self.min_value], high])
+        return lower, upper
+
+    def order_statistic_buckets(self, q: float) -> dict[str, np.ndarray]:
+        """
+        [num_dims] positions of the two order statistics np.quantile(values, q, axis=0) interpolates between: their
+        ranks ("lower", "upper", interpolated at "ranks"), their buckets ("lower_buckets", "upper_buckets") and the
+        cumulative counts of the buckets ("cumulative", [num_dims, buckets]).
+        """
+        cumulative = np.cumsum(self.counts, axis=1)
+        ranks = q * np.maximum(cumulative[:, -1] - 1, 0)
+        lower, upper = np.floor(ranks), np.ceil(ranks)
+        # order statistic r lies in the first bucket whose cumulative count exceeds r
+        last = self.counts.shape[1] - 1
+        lower_buckets = np.minimum((cumulative <= lower[:, None]).sum(axis=1), last)
+        upper_buckets = np.minimum((cumulative <= upper[:, None]).sum(axis=1), last)
+        return {
+            "ranks": ranks,
+            "lower": lower.astype(np.int64),
+            "upper": upper.astype(np.int64),
+            "lower_buckets": lower_buckets,
+            "upper_buckets": upper_buckets,
+            "cumulative": cumulative,
+        }
+
+    def quantile(self, q: float) -> np.ndarray:
+        """[num_dims] estimates of np.quantile(values, q, axis=0) (linear interpolation between order statistics)."""
+        positions = self.order_statistic_buckets(q)
+        bucket_values = self._bucket_values()
+        lower_values, upper_values = bucket_values[positions["lower_buckets"]], bucket_values[positions["upper_buckets"]]
+        estimates = lower_values + (positions["ranks"] - positions["lower"]) * (upper_values - lower_values)
+        return np.where(positions["cumulative"][:, -1] > 0, estimates, np.nan)
+
+    def resolved(self, low_q: float, high_q: float, range_accuracy: float) -> np.ndarray:
+        """
+        [num_dims] mask of the dimensions whose quantile estimates at low_q and high_q are both within
+        range_accuracy x (exact high_q quantile - exact low_q quantile) of the exact values: the buckets of the order
+        statistics are narrower than that (the relative bucket width does not shrink with the range, so a narrow range
+        far from zero is not resolved, and quantiles in the same bucket collapse to the same estimate).
+        """
+        bucket_lower, bucket_upper = self._bucket_bounds()
+        low, high = self.order_statistic_buckets(low_q), self.order_statistic_buckets(high_q)
+        # lower bound of the exact quantile range
+        exact_range = bucket_lower[high["lower_buckets"]] - bucket_upper[low["upper_buckets"]]
+        widths = np.maximum(
+            bucket_upper[low["upper_buckets"]] - bucket_lower[low["lower_buckets"]],
+            bucket_upper[high["upper_buckets"]] - bucket_lower[high["lower_buckets"]],
+        )
+        return (exact_range > 0) & (widths <= range_accuracy * exact_range)
+
+    def __getstate__(self):
+        # persisted sparsely, most buckets are empty
+        state = self.__dict__.copy()
+        nonzero = np.flatnonzero(self.counts)
+        state["counts"] = (self.counts.shape, nonzero, self.counts.ravel()[nonzero])
+        return state
+
+    def __setstate__(self, state):
+        shape, nonzero, counts = state.pop("counts")
+        self.__dict__.update(state)
+        self.counts = np.zeros(shape, dtype=np.int64)
+        self.counts.ravel()[nonzero] = counts
+
+
+class ColumnStatistics:
+    """Mergeable summary of one column: moments, min / max and a QuantileSketch per dimension."""
+
+    def __init__(self, num_dims: int, **sketch_kwargs):
+        self.count = 0
+        self.mean = np.zeros(num_dims, dtype=np.float64)
+        self.m2 = np.zeros(num_dims, dtype=np.float64)
+        self.min = np.full(num_dims, np.inf)
+        self.max = np.full(num_dims, -np.inf)
+        self.sketch = QuantileSketch(num_dims, **sketch_kwargs)
+
+    def _merge_moments(self, count: int, mean: np.ndarray, m2: np.ndarray, minimum: np.ndarray, maximum: np.ndarray):
+        if count == 0:
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean = self.mean + delta * (count / total)
+        self.m2 = self.m2 + m2 + delta**2 * (self.count * count / total)
+        self.min, self.max = np.minimum(self.min, minimum), np.maximum(self.max, maximum)
+        self.count = total
+
+    def update(self, values: np.ndarray):
+        """Add the rows of a [N, num_dims] array."""
+        if len(values) == 0:
+            return
+        mean = values.mean(axis=0)
+        m2 = ((values - mean) ** 2).sum(axis=0)
+        self._merge_moments(len(values), mean, m2, values.min(axis=0), values.max(axis=0))
+        self.sketch.update(values)
+
+    def merge(self, other: "ColumnStatistics"):
+        self._merge_moments(other.count, other.mean, other.m2, other.min, other.max)
+        self.sketch.merge(other.sketch)
+
+    def to_dict(self) -> dict:
+        """Entry of `stats_gr00t.json`: mean, std, min, max, q01, q99."""
+        statistics = {
+            "mean": self.mean,
+            "std": np.sqrt(self.m2 / max(self.count, 1)),
+            "min": self.min,
+            "max": self.max,
+        }
+        statistics.update({name: self.sketch.quantile(q) for name, q in QUANTILES.items()})
+        return {name: value.tolist() for name, value in statistics.items()}
+
+
+def merge_statistics(summaries: list[dict[str, ColumnStatistics]]) -> dict[str, ColumnStatistics]:
+    """Merge column summaries (of episodes or parts); columns keep their first-seen order."""
+    merged = {}
+    for summary in summaries:
+        for name, column in summary.items():
+            if name not in merged:
+                merged[name] = ColumnStatistics(column.sketch.num_dims, **_sketch_kwargs(column.sketch))
+            merged[name].merge(column)
+    return merged
+
+
+def _sketch_kwargs(sketch: QuantileSketch) -> dict:
+    return {"relative_accuracy": sketch.relative_accuracy, "min_value": sketch.min_value, "max_value": sketch.max_value}
+
+
+def episode_columns(parquet_path: Path, columns: list[str] | None = None) -> dict[str, np.ndarray]:
+    """[N, D] float64 arrays of the numeric, non-annotation columns of one parquet episode (cast to float32 first,
+    as the statistics always were), or of `columns` only."""
+    parquet_file = pq.ParquetFile(parquet_path)
+    names = [
+        field.name
+        for field in parquet_file.schema_arrow
+        if not field.name.startswith("annotation.")
+        and _column_dtype(field.type) is not None
+        and (columns is None or field.name in columns)
+    ]
+    table = parquet_file.read(columns=names)
+    columns = {}
+    for name in names:
+        column = table.column(name).combine_chunks()
+        # list columns (state / action vectors) hold the same number of values per row
+        if (
+            pa.types.is_list(column.type)
+            or pa.types.is_large_list(column.type)
+            or pa.types.is_fixed_size_list(column.type)
+        ):
+            flat = column.flatten()
+        else:
+            flat = column
+        values = np.asarray(flat.to_numpy(zero_copy_only=False), dtype=np.float32).astype(np.float64)
+        columns[name] = values.reshape(len(column), -1)
+    return columns
+
+
+def _part_statistics(task: tuple[list[Path], dict]) -> dict[str, ColumnStatistics]:
+    parquet_paths, sketch_kwargs = task
+    summaries = {}
+    for path in parquet_paths:
+        for name, values in episode_columns(path).items():
+            if name not in summaries:
+                summaries[name] = ColumnStatistics(values.shape[1], **sketch_kwargs)
+            summaries[name].update(values)
+    return summaries
+
+
+def _map_parts(fn, tasks: list, num_processes: int | None, desc: str) -> list:
+    """fn over the part tasks, in parallel processes (default: available CPUs per local rank)."""
+    if num_processes is None:
+        num_processes = len(os.sched_getaffinity(0)) // int(os.environ.get("LOCAL_WORLD_SIZE", 1))
+    num_processes = max(1, min(num_processes, len(tasks)))
+    progress = dict(total=len(tasks), desc=f"{desc} ({num_processes} processes)")
+    if num_processes > 1:
+        with multiprocessing.get_context("fork").Pool(num_processes) as pool:
+            return list(tqdm(pool.imap(fn, tasks), **progress))
+    return [fn(task) for task in tqdm(tasks, **progress)]
+
+
+def _episode_signature(path: Path) -> tuple[int, int]:
+    stat = path.stat()
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+def _load_partials(partials_path: Path, sketch_kwargs: dict) -> list[dict]:
+    try:
+        with open(partials_path, "rb") as f:
+            partials = pickle.load(f)
+    except (FileNotFoundError, EOFError, pickle.UnpicklingError, AttributeError) as e:
+        if not isinstance(e, FileNotFoundError):
+            print(f"Ignoring unreadable partial statistics {partials_path}: {e}")
+        return []
+    if partials.get("format") != STATS_PARTIALS_FORMAT or partials.get("sketch") != sketch_kwargs:
+        print(f"Partial statistics {partials_path} were computed with other settings, recomputing")
+        return []
+    return partials["parts"]
+
+
+def update_partials(
+    parquet_paths: list[Path],
+    partials_path: Path | None = None,
+    relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY,
+    min_value: float = DEFAULT_MIN_VALUE,
+    max_value: float = DEFAULT_MAX_VALUE,
+    num_processes: int | None = None,
+    part_size: int = DEFAULT_PART_SIZE,
+) -> tuple[list[dict], dict]:
+    """
+    Part summaries covering `parquet_paths`, reusing the parts persisted in `partials_path` whose episodes are all
+    unchanged, and saving the updated parts there.
+
+    Args:
+        parquet_paths: Episode parquet files of the dataset.
+        partials_path: Persisted part summaries (None: compute everything, persist nothing).
+        relative_accuracy / min_value / max_value: QuantileSketch settings; persisted parts with other settings are
+            recomputed.
+        num_processes: Processes reducing parts in parallel (default: available CPUs per local rank).
+        part_size: Episodes per part.
+
+    Returns:
+        (parts, summary): parts as {"episodes": {key: (size, mtime_ns)}, "columns": {column: ColumnStatistics}},
+        summary as {"episodes", "processed", "reused", "parts"} counts.
+    """
+    sketch_kwargs = {"relative_accuracy": relative_accuracy, "min_value": min_value, "max_value": max_value}
+    root = Path(partials_path).parent if partials_path is not None else None
+    episodes = {
+        (os.path.relpath(path, root) if root is not None else str(path)): Path(path) for path in sorted(parquet_paths)
+    }
+    signatures = {key: _episode_signature(path) for key, path in episodes.items()}
+
+    persisted_parts = _load_partials(Path(partials_path), sketch_kwargs) if partials_path is not None else []
+    reused_parts = []
+    for part in persisted_parts:
+        if all(signatures.get(key) == tuple(signature) for key, signature in part["episodes"].items()):
+            reused_parts.append(part)
+    covered = {key for part in reused_parts for key in part["episodes"]}
+    pending = [key for key in episodes if key not in covered]
+
+    chunks = [pending[i : i + part_size] for i in range(0, len(pending), part_size)]
+    tasks = [([episodes[key] for key in chunk], sketch_kwargs) for chunk in chunks]
+    columns = _map_parts(_part_statistics, tasks, num_processes, f"Computing statistics of {len(pending)} episodes")
+    new_parts = [
+        {"episodes": {key: signatures[key] for key in chunk}, "columns": part_columns}
+        for chunk, part_columns in zip(chunks, columns)
+    ]
+
+    parts = reused_parts + new_parts
+    if partials_path is not None and (new_parts or len(reused_parts) != len(persisted_parts)):
+        tmp_path = Path(f"{partials_path}.tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"format": STATS_PARTIALS_FORMAT, "sketch": sketch_kwargs, "parts": parts}, f)
+        os.replace(tmp_path, partials_path)
+    summary = {"episodes": len(episodes), "processed": len(pending), "reused": len(covered), "parts": len(parts)}
+    return parts, summary
+
+
+def _keep_order_statistics(values: np.ndarray, keep: int, from_top: bool) -> np.ndarray:
+    """The `keep` smallest (or largest, from_top) of the values, unordered."""
+    if len(values) <= keep:
+        return values
+    if from_top:
+        return np.partition(values, len(values) - keep)[len(values) - keep :]
+    return np.partition(values, keep - 1)[:keep]
+
+
+def _part_order_statistics(task: tuple[list[Path], dict, dict]) -> dict:
+    parquet_paths, plans, sketch_kwargs = task
+    sketch = QuantileSketch(1, **sketch_kwargs)
+    kept = {
+        name: {key: [[] for _ in plan["dims"]] for key, plan in plan_set.items()} for name, plan_set in plans.items()
+    }
+    for path in parquet_paths:
+        for name, values in episode_columns(path, list(plans)).items():
+            for key, plan in plans[name].items():
+                values_of_dims = values[:, plan["dims"]]
+                finite = np.isfinite(values_of_dims)
+                indices = sketch._bucket_indices(np.where(finite, values_of_dims, 0.0))
+                selected = finite & (indices >= plan["first_buckets"]) & (indices <= plan["last_buckets"])
+                for j, dim_values in enumerate(kept[name][key]):
+                    dim_values.append(values_of_dims[selected[:, j], j])
+                    # bounded memory: trim to the kept order statistics once twice as many values are held
+                    if sum(map(len, dim_values)) > 2 * plan["keep"][j]:
+                        merged = np.concatenate(dim_values)
+                        dim_values[:] = [_keep_order_statistics(merged, plan["keep"][j], plan["from_top"][j])]
+    return {
+        name: {
+            key: [
+                _keep_order_statistics(np.concatenate(dim_values), plan["keep"][j], plan["from_top"][j])
+                for j, dim_values in enumerate(kept[name][key])
+            ]
+            for key, plan in plans[name].items()
+        }
+        for name in plans
+    }
+
+
+def exact_quantiles(
+    columns: dict[str, ColumnStatistics],
+    parquet_paths: list[Path],
+    range_accuracy: float = DEFAULT_RANGE_ACCURACY,
+    num_processes: int | None = None,
+    part_size: int = DEFAULT_PART_SIZE,
+) -> dict[str, dict[str, tuple[np.ndarray, np.ndarray]]]:
+    """
+    Exact q01 / q99 of the dimensions whose sketch estimates are not within range_accuracy x (q99 - q01) of the
+    exact values (`QuantileSketch.resolved`), from a second pass over the episodes of those columns. Per dimension
+    and quantile, only the values of the buckets holding the two order statistics are kept, and of those only the
+    ones on the near side of the quantile (about 1% of the values for q01 / q99).
+
+    Args:
+        columns: Merged column summaries of `parquet_paths`.
+        parquet_paths: Episode parquet files of the dataset.
+        range_accuracy: Tolerance of the sketch estimates, relative to q99 - q01.
+        num_processes / part_size: As in `update_partials`.
+
+    Returns:
+        column -> quantile name -> ([K] dimensions, [K] exact quantiles), for the columns with unresolved dimensions.
+    """
+    low_q, high_q = min(QUANTILES.values()), max(QUANTILES.values())
+    plans = {}
+    for name, column in columns.items():
+        unresolved = ~column.sketch.resolved(low_q, high_q, range_accuracy) & (column.count > 0)
+        if not unresolved.any():
+            continue
+        dims = np.flatnonzero(unresolved)
+        plans[name] = {}
+        for key, q in QUANTILES.items():
+            positions = {k: v[dims] for k, v in column.sketch.order_statistic_buckets(q).items()}
+            first, last, cumulative = positions["lower_buckets"], positions["upper_buckets"], positions["cumulative"]
+            rows = np.arange(len(dims))
+            below = np.where(first > 0, cumulative[rows, first - 1], 0)
+            in_buckets = cumulative[rows, last] - below
+            # positions of the order statistics among the sorted values of their buckets
+            lower, upper = positions["lower"] - below, positions["upper"] - below
+            from_top = in_buckets - lower < upper + 1
+            plans[name][key] = {
+                "dims": dims,
+                "first_buckets": first,
+                "last_buckets": last,
+                "ranks": positions["ranks"] - below,
+                "lower": lower,
+                "upper": upper,
+                "keep": np.where(from_top, in_buckets - lower, upper + 1),
+                "from_top": from_top,
+            }
+    if not plans:
+        return {}
+
+    paths = sorted(parquet_paths)
+    sketch_kwargs = _sketch_kwargs(next(iter(columns.values())).sketch)
+    tasks = [(paths[i : i + part_size], plans, sketch_kwargs) for i in range(0, len(paths), part_size)]
+    num_dims = sum(len(next(iter(plan_set.values()))["dims"]) for plan_set in plans.values())
+    results = _map_parts(_part_order_statistics, tasks, num_processes, f"Exact quantiles of {num_dims} dimensions")
+
+    quantiles = {}
+    for name, plan_set in plans.items():
+        quantiles[name] = {}
+        for key, plan in plan_set.items():
+            values = np.empty(len(plan["dims"]))
+            for j in range(len(plan["dims"])):
+                keep, from_top = plan["keep"][j], plan["from_top"][j]
+                merged = np.concatenate([result[name][key][j] for result in results])
+                kept = np.sort(_keep_order_statistics(merged, keep, from_top))
+                assert len(kept) == keep, f"{name}: episodes changed between the two passes"
+                # the largest `keep` values of the buckets start at the lower order statistic
+                offset = plan["lower"][j] if from_top else 0
+                lower, upper = kept[plan["lower"][j] - offset], kept[plan["upper"][j] - offset]
+                values[j] = lower + (plan["ranks"][j] - plan["lower"][j]) * (upper - lower)
+            quantiles[name][key] = (plan["dims"], values)
+    return quantiles
+
+
+def compute_statistics(
+    parquet_paths: list[Path],
+    partials_path: Path | None = None,
+    range_accuracy: float = DEFAULT_RANGE_ACCURACY,
+    **kwargs,
+) -> dict:
+    """
+    `stats_gr00t.json` content of a set of parquet episodes (see `update_partials` for the arguments), with q01 / q99
+    within range_accuracy x (q99 - q01) of the exact values (see `exact_quantiles`).
+    """
+    parts, _ = update_partials(parquet_paths, partials_path, **kwargs)
+    merged = merge_statistics([part["columns"] for part in parts])
+    statistics = {name: column.to_dict() for name, column in merged.items()}
+    num_processes, part_size = kwargs.get("num_processes"), kwargs.get("part_size", DEFAULT_PART_SIZE)
+    for name, quantiles in exact_quantiles(merged, parquet_paths, range_accuracy, num_processes, part_size).items():
+        for key, (dims, values) in quantiles.items():
+            for dim, value in zip(dims.tolist(), values.tolist()):
+                statistics[name][key][dim] = value
+    return statistics
+
+
+if __name__ == "__main__":
+    from InternVLA.dataloader.gr00t_lerobot.datasets import LE_ROBOT_DATA_FILENAME, LE_ROBOT_STATS_FILENAME
+    from InternVLA.dataloader.gr00t_lerobot.mixtures import DATASET_NAMED_MIXTURES
+
+    parser = argparse.ArgumentParser(description="Compute or update meta/stats_gr00t.json of LeRobot datasets")
+    parser.add_argument("--dataset_paths", nargs="*", type=str, default=[])
+    parser.add_argument(
+        "--data_root_dir", type=str, default=None, help="update every dataset of --data_mix under this root"
+    )
+    parser.add_argument("--data_mix", type=str, default=None)
+    parser.add_argument("--relative_accuracy", type=float, default=DEFAULT_RELATIVE_ACCURACY)
+    parser.add_argument("--range_accuracy", type=float, default=DEFAULT_RANGE_ACCURACY)
+    parser.add_argument("--num_processes", type=int, default=None)
+    args = parser.parse_args()
+
+    dataset_paths = list(args.dataset_paths)
+    if args.data_mix is not None:
+        assert args.data_root_dir is not None, "--data_mix needs --data_root_dir"
+        mixture = DATASET_NAMED_MIXTURES[args.data_mix]
+        dataset_paths += sorted({str(Path(args.data_root_dir) / name) for name, _, _ in mixture})
+    assert dataset_paths, "pass --dataset_paths or --data_root_dir with --data_mix"
+    for dataset_path in map(Path, dataset_paths):
+        statistics = compute_statistics(
+            list(dataset_path.glob(LE_ROBOT_DATA_FILENAME)),
+            dataset_path / STATS_PARTIALS_FILENAME,
+            relative_accuracy=args.relative_accuracy,
+            range_accuracy=args.range_accuracy,
+            num_processes=args.num_processes,
+        )
+        with open(dataset_path / LE_ROBOT_STATS_FILENAME, "w") as f:
+            json.dump(statistics, f, indent=4)
+        print(f"{dataset_path}: statistics of {len(statistics)} columns written to {LE_ROBOT_STATS_FILENAME}")
@@ -26,18 +26,26 @@ See `scripts/load_dataset.py` for examples on how to use these datasets.
 
 import hashlib
 import json
-from collections import defaultdict
+import multiprocessing
+import os
+from collections import OrderedDict, defaultdict
 from pathlib import Path
 from typing import Sequence
 
 import numpy as np
 import pandas as pd
+import pyarrow.parquet as pq
 from pydantic import BaseModel, Field, ValidationError
 from torch.utils.data import Dataset
 from tqdm import tqdm
 from PIL import Image
 
 from InternVLA.dataloader.gr00t_lerobot.video import get_all_frames, get_frames_by_timestamps
+from InternVLA.dataloader.gr00t_lerobot.columnar_store import ColumnarStore, trajectory_columns
+from InternVLA.dataloader.gr00t_lerobot.dataset_statistics import STATS_PARTIALS_FILENAME, compute_statistics
+from InternVLA.dataloader.gr00t_lerobot.frame_store import FrameStore
+from InternVLA.dataloader.gr00t_lerobot.mixture_sampler import MixtureSampler, TrajectoryBlockSampler
+from InternVLA.dataloader.gr00t_lerobot.step_index import StepIndex, TrajectoryPositions
 
 from InternVLA.dataloader.gr00t_lerobot.embodiment_tags import EmbodimentTag
 from InternVLA.dataloader.gr00t_lerobot.schema import (
@@ -46,7 +54,12 @@ from InternVLA.dataloader.gr00t_lerobot.schema import (
     LeRobotModalityMetadata,
     LeRobotStateActionMetadata,
 )
-from InternVLA.dataloader.gr00t_lerobot.transform import ComposedModalityTransform
+from InternVLA.dataloader.gr00t_lerobot.transform import (
+    ComposedModalityTransform,
+    VideoCrop,
+    VideoRandomRotation,
+    VideoResize,
+)
 
 from functools import partial
 from typing import Tuple, List
@@ -60,40 +73,113 @@ LE_ROBOT_STATS_FILENAME = "meta/stats_gr00t.json"
 LE_ROBOT_DATA_FILENAME = "data/*/*.parquet"
 LE_ROBOT_STEPS_FILENAME = "meta/steps.pkl"
 EPSILON = 5e-4
+STEPS_INDEX_MAX_PROCESSES = 16
+STEPS_INDEX_MIN_TRAJECTORIES_PER_PROCESS = 64
+# video transforms that resample the frames (the frame store only holds frames resized once)
+VIDEO_RESAMPLING_TRANSFORMS = (VideoCrop, VideoRandomRotation, VideoResize)
+MERGED_METADATA_CACHE_FORMAT = 1
 
-def calculate_dataset_statistics(parquet_paths: list[Path]) -> dict:
-    """Calculate the dataset statistics of all columns for a list of parquet files."""
-    # Dataset statistics
-    all_low_dim_data_list = []
-    # Collect all the data
-    # parquet_paths = parquet_paths[:3]
-    for parquet_path in tqdm(
-        sorted(list(parquet_paths)),
-        desc="Collecting all parquet files...",
-    ):
-        # Load the parquet file
-        parquet_data = pd.read_parquet(parquet_path)
-        parquet_data = parquet_data
-        all_low_dim_data_list.append(parquet_data)
-    all_low_dim_data = pd.concat(all_low_dim_data_list, axis=0)
-    # Compute dataset statistics
-    dataset_statistics = {}
-    for le_modality in all_low_dim_data.columns:
-        if le_modality.startswith("annotation."):
-            continue
-        print(f"Computing statistics for {le_modality}...")
-        np_data = np.vstack(
-            [np.asarray(x, dtype=np.float32) for x in all_low_dim_data[le_modality]]
+
+def get_moving_base_indices(
+    delta_position_values: np.ndarray, gripper_values: np.ndarray, trajectory_length: int
+) -> np.ndarray:
+    """
+    Base indices of the steps that are not pauses: some |delta position| coordinate above EPSILON, or a gripper
+    value different from the previous step's. Only the first min(trajectory_length, len(values)) steps are considered.
+    """
+    # compare in float64, like the Python floats of the former per-step loop
+    delta_position_values = np.asarray(delta_position_values, dtype=np.float64)
+    gripper_values = np.asarray(gripper_values)
+    length = min(trajectory_length, len(delta_position_values), len(gripper_values))
+    if length == 0:
+        return np.zeros(0, dtype=np.int32)
+    has_translation_change = np.any(np.abs(delta_position_values[:length].reshape(length, -1)) > EPSILON, axis=1)
+    gripper_values = gripper_values[:length]
+    gripper_rows = gripper_values.reshape(length, -1)
+    has_gripper_change = np.zeros(length, dtype=bool)
+    if gripper_values.ndim == 1:
+        # the first step is compared with itself: only a NaN value differs (a row holding NaN does not)
+        has_gripper_change[0] = gripper_values[0] != gripper_values[0]
+    has_gripper_change[1:] = np.any(gripper_rows[1:] != gripper_rows[:-1], axis=1)
+    return np.flatnonzero(has_translation_change | has_gripper_change).astype(np.int32)
+
+
+_steps_worker_dataset = None
+
+
+def _init_steps_worker(dataset):
+    global _steps_worker_dataset
+    _steps_worker_dataset = dataset
+
+
+def _get_chunk_base_indices(positions: np.ndarray) -> list[tuple[int, np.ndarray | None]]:
+    """(trajectory id, kept base indices or None) of the trajectories at `positions`, in a steps-index process."""
+    dataset = _steps_worker_dataset
+    return [
+        (
+            int(dataset.trajectory_ids[position]),
+            dataset._get_trajectory_base_indices(dataset.trajectory_ids[position], dataset.trajectory_lengths[position]),
         )
-        dataset_statistics[le_modality] = {
-            "mean": np.mean(np_data, axis=0).tolist(),
-            "std": np.std(np_data, axis=0).tolist(),
-            "min": np.min(np_data, axis=0).tolist(),
-            "max": np.max(np_data, axis=0).tolist(),
-            "q01": np.quantile(np_data, 0.01, axis=0).tolist(),
-            "q99": np.quantile(np_data, 0.99, axis=0).tolist(),
+        for position in positions
+    ]
+
+
+class TrajectoryCache:
+    """LRU of decoded trajectories, bounded by the bytes of their arrays.
+
+    Every dataloader worker holds its own copy of the dataset, so the cache (and its counters) are per worker.
+    A budget of 0 disables caching.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[int, dict[str, np.ndarray]] = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, trajectory_id: int) -> dict[str, np.ndarray] | None:
+        columns = self._entries.get(trajectory_id)
+        if columns is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(trajectory_id)
+        self.hits += 1
+        return columns
+
+    def put(self, trajectory_id: int, columns: dict[str, np.ndarray]) -> None:
+        size = sum(values.nbytes for values in columns.values())
+        if size > self.max_bytes or trajectory_id in self._entries:
+            return
+        while self.nbytes + size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.nbytes -= sum(values.nbytes for values in evicted.values())
+        self._entries[trajectory_id] = columns
+        self.nbytes += size
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "nbytes": self.nbytes,
         }
-    return dataset_statistics
+
+def calculate_dataset_statistics(parquet_paths: list[Path], partials_path: Path | None = None) -> dict:
+    """
+    Calculate the dataset statistics of all columns for a list of parquet files, episode by episode with mergeable
+    summaries (see `dataset_statistics.py`). With `partials_path`, only the episodes that are not covered by the
+    persisted partial statistics are read.
+    """
+    return compute_statistics(parquet_paths, partials_path)
 
 
 class ModalityConfig(BaseModel):
@@ -118,6 +204,10 @@ class LeRobotSingleDataset(Dataset):
         video_backend_kwargs: dict | None = None,
         transforms: ComposedModalityTransform | None = None,
         delete_pause_frame: bool = False,
+        trajectory_cache_mb: float = 64,
+        use_columnar_store: bool = True,
+        video_reader_pool_size: int = 8,
+        use_frame_store: bool = False,
     ):
         """
         Initialize the dataset.
@@ -130,6 +220,16 @@ class LeRobotSingleDataset(Dataset):
             video_backend_kwargs (dict): Keyword arguments for the video backend when initializing the video reader.
             transforms (ComposedModalityTransform): The transforms to apply to the dataset.
             embodiment_tag (EmbodimentTag): Overload the embodiment tag for the dataset. e.g. define it as "new_embodiment"
+            trajectory_cache_mb (float): Per-worker budget of the decoded trajectory LRU (0 re-reads the parquet file
+                on every sample).
+            use_columnar_store (bool): Read low-dimensional columns from the memory-mapped store under
+                `<dataset>/columnar` when it exists (see `columnar_store.py`), instead of the parquet files.
+            video_reader_pool_size (int): Video readers kept open per worker across samples (0 re-opens the video on
+                every sample).
+            use_frame_store (bool): Read video frames from the pre-resized store under `<dataset>/frames` for the
+                cameras it fully covers (see `frame_store.py`), instead of decoding the mp4 files. Cameras whose
+                video transforms crop, rotate or resize to another resolution before resizing to the stored one
+                are still decoded, since they need the full-resolution frames.
         """
         # first check if the path directory exists
         if not Path(dataset_path).exists():
@@ -140,6 +240,7 @@ class LeRobotSingleDataset(Dataset):
         self.modality_configs = modality_configs
         self.video_backend = video_backend
         self.video_backend_kwargs = video_backend_kwargs if video_backend_kwargs is not None else {}
+        self.video_reader_pool_size = video_reader_pool_size
         self.transforms = (
             transforms if transforms is not None else ComposedModalityTransform(transforms=[])
         )
@@ -162,11 +263,19 @@ class LeRobotSingleDataset(Dataset):
         self._tasks = self._get_tasks()
         self.curr_traj_data = None
         self.curr_traj_id = None
+        self._trajectory_cache = TrajectoryCache(int(trajectory_cache_mb * 1024**2))
 
         self._trajectory_ids, self._trajectory_lengths = self._get_trajectories()
+        self._trajectory_positions = TrajectoryPositions(self._trajectory_ids)
         self._modality_keys = self._get_modality_keys()
         self._delta_indices = self._get_delta_indices()
+        self._columnar_store = self._get_columnar_store() if use_columnar_store else None
+        self._frame_store, self._frame_store_keys = self._get_frame_store() if use_frame_store else (None, set())
         self._all_steps = self._get_all_steps()
+        # start the workers from an empty cache (and counters) instead of the step-index scan
+        self._trajectory_cache.clear()
+        self.curr_traj_data = None
+        self.curr_traj_id = None
         self.set_transforms_metadata(self.metadata)
         self.set_epoch(0)
 
@@ -199,8 +308,9 @@ class LeRobotSingleDataset(Dataset):
         return self._trajectory_lengths
 
     @property
-    def all_steps(self) -> list[tuple[int, int]]:
-        """The trajectory IDs and base indices for all steps in the dataset.
+    def all_steps(self) -> StepIndex:
+        """The trajectory IDs and base indices for all steps in the dataset, indexable as (trajectory_id, base_index)
+        tuples.
         Example:
             self.trajectory_ids: [0, 1, 2]
             self.trajectory_lengths: [3, 2, 4]
@@ -344,7 +454,7 @@ class LeRobotSingleDataset(Dataset):
             print(f"Calculating dataset statistics for {self.dataset_name}")
             # Get all parquet files in the dataset paths
             parquet_files = list((self.dataset_path).glob(LE_ROBOT_DATA_FILENAME))
-            le_statistics = calculate_dataset_statistics(parquet_files)
+            le_statistics = calculate_dataset_statistics(parquet_files, self.dataset_path / STATS_PARTIALS_FILENAME)
             with open(stats_path, "w") as f:
                 json.dump(le_statistics, f, indent=4)
         dataset_statistics = {}
@@ -385,60 +495,121 @@ class LeRobotSingleDataset(Dataset):
             trajectory_lengths.append(episode["length"])
         return np.array(trajectory_ids), np.array(trajectory_lengths)
 
-    def _get_all_steps(self) -> list[tuple[int, int]]:
+    def _get_all_steps(self) -> StepIndex:
         """Get the trajectory IDs and base indices for all steps in the dataset.
 
+        The index is cached as `meta/steps_<config_key>_{trajectory_ids,base_indices}.npy` and memory-mapped on load;
+        a `meta/steps_<config_key>.pkl` tuple list from older versions is converted once.
+
         Returns:
-            list[tuple[str, int]]: A list of (trajectory_id, base_index) tuples.
+            StepIndex: (trajectory_id, base_index) of every step, as two flat arrays.
         """
         # Create a hash key based on configuration to ensure cache validity
         config_key = self._get_steps_config_key()
-        
-        # Create a unique filename based on config_key
-        steps_filename = f"steps_{config_key}.pkl"
-        steps_path = self.dataset_path / "meta" / steps_filename
-        
+        steps_prefix = self.dataset_path / "meta" / f"steps_{config_key}"
+
         # Try to load cached steps first
+        all_steps = None
         try:
-            if steps_path.exists():
-                with open(steps_path, "rb") as f:
-                    cached_data = pickle.load(f)
-                
-                # Verify the cached data matches current configuration
-                if cached_data.get("config_key") == config_key:
-                    print(f"Loading cached steps from {steps_path}")
-                    return cached_data["steps"]
-                else:
-                    print("Cached steps configuration mismatch, recomputing...")
-        except (FileNotFoundError, pickle.PickleError, KeyError) as e:
+            all_steps = StepIndex.load(steps_prefix)
+            if all_steps is not None:
+                print(f"Loading cached steps from {steps_prefix}_*.npy")
+                return all_steps
+            all_steps = StepIndex.load_legacy(self.dataset_path / "meta" / f"steps_{config_key}.pkl", config_key)
+            if all_steps is not None:
+                print(f"Converting cached steps {steps_prefix}.pkl to arrays")
+        except (OSError, ValueError, pickle.PickleError, KeyError) as e:
             print(f"Failed to load cached steps: {e}")
             print("Computing steps from scratch...")
 
-        # Compute steps using single process
-        all_steps = self._get_all_steps_single_process()
-        
+        if all_steps is None:
+            # ranks of a node build their indices at the same time
+            num_processes = min(
+                STEPS_INDEX_MAX_PROCESSES,
+                len(os.sched_getaffinity(0)) // int(os.environ.get("LOCAL_WORLD_SIZE", 1)),
+            )
+            min_trajectories = STEPS_INDEX_MIN_TRAJECTORIES_PER_PROCESS * num_processes
+            if num_processes > 1 and len(self.trajectory_ids) >= min_trajectories:
+                all_steps = self._get_all_steps_multi_process(num_processes)
+            else:
+                all_steps = self._get_all_steps_single_process()
+
         # Cache the computed steps with unique filename
         try:
-            cache_data = {
-                "config_key": config_key,
-                "steps": all_steps,
-                "num_trajectories": len(self.trajectory_ids),
-                "total_steps": len(all_steps),
-                "computed_timestamp": pd.Timestamp.now().isoformat(),
-                "delete_pause_frame": self.delete_pause_frame,
-            }
-            
-            # Ensure the meta directory exists
-            steps_path.parent.mkdir(parents=True, exist_ok=True)
-            
-            with open(steps_path, "wb") as f:
-                pickle.dump(cache_data, f, protocol=pickle.HIGHEST_PROTOCOL)
-            print(f"Cached steps saved to {steps_path}")
+            steps_prefix.parent.mkdir(parents=True, exist_ok=True)
+            all_steps.save(steps_prefix)
+            print(f"Cached steps saved to {steps_prefix}_*.npy")
+            # map the saved files so that dataloader workers share the pages
+            all_steps = StepIndex.load(steps_prefix) or all_steps
         except Exception as e:
             print(f"Failed to cache steps: {e}")
-        
+
         return all_steps
 
+    def _get_columnar_store(self) -> ColumnarStore | None:
+        """Open the columnar store if it exists and holds every column this dataset reads."""
+        store = ColumnarStore.open(self.dataset_path)
+        if store is None:
+            return None
+        required = {"timestamp"} if self.modality_keys.get("video") else set()
+        for modality in ["state", "action"]:
+            le_meta = getattr(self.lerobot_modality_meta, modality)
+            for key in self.modality_keys.get(modality, []):
+                subkey = key.replace(modality + ".", "")
+                required.add(le_meta[subkey].original_key or subkey)
+        for key in self.modality_keys.get("language", []):
+            subkey = key.replace("annotation.", "")
+            required.add(self.lerobot_modality_meta.annotation[subkey].original_key or key)
+        missing = required - set(store.columns)
+        if missing:
+            print(f"Columnar store of {self.dataset_name} lacks {sorted(missing)}, reading parquet files")
+            return None
+        print(f"Reading low-dimensional data of {self.dataset_name} from {store.store_dir}")
+        return store
+
+    def _resamples_before_store_resolution(self, key: str, height: int, width: int) -> bool:
+        """Whether the video transforms of `key` resample its frames before resizing them to (height, width).
+        Those frames would be resampled a second time from the stored ones instead of from the mp4 ones."""
+        for transform in self.transforms.transforms:
+            if not isinstance(transform, VIDEO_RESAMPLING_TRANSFORMS) or key not in transform.apply_to:
+                continue
+            # the first resampling transform must be the resize to the stored resolution
+            return not (
+                isinstance(transform, VideoResize) and (transform.height, transform.width) == (height, width)
+            )
+        return False
+
+    def _get_frame_store(self) -> tuple[FrameStore | None, set[str]]:
+        """Open the frame store if it exists, with the video keys whose every trajectory it holds and whose
+        transforms start by resizing to the stored resolution.
+        The metadata resolution of those keys becomes the stored one, so that video transforms see the stored frames."""
+        store = FrameStore.open(self.dataset_path)
+        if store is None or not self.modality_keys.get("video"):
+            return None, set()
+        keys = set()
+        for key in self.modality_keys["video"]:
+            subkey = key.replace("video.", "")
+            original_key = self.lerobot_modality_meta.video[subkey].original_key or subkey
+            if self._resamples_before_store_resolution(key, store.height, store.width):
+                print(
+                    f"Video transforms of {self.dataset_name} resample {key} before resizing it to the stored "
+                    f"{store.height}x{store.width}, decoding it from mp4 instead of the frame store"
+                )
+            elif all((original_key, trajectory_id) in store for trajectory_id in self.trajectory_ids):
+                keys.add(original_key)
+                self.metadata.modalities.video[subkey].resolution = (store.width, store.height)
+            else:
+                print(
+                    f"Frame store of {self.dataset_name} does not hold every {original_key} video, "
+                    "decoding them from mp4"
+                )
+        if not keys:
+            return None, set()
+        print(
+            f"Reading {sorted(keys)} frames of {self.dataset_name} from {store.store_dir} ({store.width}x{store.height})"
+        )
+        return store, keys
+
     def _get_steps_config_key(self) -> str:
         """Generate a configuration key for steps caching."""
         config_dict = {
@@ -450,63 +621,106 @@ class LeRobotSingleDataset(Dataset):
         return hashlib.md5(config_str.encode()).hexdigest()[:12]  #
 
 
-    def _get_all_steps_single_process(self) -> list[tuple[int, int]]:
-        """Original single-process implementation as fallback."""
-        all_steps: list[tuple[int, int]] = []
-        skipped_trajectories = 0
-        processed_trajectories = 0
-        
-        # Check if language modality is configured
-        has_language_modality = 'language' in self.modality_keys and len(self.modality_keys['language']) > 0
-        
+    def _get_all_steps_single_process(self) -> StepIndex:
+        """Single-process implementation, used for small datasets and as fallback."""
+        kept_trajectory_ids: list[int] = []
+        kept_base_indices: list[np.ndarray] = []
         for trajectory_id, trajectory_length in tqdm(zip(self.trajectory_ids, self.trajectory_lengths), total=len(self.trajectory_ids), desc="Getting All Step"):
-            data = self.get_trajectory_data(trajectory_id)
-            trajectory_skipped = False
-            
-            # Check if trajectory has valid language instruction (if language modality is configured)
-            if has_language_modality:
-                self.curr_traj_data = data  # Set current trajectory data for get_language to work
-                try:
-                    language_instruction = self.get_language(trajectory_id, self.modality_keys['language'][0], 0)
-                    if not language_instruction or language_instruction[0] == "":
-                        print(f"Skipping trajectory {trajectory_id} due to empty language instruction")
-                        skipped_trajectories += 1
-                        trajectory_skipped = True
-                        continue
-                except Exception as e:
-                    print(f"Skipping trajectory {trajectory_id} due to language retrieval error: {e}")
-                    skipped_trajectories += 1
-                    trajectory_skipped = True
-                    continue
-            
-            if not trajectory_skipped:
-                processed_trajectories += 1
-            
-            if self.delete_pause_frame:
-                # Get position and gripper fields based on available columns
-                delta_position_values, gripper_values = self._get_position_and_gripper_values(data)
-                previous_gripper = gripper_values[0]
-                for base_index in range(trajectory_length):
-                    if base_index >= len(delta_position_values) or base_index >= len(gripper_values):
-                        break
-                        
-                    # Check for translation change using the detected position fields
-                    has_translation_change = np.any(np.abs(delta_position_values[base_index]) > EPSILON)
-                    has_gripper_change = gripper_values[base_index] != (previous_gripper if base_index == 0 else gripper_values[base_index-1])
-                    
-                    if has_translation_change or has_gripper_change:
-                        all_steps.append((trajectory_id, base_index))
-            else:
-                for base_index in range(trajectory_length):
-                    all_steps.append((trajectory_id, base_index))
-                    
+            base_indices = self._get_trajectory_base_indices(trajectory_id, trajectory_length)
+            if base_indices is not None:
+                kept_trajectory_ids.append(trajectory_id)
+                kept_base_indices.append(base_indices)
+
+        all_steps = StepIndex.from_trajectories(kept_trajectory_ids, kept_base_indices)
         # Print summary statistics
-        print(f"Single-process summary: Processed {processed_trajectories} trajectories, skipped {skipped_trajectories} empty trajectories")
+        skipped = len(self.trajectory_ids) - len(kept_trajectory_ids)
+        print(
+            f"Single-process summary: Processed {len(kept_trajectory_ids)} trajectories, "
+            f"skipped {skipped} empty trajectories"
+        )
         print(f"Total steps: {len(all_steps)} from {len(self.trajectory_ids)} trajectories")
                    
         return all_steps
 
-    def _get_position_and_gripper_values(self, data: pd.DataFrame) -> tuple[list, list]:
+    def _get_all_steps_multi_process(self, num_processes: int, num_chunks: int | None = None) -> StepIndex:
+        """Same steps as `_get_all_steps_single_process`, with chunks of trajectories scanned by forked processes."""
+        num_chunks = num_chunks or 8 * num_processes
+        chunks = [chunk for chunk in np.array_split(np.arange(len(self.trajectory_ids)), num_chunks) if len(chunk)]
+        kept_trajectory_ids: list[int] = []
+        kept_base_indices: list[np.ndarray] = []
+        # fork: the processes inherit this dataset instead of receiving a pickled copy
+        context = multiprocessing.get_context("fork")
+        with context.Pool(num_processes, initializer=_init_steps_worker, initargs=(self,)) as pool:
+            progress = tqdm(
+                pool.imap(_get_chunk_base_indices, chunks),
+                total=len(chunks),
+                desc=f"Getting All Step ({num_processes} processes)",
+            )
+            for chunk_steps in progress:
+                for trajectory_id, base_indices in chunk_steps:
+                    if base_indices is not None:
+                        kept_trajectory_ids.append(trajectory_id)
+                        kept_base_indices.append(base_indices)
+
+        all_steps = StepIndex.from_trajectories(kept_trajectory_ids, kept_base_indices)
+        skipped = len(self.trajectory_ids) - len(kept_trajectory_ids)
+        print(
+            f"Multi-process summary: Processed {len(kept_trajectory_ids)} trajectories, "
+            f"skipped {skipped} empty trajectories"
+        )
+        print(f"Total steps: {len(all_steps)} from {len(self.trajectory_ids)} trajectories")
+        return all_steps
+
+    def _get_steps_columns(self) -> list[str]:
+        """Columns read by the steps index: the language column and, with delete_pause_frame, every action column
+        `_get_position_and_gripper_values` may use."""
+        columns = []
+        annotation_meta = self.lerobot_modality_meta.annotation or {}
+        for key in self.modality_keys.get("language", [])[:1]:
+            subkey = key.replace("annotation.", "")
+            if subkey in annotation_meta:
+                columns.append(annotation_meta[subkey].original_key or key)
+        if self.delete_pause_frame:
+            le_action_cfg = self.lerobot_modality_meta.action
+            for subkey in ["delta_eef_position", "x", "y", "z", "gripper_close", "gripper"]:
+                if subkey in le_action_cfg:
+                    columns.append(le_action_cfg[subkey].original_key or subkey)
+                columns.append(f"action.{subkey}")
+        return list(dict.fromkeys(columns))
+
+    def _get_steps_data(self, trajectory_id: int, columns: list[str]) -> dict[str, np.ndarray]:
+        """`columns` of a trajectory (those that exist); only they are read from the parquet file."""
+        if self._columnar_store is not None and trajectory_id in self._columnar_store:
+            return self.get_trajectory_data(trajectory_id)
+        parquet_path = self.get_parquet_path(trajectory_id)
+        assert parquet_path.exists(), f"Parquet file not found at {parquet_path}"
+        parquet_file = pq.ParquetFile(parquet_path)
+        names = set(parquet_file.schema_arrow.names)
+        return trajectory_columns(parquet_file.read(columns=[name for name in columns if name in names]).to_pandas())
+
+    def _get_trajectory_base_indices(self, trajectory_id: int, trajectory_length: int) -> np.ndarray | None:
+        """Kept base indices of a trajectory, None if it is skipped (missing language instruction)."""
+        data = self._get_steps_data(trajectory_id, self._get_steps_columns())
+
+        # Check if trajectory has valid language instruction (if language modality is configured)
+        if self.modality_keys.get("language"):
+            self.curr_traj_data = data  # Set current trajectory data for get_language to work
+            try:
+                language_instruction = self.get_language(trajectory_id, self.modality_keys['language'][0], 0)
+                if not language_instruction or language_instruction[0] == "":
+                    print(f"Skipping trajectory {trajectory_id} due to empty language instruction")
+                    return None
+            except Exception as e:
+                print(f"Skipping trajectory {trajectory_id} due to language retrieval error: {e}")
+                return None
+
+        if self.delete_pause_frame:
+            # Get position and gripper fields based on available columns
+            delta_position_values, gripper_values = self._get_position_and_gripper_values(data)
+            return get_moving_base_indices(delta_position_values, gripper_values, trajectory_length)
+        return np.arange(trajectory_length, dtype=np.int32)
+
+    def _get_position_and_gripper_values(self, data: dict[str, np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
         """Get position and gripper values based on available columns in the dataset."""
         # Get action keys from modality_keys
         action_keys = self.modality_keys.get('action', [])
@@ -526,11 +740,11 @@ class LeRobotSingleDataset(Dataset):
                     subkey = pos_key
                     if subkey in le_action_cfg:
                         le_key = le_action_cfg[subkey].original_key or subkey
-                        if le_key in data.columns:
-                            data_array = np.stack(data[le_key])
+                        if le_key in data:
+                            data_array = data[le_key]
                             le_indices = np.arange(le_action_cfg[subkey].start, le_action_cfg[subkey].end)
                             filtered_data = data_array[:, le_indices]
-                            delta_position_values = filtered_data.tolist()
+                            delta_position_values = filtered_data
                             break
                 except Exception:
                     continue
@@ -545,8 +759,8 @@ class LeRobotSingleDataset(Dataset):
                         le_action_cfg = self.lerobot_modality_meta.action
                         if coord in le_action_cfg:
                             le_key = le_action_cfg[coord].original_key or coord
-                            if le_key in data.columns:
-                                data_array = np.stack(data[le_key])
+                            if le_key in data:
+                                data_array = data[le_key]
                                 le_indices = np.arange(le_action_cfg[coord].start, le_action_cfg[coord].end)
                                 coord_data = data_array[:, le_indices].flatten()
                                 if coord == 'x':
@@ -559,19 +773,19 @@ class LeRobotSingleDataset(Dataset):
                         continue
             
             if x_data is not None and y_data is not None and z_data is not None:
-                delta_position_values = np.column_stack((x_data, y_data, z_data)).tolist()
+                delta_position_values = np.column_stack((x_data, y_data, z_data))
         
         if delta_position_values is None:
             # Fallback to the old hardcoded approach if metadata approach fails
-            if 'action.delta_eef_position' in data.columns:
-                delta_position_values = data['action.delta_eef_position'].to_numpy().tolist()
-            elif all(col in data.columns for col in ['action.x', 'action.y', 'action.z']):
-                x_vals = data['action.x'].to_numpy()
-                y_vals = data['action.y'].to_numpy() 
-                z_vals = data['action.z'].to_numpy()
-                delta_position_values = np.column_stack((x_vals, y_vals, z_vals)).tolist()
+            if 'action.delta_eef_position' in data:
+                delta_position_values = data['action.delta_eef_position']
+            elif all(col in data for col in ['action.x', 'action.y', 'action.z']):
+                x_vals = data['action.x']
+                y_vals = data['action.y']
+                z_vals = data['action.z']
+                delta_position_values = np.column_stack((x_vals, y_vals, z_vals))
             else:
-                raise ValueError(f"No suitable position columns found. Available columns: {data.columns.tolist()}")
+                raise ValueError(f"No suitable position columns found. Available columns: {list(data)}")
         
         # Extract gripper data
         gripper_values = None
@@ -584,23 +798,23 @@ class LeRobotSingleDataset(Dataset):
                     le_action_cfg = self.lerobot_modality_meta.action
                     if grip_key in le_action_cfg:
                         le_key = le_action_cfg[grip_key].original_key or grip_key
-                        if le_key in data.columns:
-                            data_array = np.stack(data[le_key])
+                        if le_key in data:
+                            data_array = data[le_key]
                             le_indices = np.arange(le_action_cfg[grip_key].start, le_action_cfg[grip_key].end)
                             gripper_data = data_array[:, le_indices].flatten()
-                            gripper_values = gripper_data.tolist()
+                            gripper_values = gripper_data
                             break
                 except Exception:
                     continue
         
         if gripper_values is None:
             # Fallback to the old hardcoded approach if metadata approach fails
-            if 'action.gripper_close' in data.columns:
-                gripper_values = data['action.gripper_close'].to_numpy().tolist()
-            elif 'action.gripper' in data.columns:
-                gripper_values = data['action.gripper'].to_numpy().tolist()
+            if 'action.gripper_close' in data:
+                gripper_values = data['action.gripper_close']
+            elif 'action.gripper' in data:
+                gripper_values = data['action.gripper']
             else:
-                raise ValueError(f"No suitable gripper columns found. Available columns: {data.columns.tolist()}")
+                raise ValueError(f"No suitable gripper columns found. Available columns: {list(data)}")
         
         return delta_position_values, gripper_values
 
@@ -767,17 +981,24 @@ class LeRobotSingleDataset(Dataset):
                 data[key] = self.get_data_by_modality(trajectory_id, modality, key, base_index)
         return data
 
-    def get_trajectory_data(self, trajectory_id: int) -> pd.DataFrame:
-        """Get the data for a trajectory."""
-        if self.curr_traj_id == trajectory_id and self.curr_traj_data is not None:
+    def get_trajectory_data(self, trajectory_id: int) -> dict[str, np.ndarray]:
+        """Get the data for a trajectory as column name -> array (see `trajectory_columns`)."""
+        if self._columnar_store is not None and trajectory_id in self._columnar_store:
+            # zero-copy slices of the memory-mapped columns, shared with the other workers through the page cache
+            self.curr_traj_id, self.curr_traj_data = trajectory_id, self._columnar_store.trajectory(trajectory_id)
             return self.curr_traj_data
-        else:
-            chunk_index = self.get_episode_chunk(trajectory_id)
-            parquet_path = self.dataset_path / self.data_path_pattern.format(
-                episode_chunk=chunk_index, episode_index=trajectory_id
-            )
+        columns = self._trajectory_cache.get(trajectory_id)
+        if columns is None:
+            parquet_path = self.get_parquet_path(trajectory_id)
             assert parquet_path.exists(), f"Parquet file not found at {parquet_path}"
-            return pd.read_parquet(parquet_path)
+            columns = trajectory_columns(pd.read_parquet(parquet_path))
+            self._trajectory_cache.put(trajectory_id, columns)
+        self.curr_traj_id, self.curr_traj_data = trajectory_id, columns
+        return columns
+
+    def trajectory_cache_stats(self) -> dict:
+        """Hit / miss counters of this worker's trajectory cache."""
+        return self._trajectory_cache.stats()
 
     def get_trajectory_index(self, trajectory_id: int) -> int:
         """Get the index of the trajectory in the dataset by the trajectory ID.
@@ -789,12 +1010,7 @@ class LeRobotSingleDataset(Dataset):
         Returns:
             int: The index of the trajectory in the dataset.
         """
-        trajectory_indices = np.where(self.trajectory_ids == trajectory_id)[0]
-        if len(trajectory_indices) != 1:
-            raise ValueError(
-                f"Error finding trajectory index for {trajectory_id}, found {trajectory_indices=}"
-            )
-        return trajectory_indices[0]
+        return self._trajectory_positions(trajectory_id)
 
     def get_episode_chunk(self, ep_index: int) -> int:
         """Get the chunk index for an episode index."""
@@ -847,6 +1063,11 @@ class LeRobotSingleDataset(Dataset):
                 raise ValueError(f"Invalid padding strategy: {padding_strategy}")
         return output
 
+    def get_parquet_path(self, trajectory_id: int) -> Path:
+        """Parquet file of a trajectory."""
+        chunk_index = self.get_episode_chunk(trajectory_id)
+        return self.dataset_path / self.data_path_pattern.format(episode_chunk=chunk_index, episode_index=trajectory_id)
+
     def get_video_path(self, trajectory_id: int, key: str) -> Path:
         chunk_index = self.get_episode_chunk(trajectory_id)
         original_key = self.lerobot_modality_meta.video[key].original_key
@@ -857,6 +1078,11 @@ class LeRobotSingleDataset(Dataset):
         )
         return self.dataset_path / video_filename
 
+    def get_keyframe_index_path(self, video_path: Path) -> Path:
+        """Cache file of a video's keyframe index (see `video.KeyframeIndex`), under meta/keyframe_index/."""
+        relative_path = video_path.relative_to(self.dataset_path)
+        return (self.dataset_path / "meta" / "keyframe_index" / relative_path).with_suffix(".npz")
+
     def get_video(
         self,
         trajectory_id: int,
@@ -886,19 +1112,24 @@ class LeRobotSingleDataset(Dataset):
         assert key.startswith("video."), f"Video key must start with 'video.', got {key}"
         # Get the sub-key
         key = key.replace("video.", "")
-        video_path = self.get_video_path(trajectory_id, key)
         # Get the action/state timestamps for each frame in the video
         assert self.curr_traj_data is not None, f"No data found for {trajectory_id=}"
-        assert "timestamp" in self.curr_traj_data.columns, f"No timestamp found in {trajectory_id=}"
-        timestamp: np.ndarray = self.curr_traj_data["timestamp"].to_numpy()
+        assert "timestamp" in self.curr_traj_data, f"No timestamp found in {trajectory_id=}"
+        timestamp: np.ndarray = self.curr_traj_data["timestamp"]
         # Get the corresponding video timestamps from the step indices
         video_timestamp = timestamp[step_indices]
 
+        original_key = self.lerobot_modality_meta.video[key].original_key or key
+        if original_key in self._frame_store_keys:
+            return self._frame_store.get_frames_by_timestamps(original_key, trajectory_id, video_timestamp)
+        video_path = self.get_video_path(trajectory_id, key)
         return get_frames_by_timestamps(
             video_path.as_posix(),
             video_timestamp,
             video_backend=self.video_backend,
             video_backend_kwargs=self.video_backend_kwargs,
+            max_open_readers=self.video_reader_pool_size,
+            keyframe_index_path=self.get_keyframe_index_path(video_path),
         )
 
     def get_state_or_action(
@@ -939,14 +1170,11 @@ class LeRobotSingleDataset(Dataset):
             le_key = key
         # Get the data array, shape: (T, D)
         assert self.curr_traj_data is not None, f"No data found for {trajectory_id=}"
-        assert le_key in self.curr_traj_data.columns, f"No {le_key} found in {trajectory_id=}"
-        data_array: np.ndarray = np.stack(self.curr_traj_data[le_key])  # type: ignore
+        assert le_key in self.curr_traj_data, f"No {le_key} found in {trajectory_id=}"
+        data_array: np.ndarray = self.curr_traj_data[le_key]
         assert data_array.ndim == 2, f"Expected 2D array, got key {le_key} is{data_array.shape} array"
-        le_indices = np.arange(
-            le_state_or_action_cfg[key].start,
-            le_state_or_action_cfg[key].end,
-        )
-        data_array = data_array[:, le_indices]
+        # slicing keeps a view of the cached column
+        data_array = data_array[:, le_state_or_action_cfg[key].start : le_state_or_action_cfg[key].end]
         # Get the state or action configuration
         state_or_action_cfg = getattr(self.metadata.modalities, modality)[key]
 
@@ -1359,6 +1587,10 @@ class LeRobotMixtureDataset(Dataset):
         metadata_config: dict = {
             "percentile_mixing_method": "min_max",
         },
+        locality_run_length: int = 1,
+        batch_size: int = 1,
+        batch_stride: int = 1,
+        statistics_cache_dir: Path | str | None = None,
     ):
         """
         Initialize the mixture dataset.
@@ -1369,6 +1601,14 @@ class LeRobotMixtureDataset(Dataset):
             balance_dataset_weights (bool): If True, the weight of dataset will be multiplied by the total trajectory length of each dataset.
             balance_trajectory_weights (bool): If True, sample trajectories within a dataset weighted by their length; otherwise, use equal weighting.
             seed (int): Random seed for sampling.
+            locality_run_length (int): If > 1, sample runs of that many consecutive steps of a trajectory, read in
+                order by one dataloader worker (see TrajectoryBlockSampler); 1 samples independent steps.
+            batch_size (int): Per-device batch size of the dataloader (for locality_run_length > 1).
+            batch_stride (int): Batches between two batches of the same dataloader worker, num_workers x world size
+                (for locality_run_length > 1).
+
+            statistics_cache_dir (Path | str | None): Directory caching the merged metadata (see `update_metadata`);
+                None merges it at every launch.
         """
         datasets: list[LeRobotSingleDataset] = []
         dataset_sampling_weights: list[float] = []
@@ -1455,10 +1695,24 @@ class LeRobotMixtureDataset(Dataset):
             self._primary_dataset_indices = np.zeros(len(self.datasets), dtype=bool)
             self._primary_dataset_indices[0] = True
 
+        # 5. (dataset, step) of every sample, drawn block by block
+        if locality_run_length > 1:
+            self._sampler = TrajectoryBlockSampler(
+                self._dataset_sampling_weights,
+                self._dataset_lengths,
+                [dataset.all_steps.trajectory_offsets() for dataset in self.datasets],
+                seed,
+                run_length=locality_run_length,
+                batch_size=batch_size,
+                batch_stride=batch_stride,
+            )
+        else:
+            self._sampler = MixtureSampler(self._dataset_sampling_weights, self._dataset_lengths, seed)
+
         # Set the epoch and sample the first epoch
         self.set_epoch(0)
 
-        self.update_metadata(metadata_config)
+        self.update_metadata(metadata_config, cached_statistics_path=statistics_cache_dir)
 
     @property
     def dataset_lengths(self) -> np.ndarray:
@@ -1480,6 +1734,11 @@ class LeRobotMixtureDataset(Dataset):
         """The indices of the primary datasets."""
         return self._primary_dataset_indices
 
+    @property
+    def sampler(self) -> MixtureSampler:
+        """The (dataset index, step index) sampler of the mixture."""
+        return self._sampler
+
     def __str__(self) -> str:
         dataset_descriptions = []
         for dataset, weight in zip(self.datasets, self.dataset_sampling_weights):
@@ -1497,30 +1756,13 @@ class LeRobotMixtureDataset(Dataset):
             epoch (int): The epoch to set.
         """
         self.epoch = epoch
-        # self.sampled_steps = self.sample_epoch()
 
     def sample_step(self, index: int) -> tuple[LeRobotSingleDataset, int, int]:
         """Sample a single step from the dataset."""
-        # return self.sampled_steps[index]
-
-        # Set seed
-        seed = index if self.mode != "train" else safe_hash((self.epoch, index, self.seed))
-        rng = np.random.default_rng(seed)
-
-        # Sample dataset
-        dataset_index = rng.choice(len(self.datasets), p=self.dataset_sampling_weights)
+        # outside of training, every epoch gets the samples of epoch 0
+        epoch = self.epoch if self.mode == "train" else 0
+        dataset_index, single_step_index = self._sampler(epoch, index)
         dataset = self.datasets[dataset_index]
-
-        # Sample trajectory
-        # trajectory_index = rng.choice(
-        #     len(dataset.trajectory_ids), p=self.trajectory_sampling_weights[dataset_index]
-        # )
-        # trajectory_id = dataset.trajectory_ids[trajectory_index]
-
-        # # Sample step
-        # base_index = rng.choice(dataset.trajectory_lengths[trajectory_index])
-        # return dataset, trajectory_id, base_index
-        single_step_index = rng.choice(len(dataset.all_steps))
         trajectory_id, base_index = dataset.all_steps[single_step_index]
         return dataset, trajectory_id, base_index
 
@@ -1808,34 +2050,77 @@ class LeRobotMixtureDataset(Dataset):
                 "percentile_mixing_method": The method to mix the percentiles, either "weighted_average" or "min_max".
                     weighted_average: Use the weighted average of the percentiles using the weight used in sampling the datasets.
                     min_max: Use the min of the 1st percentile and max of the 99th percentile.
+            cached_statistics_path (Path | str | None): Directory of the merged metadata cache. The merged metadata is
+                stored under a hash of its inputs (dataset names and tags, sampling weights, per-dataset metadata and
+                metadata_config) and loaded instead of merged when all of them match; a change of any input gives
+                another file.
         """
-        # If cached path is provided, try to load and apply
-        if cached_statistics_path is not None:
-            try:
-                cached_stats = self.load_merged_statistics(cached_statistics_path)
-                self.apply_cached_statistics(cached_stats)
-                return
-            except (FileNotFoundError, KeyError, ValidationError) as e:
-                print(f"Failed to load cached statistics: {e}")
-                print("Falling back to computing statistics from scratch...")
-
         self.tag = EmbodimentTag.NEW_EMBODIMENT.value
-        self.merged_metadata: dict[str, DatasetMetadata] = {}
-        # Group metadata by tag
-        all_metadatas: dict[str, list[DatasetMetadata]] = {}
-        for dataset in self.datasets:
-            if dataset.tag not in all_metadatas:
-                all_metadatas[dataset.tag] = []
-            all_metadatas[dataset.tag].append(dataset.metadata)
-        for tag, metadatas in all_metadatas.items():
-            self.merged_metadata[tag] = self.merge_metadata(
-                metadatas=metadatas,
-                dataset_sampling_weights=self.dataset_sampling_weights.tolist(),
-                percentile_mixing_method=metadata_config["percentile_mixing_method"],
-            )
+        cache_path = None
+        if cached_statistics_path is not None:
+            cache_key = self._merged_metadata_cache_key(metadata_config)
+            cache_path = Path(cached_statistics_path) / f"merged_metadata_{cache_key}.json"
+            self.merged_metadata = self._load_merged_metadata(cache_path)
+        if cache_path is None or self.merged_metadata is None:
+            self.merged_metadata: dict[str, DatasetMetadata] = {}
+            # Group metadata by tag
+            all_metadatas: dict[str, list[DatasetMetadata]] = {}
+            for dataset in self.datasets:
+                if dataset.tag not in all_metadatas:
+                    all_metadatas[dataset.tag] = []
+                all_metadatas[dataset.tag].append(dataset.metadata)
+            for tag, metadatas in all_metadatas.items():
+                self.merged_metadata[tag] = self.merge_metadata(
+                    metadatas=metadatas,
+                    dataset_sampling_weights=self.dataset_sampling_weights.tolist(),
+                    percentile_mixing_method=metadata_config["percentile_mixing_method"],
+                )
+            if cache_path is not None:
+                self._save_merged_metadata(cache_path)
         for dataset in self.datasets:
             dataset.set_transforms_metadata(self.merged_metadata[dataset.tag])
 
+    def _merged_metadata_cache_key(self, metadata_config: dict) -> str:
+        """Hash of everything the merged metadata depends on."""
+        inputs = {
+            "format": MERGED_METADATA_CACHE_FORMAT,
+            "metadata_config": dict(metadata_config),
+            "datasets": [
+                {
+                    "name": dataset.dataset_name,
+                    "tag": dataset.tag,
+                    "weight": weight,
+                    "metadata": hashlib.sha256(dataset.metadata.model_dump_json().encode()).hexdigest(),
+                }
+                for dataset, weight in zip(self.datasets, self.dataset_sampling_weights.tolist())
+            ],
+        }
+        return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()[:32]
+
+    @staticmethod
+    def _load_merged_metadata(cache_path: Path) -> dict[str, DatasetMetadata] | None:
+        try:
+            with open(cache_path, "r") as f:
+                cached = json.load(f)
+            return {tag: DatasetMetadata.model_validate(metadata) for tag, metadata in cached.items()}
+        except FileNotFoundError:
+            return None
+        except (json.JSONDecodeError, ValidationError, AttributeError) as e:
+            print(f"Ignoring invalid merged metadata cache {cache_path}: {e}")
+            return None
+
+    def _save_merged_metadata(self, cache_path: Path) -> None:
+        # ranks may write the same file concurrently, each through its own temporary file
+        tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, "w") as f:
+                json.dump({tag: metadata.model_dump(mode="json") for tag, metadata in self.merged_metadata.items()}, f)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:  # e.g. read-only data root, keep the merged metadata in memory only
+            print(f"Could not cache the merged metadata in {cache_path}: {e}")
+            tmp_path.unlink(missing_ok=True)
+
     def save_dataset_statistics(self, save_path: Path | str, format: str = "json") -> None:
         """
         Save merged dataset statistics to specified path in the required format.
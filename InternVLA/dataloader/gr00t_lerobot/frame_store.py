@@ -0,0 +1,275 @@
+"""
+Pre-resized frame store for the videos of a LeRobot dataset.
+
+Training resizes every decoded frame to the model input resolution (224x224), so decoding the full-resolution mp4
+on every sample mostly produces pixels that are thrown away. This tool decodes every episode video once, resizes
+its frames the same way the dataset does (PIL `Image.resize` to (width, height)) and stores them as raw uint8
+arrays under `<dataset>/frames/`, one memory-mapped array per video key, next to the timestamp of every frame:
+
+    frames/manifest.json                 resolution, per video key the episodes (offset, length, video size, mtime)
+    frames/<video_key>/frames.npy        [N, height, width, 3] uint8 frames of all episodes, concatenated
+    frames/<video_key>/timestamps.npy    [N] float64 presentation time (seconds) of every frame in its episode
+
+LeRobotSingleDataset reads frames from the store when it exists (mapping timestamps to the nearest stored frame,
+like the video backends do), and decodes the mp4 for videos that are not in the store or changed since.
+Episodes whose video did not change (size / mtime) are copied from the previous store instead of decoded again.
+
+    python -m InternVLA.dataloader.gr00t_lerobot.frame_store --dataset_paths playground/demo_data/sim_pick_place
+    python -m InternVLA.dataloader.gr00t_lerobot.frame_store --data_root_dir playground/demo_data \\
+        --data_mix demo_sim_pick_place
+"""
+
+import argparse
+import json
+import os
+import shutil
+from pathlib import Path
+
+import av
+import numpy as np
+from PIL import Image
+from tqdm import tqdm
+
+from InternVLA.dataloader.gr00t_lerobot.video import KeyframeIndex, nearest_frame_indices
+
+FRAME_STORE_DIRNAME = "frames"
+FRAME_STORE_FORMAT = 1
+
+
+def _video_episodes(dataset_path: Path) -> dict[str, list[tuple[int, Path]]]:
+    """video key -> [(episode id, mp4 path)] of the videos that exist."""
+    with open(dataset_path / "meta" / "info.json", "r") as f:
+        info = json.load(f)
+    with open(dataset_path / "meta" / "episodes.jsonl", "r") as f:
+        episode_ids = [json.loads(line)["episode_index"] for line in f]
+    video_keys = [key for key, feature in info["features"].items() if feature.get("dtype") == "video"]
+    videos = {}
+    for video_key in video_keys:
+        paths = [
+            (
+                episode_id,
+                dataset_path
+                / info["video_path"].format(
+                    episode_chunk=episode_id // info["chunks_size"], episode_index=episode_id, video_key=video_key
+                ),
+            )
+            for episode_id in episode_ids
+        ]
+        videos[video_key] = [(episode_id, path) for episode_id, path in paths if path.exists()]
+    return videos
+
+
+def decode_resized_frames(video_path: Path, height: int, width: int) -> tuple[np.ndarray, np.ndarray]:
+    """All frames of a video resized to (height, width) as [T, H, W, 3] uint8, and their timestamps in seconds."""
+    frames, timestamps = [], []
+    with av.open(video_path.as_posix()) as container:
+        stream = container.streams.video[0]
+        for frame in container.decode(stream):
+            image = Image.fromarray(frame.to_ndarray(format="rgb24"))
+            frames.append(np.asarray(image.resize((width, height))))
+            timestamps.append(frame.pts * float(stream.time_base))
+    return np.stack(frames), np.array(timestamps, dtype=np.float64)
+
+
+def build_frame_store(dataset_path: Path | str, height: int = 224, width: int = 224, force: bool = False) -> dict:
+    """
+    Build (or incrementally update) the frame store of one LeRobot dataset.
+
+    Args:
+        dataset_path: LeRobot dataset root (with meta/ and videos/).
+        height, width: Stored frame resolution.
+        force: Decode every video even if unchanged since the previous store.
+
+    Returns:
+        dict: {"videos", "frames", "decoded", "reused", "mb"}.
+    """
+    dataset_path = Path(dataset_path)
+    store_dir = dataset_path / FRAME_STORE_DIRNAME
+    videos = _video_episodes(dataset_path)
+    assert any(videos.values()), f"No videos found in {dataset_path}"
+
+    previous = None if force else FrameStore.open(dataset_path, validate=False)
+    if previous is not None and (previous.height, previous.width) != (height, width):
+        print(f"Resolution changed from {previous.height}x{previous.width}, rebuilding {store_dir}")
+        previous = None
+
+    tmp_dir = store_dir.with_name(FRAME_STORE_DIRNAME + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    manifest_videos = {}
+    decoded = reused = num_frames = 0
+    for video_key, episodes in videos.items():
+        if not episodes:
+            continue
+        # offsets from the container packets, no decoding needed
+        manifest_episodes = []
+        offset = 0
+        for episode_id, path in episodes:
+            stat = path.stat()
+            length = len(KeyframeIndex.from_video(path.as_posix()))
+            manifest_episodes.append(
+                {
+                    "episode_index": episode_id,
+                    "offset": offset,
+                    "length": length,
+                    "size": stat.st_size,
+                    "mtime_ns": stat.st_mtime_ns,
+                }
+            )
+            offset += length
+
+        (tmp_dir / video_key).mkdir(parents=True)
+        frames = np.lib.format.open_memmap(
+            tmp_dir / video_key / "frames.npy", mode="w+", dtype=np.uint8, shape=(offset, height, width, 3)
+        )
+        timestamps = np.lib.format.open_memmap(
+            tmp_dir / video_key / "timestamps.npy", mode="w+", dtype=np.float64, shape=(offset,)
+        )
+        for (episode_id, path), entry in tqdm(
+            zip(episodes, manifest_episodes), total=len(episodes), desc=f"Resizing {dataset_path.name}/{video_key}"
+        ):
+            rows = slice(entry["offset"], entry["offset"] + entry["length"])
+            old = previous.episode(video_key, episode_id) if previous is not None else None
+            if old is not None and (old["size"], old["mtime_ns"], old["length"]) == (
+                entry["size"],
+                entry["mtime_ns"],
+                entry["length"],
+            ):
+                old_rows = slice(old["offset"], old["offset"] + old["length"])
+                episode_frames = previous.array(video_key, "frames")[old_rows]
+                episode_timestamps = previous.array(video_key, "timestamps")[old_rows]
+                reused += 1
+            else:
+                episode_frames, episode_timestamps = decode_resized_frames(path, height, width)
+                decoded += 1
+            assert len(episode_frames) == entry["length"], (
+                f"{path}: decoded {len(episode_frames)} frames, the container lists {entry['length']}"
+            )
+            frames[rows] = episode_frames
+            timestamps[rows] = episode_timestamps
+        frames.flush()
+        timestamps.flush()
+        del frames, timestamps
+        manifest_videos[video_key] = manifest_episodes
+        num_frames += offset
+
+    with open(tmp_dir / "manifest.json", "w") as f:
+        json.dump({"format": FRAME_STORE_FORMAT, "height": height, "width": width, "videos": manifest_videos}, f)
+
+    # swap in the new store; the previous one is only removed once the new one is complete
+    del previous
+    old_dir = store_dir.with_name(FRAME_STORE_DIRNAME + ".old")
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if store_dir.exists():
+        os.replace(store_dir, old_dir)
+    os.replace(tmp_dir, store_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return {
+        "videos": sum(len(episodes) for episodes in manifest_videos.values()),
+        "frames": num_frames,
+        "decoded": decoded,
+        "reused": reused,
+        "mb": sum(path.stat().st_size for path in store_dir.rglob("*.npy")) / 2**20,
+    }
+
+
+class FrameStore:
+    """Read side of the frame store. Arrays are memory-mapped lazily in each process."""
+
+    def __init__(self, store_dir: Path, manifest: dict, videos: dict[str, dict[int, dict]]):
+        self.store_dir = store_dir
+        self.height, self.width = manifest["height"], manifest["width"]
+        self.videos = videos
+        self._arrays: dict[tuple[str, str], np.ndarray] = {}
+
+    @classmethod
+    def open(cls, dataset_path: Path | str, validate: bool = True) -> "FrameStore | None":
+        """
+        Open the frame store of a dataset, None if there is none.
+
+        Args:
+            dataset_path: LeRobot dataset root.
+            validate: Drop videos whose mp4 changed (size / mtime) since the store was built,
+                so that they are decoded from the mp4 instead.
+        """
+        dataset_path = Path(dataset_path)
+        store_dir = dataset_path / FRAME_STORE_DIRNAME
+        manifest_path = store_dir / "manifest.json"
+        if not manifest_path.exists():
+            return None
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+        if manifest.get("format") != FRAME_STORE_FORMAT:
+            print(f"Ignoring frame store {store_dir} with format {manifest.get('format')}")
+            return None
+        videos = {
+            video_key: {entry["episode_index"]: entry for entry in episodes}
+            for video_key, episodes in manifest["videos"].items()
+        }
+        if validate:
+            stale = 0
+            for video_key, episodes in _video_episodes(dataset_path).items():
+                stored = videos.get(video_key, {})
+                for episode_id, path in episodes:
+                    entry = stored.get(episode_id)
+                    if entry is None:
+                        continue
+                    stat = path.stat()
+                    if stat.st_size != entry["size"] or stat.st_mtime_ns != entry["mtime_ns"]:
+                        stored.pop(episode_id)
+                        stale += 1
+            if stale:
+                print(
+                    f"{stale} videos changed since the frame store of {dataset_path} was built, decoding them from mp4"
+                )
+        return cls(store_dir, manifest, videos)
+
+    def __contains__(self, video_episode: tuple[str, int]) -> bool:
+        video_key, episode_id = video_episode
+        return int(episode_id) in self.videos.get(video_key, {})
+
+    def __getstate__(self):
+        # never pickle the mapped arrays into spawned dataloader workers
+        state = self.__dict__.copy()
+        state["_arrays"] = {}
+        return state
+
+    def episode(self, video_key: str, episode_id: int) -> dict | None:
+        return self.videos.get(video_key, {}).get(int(episode_id))
+
+    def array(self, video_key: str, name: str) -> np.ndarray:
+        """Memory-mapped `frames` [N, H, W, 3] or `timestamps` [N] of a video key."""
+        if (video_key, name) not in self._arrays:
+            self._arrays[video_key, name] = np.load(self.store_dir / video_key / f"{name}.npy", mmap_mode="r")
+        return self._arrays[video_key, name]
+
+    def get_frames_by_timestamps(self, video_key: str, episode_id: int, timestamps: np.ndarray) -> np.ndarray:
+        """Stored frames closest to `timestamps` (seconds), [T, H, W, 3] uint8."""
+        entry = self.videos[video_key][int(episode_id)]
+        rows = slice(entry["offset"], entry["offset"] + entry["length"])
+        indices = nearest_frame_indices(self.array(video_key, "timestamps")[rows], timestamps)
+        return self.array(video_key, "frames")[entry["offset"] + indices]
+
+
+if __name__ == "__main__":
+    from InternVLA.dataloader.gr00t_lerobot.mixtures import DATASET_NAMED_MIXTURES
+
+    parser = argparse.ArgumentParser(description="Build or update the pre-resized frame store of LeRobot datasets")
+    parser.add_argument("--dataset_paths", nargs="*", type=str, default=[])
+    parser.add_argument(
+        "--data_root_dir", type=str, default=None, help="convert every dataset of --data_mix under this root"
+    )
+    parser.add_argument("--data_mix", type=str, default=None)
+    parser.add_argument("--height", type=int, default=224)
+    parser.add_argument("--width", type=int, default=224)
+    parser.add_argument("--force", action="store_true", help="decode every video even if unchanged")
+    args = parser.parse_args()
+
+    dataset_paths = list(args.dataset_paths)
+    if args.data_mix is not None:
+        assert args.data_root_dir is not None, "--data_mix needs --data_root_dir"
+        mixture = DATASET_NAMED_MIXTURES[args.data_mix]
+        dataset_paths += sorted({str(Path(args.data_root_dir) / name) for name, _, _ in mixture})
+    assert dataset_paths, "pass --dataset_paths or --data_root_dir with --data_mix"
+    for dataset_path in dataset_paths:
+        summary = build_frame_store(dataset_path, height=args.height, width=args.width, force=args.force)
+        print(f"{dataset_path}: {json.dumps(summary)}")
@@ -0,0 +1,220 @@
+"""
+Precomputed, vectorized sampling of (dataset, step) pairs for LeRobotMixtureDataset.
+
+The mixture used to seed a fresh generator from a SHA-256 hash of (epoch, index, seed) for every sample and draw
+the dataset with `rng.choice(p=...)` (a cumulative sum over all datasets per call) and the step with a second call.
+MixtureSampler instead draws the samples of an epoch in blocks of `block_size` consecutive indices, with a single
+`rng.random` call per block: one uniform picks the dataset through an alias table (O(1) per sample, independent of
+the number of datasets), the other the step, uniformly over the dataset's steps like before.
+
+Sample `index` of an epoch only depends on (seed, epoch, index), through its block generator seeded with
+(seed, epoch, block). It does not depend on the rank or the dataloader worker that reads it: the index sampler of the
+training dataloader (sharded over ranks by accelerate) gives every rank and worker disjoint indices, hence disjoint
+samples, and the sequence is the same for any world size. Every process only generates the blocks it reads.
+
+TrajectoryBlockSampler draws runs of consecutive steps of one trajectory instead of independent steps, so that a
+dataloader worker reads the same parquet file / mp4 for several samples in a row (trajectory cache, open video
+readers, page cache), while every batch still holds `batch_size` independent runs.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+
+
+class AliasTable:
+    """Walker's alias table (Vose's construction) of a discrete distribution, sampled from uniforms in [0, 1)."""
+
+    def __init__(self, weights: np.ndarray):
+        weights = np.asarray(weights, dtype=np.float64)
+        assert weights.ndim == 1 and len(weights) > 0, f"{weights.shape=}"
+        assert np.all(weights >= 0) and weights.sum() > 0, f"Invalid weights {weights}"
+        n = len(weights)
+        scaled = weights * n / weights.sum()
+        self.prob = np.ones(n, dtype=np.float64)
+        self.alias = np.arange(n, dtype=np.int64)
+        small = [i for i in range(n) if scaled[i] < 1.0]
+        large = [i for i in range(n) if scaled[i] >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.prob[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] -= 1.0 - scaled[less]
+            (small if scaled[more] < 1.0 else large).append(more)
+        # the leftovers are 1 up to rounding
+
+    def __len__(self) -> int:
+        return len(self.prob)
+
+    def sample(self, uniforms: np.ndarray) -> np.ndarray:
+        """One index per uniform: the integer part of u * n is the column, its fractional part the coin."""
+        scaled = uniforms * len(self.prob)
+        columns = np.minimum(scaled.astype(np.int64), len(self.prob) - 1)
+        return np.where(scaled - columns < self.prob[columns], columns, self.alias[columns])
+
+    def probabilities(self) -> np.ndarray:
+        """The distribution the table samples from (for checks)."""
+        probabilities = self.prob.copy()
+        np.add.at(probabilities, self.alias, 1.0 - self.prob)
+        return probabilities / len(self.prob)
+
+
+class MixtureSampler:
+    """(dataset index, step index) of every sample of an epoch, generated block by block."""
+
+    def __init__(
+        self,
+        dataset_sampling_weights: np.ndarray,
+        dataset_lengths: np.ndarray,
+        seed: int,
+        block_size: int = 65536,
+        max_cached_blocks: int = 4,
+    ):
+        """
+        Args:
+            dataset_sampling_weights: Probability of drawing each dataset.
+            dataset_lengths: Number of steps of each dataset; steps are drawn uniformly within a dataset, empty
+                datasets are never drawn.
+            seed: Sampling seed.
+            block_size: Consecutive indices drawn together.
+            max_cached_blocks: Generated blocks kept per process.
+        """
+        self.dataset_lengths = np.asarray(dataset_lengths, dtype=np.int64)
+        assert len(self.dataset_lengths) == len(dataset_sampling_weights), (
+            f"{len(self.dataset_lengths)=} != {len(dataset_sampling_weights)=}"
+        )
+        empty = self.dataset_lengths <= 0
+        assert not np.all(empty), f"All datasets are empty: {self.dataset_lengths}"
+        if np.any(empty):
+            print(f"Warning: datasets {np.flatnonzero(empty).tolist()} are empty and will not be sampled")
+        # empty datasets get zero weight: no step can be drawn from them
+        self.alias_table = AliasTable(np.where(empty, 0.0, np.asarray(dataset_sampling_weights, dtype=np.float64)))
+        self.seed = seed
+        self.block_size = block_size
+        self.max_cached_blocks = max_cached_blocks
+        self._blocks: OrderedDict[tuple[int, int], tuple[np.ndarray, np.ndarray]] = OrderedDict()
+
+    def sample_block(self, epoch: int, block: int) -> tuple[np.ndarray, np.ndarray]:
+        """Dataset and step indices of samples [block * block_size, (block + 1) * block_size) of an epoch."""
+        key = (epoch, block)
+        if key in self._blocks:
+            self._blocks.move_to_end(key)
+            return self._blocks[key]
+        dataset_indices, step_indices = self._draw(np.random.default_rng((self.seed, epoch, block)))
+        self._blocks[key] = (dataset_indices, step_indices)
+        if len(self._blocks) > self.max_cached_blocks:
+            self._blocks.popitem(last=False)
+        return dataset_indices, step_indices
+
+    def _draw(self, rng: np.random.Generator) -> tuple[np.ndarray, np.ndarray]:
+        uniforms = rng.random((2, self.block_size))
+        dataset_indices = self.alias_table.sample(uniforms[0])
+        return dataset_indices, self._uniform_steps(dataset_indices, uniforms[1])
+
+    def _uniform_steps(self, dataset_indices: np.ndarray, uniforms: np.ndarray) -> np.ndarray:
+        lengths = self.dataset_lengths[dataset_indices]
+        return np.minimum((uniforms * lengths).astype(np.int64), lengths - 1)
+
+    def sample(self, epoch: int, start: int, stop: int) -> tuple[np.ndarray, np.ndarray]:
+        """Dataset and step indices of samples [start, stop) of an epoch."""
+        dataset_indices, step_indices = [], []
+        for block in range(start // self.block_size, (stop - 1) // self.block_size + 1):
+            block_datasets, block_steps = self.sample_block(epoch, block)
+            rows = slice(max(start - block * self.block_size, 0), min(stop - block * self.block_size, self.block_size))
+            dataset_indices.append(block_datasets[rows])
+            step_indices.append(block_steps[rows])
+        if not dataset_indices:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        return np.concatenate(dataset_indices), np.concatenate(step_indices)
+
+    def __call__(self, epoch: int, index: int) -> tuple[int, int]:
+        block, row = divmod(index, self.block_size)
+        dataset_indices, step_indices = self.sample_block(epoch, block)
+        return int(dataset_indices[row]), int(step_indices[row])
+
+    def __getstate__(self):
+        # workers regenerate the blocks they read
+        state = self.__dict__.copy()
+        state["_blocks"] = OrderedDict()
+        return state
+
+
+class TrajectoryBlockSampler(MixtureSampler):
+    """
+    MixtureSampler drawing runs of `run_length` consecutive steps of one trajectory.
+
+    Batch g of an epoch (indices [g * batch_size, (g + 1) * batch_size)) is built by dataloader worker
+    g mod (num_workers x world_size) when the batches are dealt round-robin over the ranks (accelerate) and then over
+    the workers of a rank (torch DataLoader), so `batch_stride` = num_workers x world_size. Slot j of batch g + k *
+    batch_stride holds step k of the same run as slot j of batch g: a worker reads every run in order, over its
+    successive batches, and the runs of one batch are independent. With another batch layout only the locality is
+    lost, the sampled distribution does not change. A worker keeps `batch_size` runs in flight, so its trajectory
+    cache and video reader pool need room for that many trajectories to benefit.
+
+    Runs start at a uniform step of the dataset and wrap around within its trajectory, so every sample is still a
+    uniform step of a dataset drawn with the mixture weights; consecutive batches of a worker are correlated instead.
+    """
+
+    def __init__(
+        self,
+        dataset_sampling_weights: np.ndarray,
+        dataset_lengths: np.ndarray,
+        trajectory_offsets: list[np.ndarray],
+        seed: int,
+        run_length: int,
+        batch_size: int,
+        batch_stride: int,
+        block_size: int = 65536,
+        max_cached_blocks: int = 4,
+    ):
+        """
+        Args:
+            trajectory_offsets: Per dataset, the first step index of every trajectory followed by the dataset length
+                (`StepIndex.trajectory_offsets`).
+            run_length: Consecutive steps drawn from the same trajectory.
+            batch_size: Per-device batch size of the dataloader.
+            batch_stride: Batches between two batches of the same dataloader worker (num_workers x world size).
+            Other arguments: see MixtureSampler.
+        """
+        assert run_length >= 1 and batch_size >= 1 and batch_stride >= 1, (
+            f"{run_length=}, {batch_size=}, {batch_stride=}"
+        )
+        self.run_length, self.batch_size, self.batch_stride = run_length, batch_size, batch_stride
+        self.group_size = run_length * batch_stride * batch_size
+        super().__init__(
+            dataset_sampling_weights,
+            dataset_lengths,
+            seed,
+            block_size=max(block_size // self.group_size, 1) * self.group_size,
+            max_cached_blocks=max_cached_blocks,
+        )
+        self.trajectory_offsets = [np.asarray(offsets, dtype=np.int64) for offsets in trajectory_offsets]
+        for offsets, length in zip(self.trajectory_offsets, self.dataset_lengths):
+            assert offsets[0] == 0 and offsets[-1] == length, f"Trajectory offsets do not cover the {length} steps"
+
+        # run and step within the run of every index of a group (run_length x batch_stride batches)
+        batch, slot = np.divmod(np.arange(self.group_size), batch_size)
+        self._group_steps, lane = np.divmod(batch, batch_stride)
+        self._group_runs = lane * batch_size + slot
+
+    def _draw(self, rng: np.random.Generator) -> tuple[np.ndarray, np.ndarray]:
+        num_groups = self.block_size // self.group_size
+        runs_per_group = self.batch_stride * self.batch_size
+        uniforms = rng.random((2, num_groups * runs_per_group))
+        run_datasets = self.alias_table.sample(uniforms[0])
+        run_starts = self._uniform_steps(run_datasets, uniforms[1])
+
+        # trajectory of every run start
+        run_first = np.empty_like(run_starts)
+        run_lengths = np.empty_like(run_starts)
+        for dataset_index in np.unique(run_datasets):
+            mask = run_datasets == dataset_index
+            offsets = self.trajectory_offsets[dataset_index]
+            trajectory = np.searchsorted(offsets, run_starts[mask], side="right") - 1
+            run_first[mask] = offsets[trajectory]
+            run_lengths[mask] = offsets[trajectory + 1] - offsets[trajectory]
+
+        runs = (np.arange(num_groups)[:, None] * runs_per_group + self._group_runs).ravel()
+        steps_in_run = np.tile(self._group_steps, num_groups)
+        step_indices = run_first[runs] + (run_starts[runs] - run_first[runs] + steps_in_run) % run_lengths[runs]
+        return run_datasets[runs], step_indices
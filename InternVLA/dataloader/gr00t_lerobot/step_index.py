@@ -0,0 +1,132 @@
+"""
+Array-based step index of a LeRobot dataset.
+
+StepIndex keeps the (trajectory_id, base_index) of every sample as two flat arrays (int64 trajectory ids,
+int32 base indices) instead of a list of Python tuples. It is saved as two `.npy` files next to the dataset meta
+and memory-mapped on load, so dataloader workers share its pages instead of copying (and refcount-touching)
+a list of millions of tuples.
+
+TrajectoryPositions maps a trajectory id to its position in `trajectory_ids` through a dense table when the ids
+are compact (LeRobot episode indices usually are), or a sorted search otherwise.
+"""
+
+import os
+import pickle
+from pathlib import Path
+
+import numpy as np
+
+
+class StepIndex:
+    """(trajectory_id, base_index) of every sample, stored as two flat arrays."""
+
+    def __init__(self, trajectory_ids: np.ndarray, base_indices: np.ndarray):
+        assert len(trajectory_ids) == len(base_indices), f"{len(trajectory_ids)=} != {len(base_indices)=}"
+        self.trajectory_ids = trajectory_ids
+        self.base_indices = base_indices
+
+    @classmethod
+    def from_steps(cls, steps: list[tuple[int, int]]) -> "StepIndex":
+        """Convert a legacy list of (trajectory_id, base_index) tuples."""
+        steps = np.asarray(steps, dtype=np.int64).reshape(-1, 2)
+        return cls(np.ascontiguousarray(steps[:, 0]), steps[:, 1].astype(np.int32))
+
+    @classmethod
+    def from_trajectories(cls, trajectory_ids: list[int], base_indices: list[np.ndarray]) -> "StepIndex":
+        """Concatenate the kept base indices of every trajectory."""
+        lengths = [len(indices) for indices in base_indices]
+        return cls(
+            np.repeat(np.asarray(trajectory_ids, dtype=np.int64), lengths),
+            np.concatenate(base_indices).astype(np.int32) if base_indices else np.zeros(0, dtype=np.int32),
+        )
+
+    @staticmethod
+    def paths(prefix: Path) -> tuple[Path, Path]:
+        return prefix.with_name(prefix.name + "_trajectory_ids.npy"), prefix.with_name(prefix.name + "_base_indices.npy")
+
+    @classmethod
+    def load(cls, prefix: Path, mmap: bool = True) -> "StepIndex | None":
+        """Load `<prefix>_trajectory_ids.npy` / `<prefix>_base_indices.npy`, None if they do not exist."""
+        trajectory_ids_path, base_indices_path = cls.paths(prefix)
+        if not (trajectory_ids_path.exists() and base_indices_path.exists()):
+            return None
+        mmap_mode = "r" if mmap else None
+        return cls(np.load(trajectory_ids_path, mmap_mode=mmap_mode), np.load(base_indices_path, mmap_mode=mmap_mode))
+
+    @classmethod
+    def load_legacy(cls, pkl_path: Path, config_key: str) -> "StepIndex | None":
+        """Read a `steps_<key>.pkl` written by older versions, None if missing or built for another config."""
+        if not pkl_path.exists():
+            return None
+        with open(pkl_path, "rb") as f:
+            cached_data = pickle.load(f)
+        if cached_data.get("config_key") != config_key:
+            return None
+        return cls.from_steps(cached_data["steps"])
+
+    def save(self, prefix: Path) -> None:
+        """Write both arrays (each through a temporary file and an atomic rename)."""
+        for path, array in zip(self.paths(prefix), [self.trajectory_ids, self.base_indices]):
+            tmp_path = path.with_name(path.name + f".tmp{os.getpid()}")
+            with open(tmp_path, "wb") as f:
+                np.save(f, np.asarray(array))
+            os.replace(tmp_path, path)
+
+    def __len__(self) -> int:
+        return len(self.trajectory_ids)
+
+    def __getitem__(self, index: int) -> tuple[int, int]:
+        return int(self.trajectory_ids[index]), int(self.base_indices[index])
+
+    def trajectory_offsets(self) -> np.ndarray:
+        """First step of every trajectory (steps are grouped by trajectory), followed by len(self)."""
+        trajectory_ids = np.asarray(self.trajectory_ids)
+        starts = np.flatnonzero(trajectory_ids[1:] != trajectory_ids[:-1]) + 1
+        return np.concatenate([[0], starts, [len(trajectory_ids)]]).astype(np.int64)
+
+    def __getstate__(self):
+        # spawned workers re-map the files instead of receiving a copy of the arrays
+        state = self.__dict__.copy()
+        for name in ["trajectory_ids", "base_indices"]:
+            array = state[name]
+            if isinstance(array, np.memmap) and array.filename is not None:
+                state[name] = (array.filename, array.dtype.str, array.shape, array.offset)
+        return state
+
+    def __setstate__(self, state):
+        for name in ["trajectory_ids", "base_indices"]:
+            if isinstance(state[name], tuple):
+                filename, dtype, shape, offset = state[name]
+                state[name] = np.memmap(filename, dtype=np.dtype(dtype), mode="r", shape=shape, offset=offset)
+        self.__dict__.update(state)
+
+
+class TrajectoryPositions:
+    """trajectory id -> position in `trajectory_ids`, O(1) through a dense table or O(log n) through a sorted search."""
+
+    def __init__(self, trajectory_ids: np.ndarray, max_dense_ratio: int = 4):
+        trajectory_ids = np.asarray(trajectory_ids, dtype=np.int64)
+        self.dense = None
+        compact = len(trajectory_ids) > 0 and trajectory_ids.min() >= 0
+        compact = compact and trajectory_ids.max() < max_dense_ratio * len(trajectory_ids) + 1024
+        if compact and len(np.unique(trajectory_ids)) == len(trajectory_ids):
+            self.dense = np.full(int(trajectory_ids.max()) + 1, -1, dtype=np.int64)
+            self.dense[trajectory_ids] = np.arange(len(trajectory_ids))
+        else:
+            order = np.argsort(trajectory_ids, kind="stable")
+            self.sorted_ids, self.sorted_positions = trajectory_ids[order], order
+
+    def __call__(self, trajectory_id: int) -> int:
+        trajectory_id = int(trajectory_id)
+        if self.dense is not None:
+            position = self.dense[trajectory_id] if 0 <= trajectory_id < len(self.dense) else -1
+            if position < 0:
+                raise ValueError(f"Error finding trajectory index for {trajectory_id}, found no match")
+            return int(position)
+        left = np.searchsorted(self.sorted_ids, trajectory_id, side="left")
+        right = np.searchsorted(self.sorted_ids, trajectory_id, side="right")
+        if right - left != 1:
+            raise ValueError(
+                f"Error finding trajectory index for {trajectory_id}, found {self.sorted_positions[left:right]=}"
+            )
+        return int(self.sorted_positions[left])
@@ -26,16 +26,158 @@ from ..schema import DatasetMetadata, RotationType, StateActionMetadata
 from .base import InvertibleModalityTransform, ModalityTransform
 
 
+def _np_normalize(x: np.ndarray) -> np.ndarray:
+    """Same as `torch.nn.functional.normalize(x, dim=-1)`."""
+    return x / np.maximum(np.linalg.norm(x, axis=-1, keepdims=True), 1e-12)
+
+
+def _np_axis_angle_rotation(axis: str, angle: np.ndarray) -> np.ndarray:
+    """Rotation matrices about one of the basis axes, see `pytorch3d.transforms.euler_angles_to_matrix`."""
+    cos, sin = np.cos(angle), np.sin(angle)
+    one, zero = np.ones_like(angle), np.zeros_like(angle)
+    if axis == "X":
+        flat = (one, zero, zero, zero, cos, -sin, zero, sin, cos)
+    elif axis == "Y":
+        flat = (cos, zero, sin, zero, one, zero, -sin, zero, cos)
+    elif axis == "Z":
+        flat = (cos, -sin, zero, sin, cos, zero, zero, zero, one)
+    else:
+        raise ValueError(f"Invalid axis: {axis}")
+    return np.stack(flat, -1).reshape(angle.shape + (3, 3))
+
+
+def _np_angle_from_tan(axis: str, other_axis: str, data: np.ndarray, horizontal: bool, tait_bryan: bool) -> np.ndarray:
+    """See `pytorch3d.transforms.rotation_conversions._angle_from_tan`."""
+    i1, i2 = {"X": (2, 1), "Y": (0, 2), "Z": (1, 0)}[axis]
+    if horizontal:
+        i2, i1 = i1, i2
+    even = (axis + other_axis) in ["XY", "YZ", "ZX"]
+    if horizontal == even:
+        return np.arctan2(data[..., i1], data[..., i2])
+    if tait_bryan:
+        return np.arctan2(-data[..., i2], data[..., i1])
+    return np.arctan2(data[..., i2], -data[..., i1])
+
+
+def _np_quaternion_to_matrix(quaternions: np.ndarray) -> np.ndarray:
+    r, i, j, k = np.moveaxis(quaternions, -1, 0)
+    two_s = 2.0 / (quaternions * quaternions).sum(-1)
+    flat = (
+        1 - two_s * (j * j + k * k),
+        two_s * (i * j - k * r),
+        two_s * (i * k + j * r),
+        two_s * (i * j + k * r),
+        1 - two_s * (i * i + k * k),
+        two_s * (j * k - i * r),
+        two_s * (i * k - j * r),
+        two_s * (j * k + i * r),
+        1 - two_s * (i * i + j * j),
+    )
+    return np.stack(flat, -1).reshape(quaternions.shape[:-1] + (3, 3))
+
+
+def _np_matrix_to_quaternion(matrix: np.ndarray) -> np.ndarray:
+    """Real part first, with a non-negative real part."""
+    m00, m01, m02, m10, m11, m12, m20, m21, m22 = np.moveaxis(matrix.reshape(matrix.shape[:-2] + (9,)), -1, 0)
+    q_abs = np.sqrt(
+        np.maximum(
+            np.stack([1 + m00 + m11 + m22, 1 + m00 - m11 - m22, 1 - m00 + m11 - m22, 1 - m00 - m11 + m22], -1), 0
+        )
+    )
+    # candidate quaternions scaled by each of the components, the best-conditioned one is kept
+    quat_by_rijk = np.stack(
+        [
+            np.stack([q_abs[..., 0] ** 2, m21 - m12, m02 - m20, m10 - m01], -1),
+            np.stack([m21 - m12, q_abs[..., 1] ** 2, m10 + m01, m02 + m20], -1),
+            np.stack([m02 - m20, m10 + m01, q_abs[..., 2] ** 2, m12 + m21], -1),
+            np.stack([m10 - m01, m20 + m02, m21 + m12, q_abs[..., 3] ** 2], -1),
+        ],
+        -2,
+    )
+    quat_candidates = quat_by_rijk / (2.0 * np.maximum(q_abs[..., None], 0.1))
+    best = np.argmax(q_abs, axis=-1)[..., None, None]
+    out = np.take_along_axis(quat_candidates, best, axis=-2)[..., 0, :]
+    return np.where(out[..., 0:1] < 0, -out, out)
+
+
+def _np_axis_angle_to_quaternion(axis_angle: np.ndarray) -> np.ndarray:
+    angles = np.linalg.norm(axis_angle, axis=-1, keepdims=True)
+    sin_half_angles_over_angles = 0.5 * np.sinc(angles * 0.5 / np.pi)
+    return np.concatenate([np.cos(angles * 0.5), axis_angle * sin_half_angles_over_angles], -1)
+
+
+def _np_quaternion_to_axis_angle(quaternions: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(quaternions[..., 1:], axis=-1, keepdims=True)
+    half_angles = np.arctan2(norms, quaternions[..., :1])
+    sin_half_angles_over_angles = 0.5 * np.sinc(half_angles / np.pi)
+    return quaternions[..., 1:] / sin_half_angles_over_angles
+
+
+def _np_axis_angle_to_matrix(axis_angle: np.ndarray) -> np.ndarray:
+    return _np_quaternion_to_matrix(_np_axis_angle_to_quaternion(axis_angle))
+
+
+def _np_matrix_to_axis_angle(matrix: np.ndarray) -> np.ndarray:
+    return _np_quaternion_to_axis_angle(_np_matrix_to_quaternion(matrix))
+
+
+def _np_euler_angles_to_matrix(euler_angles: np.ndarray, convention: str) -> np.ndarray:
+    matrices = [_np_axis_angle_rotation(c, e) for c, e in zip(convention, np.moveaxis(euler_angles, -1, 0))]
+    return matrices[0] @ matrices[1] @ matrices[2]
+
+
+def _np_matrix_to_euler_angles(matrix: np.ndarray, convention: str) -> np.ndarray:
+    i0, i2 = "XYZ".index(convention[0]), "XYZ".index(convention[2])
+    tait_bryan = i0 != i2
+    if tait_bryan:
+        central_angle = np.arcsin(np.clip(matrix[..., i0, i2] * (-1.0 if i0 - i2 in [-1, 2] else 1.0), -1, 1))
+    else:
+        central_angle = np.arccos(np.clip(matrix[..., i0, i0], -1, 1))
+    angles = (
+        _np_angle_from_tan(convention[0], convention[1], matrix[..., i2], False, tait_bryan),
+        central_angle,
+        _np_angle_from_tan(convention[2], convention[1], matrix[..., i0, :], True, tait_bryan),
+    )
+    return np.stack(angles, -1)
+
+
+def _np_rotation_6d_to_matrix(d6: np.ndarray) -> np.ndarray:
+    b1 = _np_normalize(d6[..., :3])
+    b2 = d6[..., 3:] - (b1 * d6[..., 3:]).sum(-1, keepdims=True) * b1
+    b2 = _np_normalize(b2)
+    b3 = np.cross(b1, b2)
+    return np.stack((b1, b2, b3), -2)
+
+
+def _np_matrix_to_rotation_6d(matrix: np.ndarray) -> np.ndarray:
+    return matrix[..., :2, :].reshape(matrix.shape[:-2] + (6,))
+
+
+# Closed-form NumPy counterparts of the pytorch3d conversions used by RotationTransform
+_NP_ROTATION_CONVERSIONS = {
+    "axis_angle_to_matrix": _np_axis_angle_to_matrix,
+    "matrix_to_axis_angle": _np_matrix_to_axis_angle,
+    "euler_angles_to_matrix": _np_euler_angles_to_matrix,
+    "matrix_to_euler_angles": _np_matrix_to_euler_angles,
+    "quaternion_to_matrix": _np_quaternion_to_matrix,
+    "matrix_to_quaternion": _np_matrix_to_quaternion,
+    "rotation_6d_to_matrix": _np_rotation_6d_to_matrix,
+    "matrix_to_rotation_6d": _np_matrix_to_rotation_6d,
+}
+
+
 class RotationTransform:
     """Adapted from https://github.com/real-stanford/diffusion_policy/blob/548a52bbb105518058e27bf34dcf90bf6f73681a/diffusion_policy/model/common/rotation_transformer.py"""
 
     valid_reps = ["axis_angle", "euler_angles", "quaternion", "rotation_6d", "matrix"]
 
-    def __init__(self, from_rep="axis_angle", to_rep="rotation_6d"):
+    def __init__(self, from_rep="axis_angle", to_rep="rotation_6d", use_numpy: bool = False):
         """
         Valid representations
 
         Always use matrix as intermediate representation.
+        With `use_numpy`, float32 / float64 CPU tensors go through the NumPy conversions, other tensors (e.g. on GPU
+        or requiring grad) through pytorch3d.
         """
         if from_rep.startswith("euler_angles"):
             from_convention = from_rep.split("_")[-1]
@@ -55,60 +197,155 @@ class RotationTransform:
 
         forward_funcs = list()
         inverse_funcs = list()
+        forward_np_funcs = list()
+        inverse_np_funcs = list()
 
         if from_rep != "matrix":
-            funcs = [getattr(pt, f"{from_rep}_to_matrix"), getattr(pt, f"matrix_to_{from_rep}")]
+            names = [f"{from_rep}_to_matrix", f"matrix_to_{from_rep}"]
+            funcs = [getattr(pt, name) for name in names]
+            np_funcs = [_NP_ROTATION_CONVERSIONS[name] for name in names]
             if from_convention is not None:
                 funcs = [functools.partial(func, convention=from_convention) for func in funcs]
+                np_funcs = [functools.partial(func, convention=from_convention) for func in np_funcs]
             forward_funcs.append(funcs[0])
             inverse_funcs.append(funcs[1])
+            forward_np_funcs.append(np_funcs[0])
+            inverse_np_funcs.append(np_funcs[1])
 
         if to_rep != "matrix":
-            funcs = [getattr(pt, f"matrix_to_{to_rep}"), getattr(pt, f"{to_rep}_to_matrix")]
+            names = [f"matrix_to_{to_rep}", f"{to_rep}_to_matrix"]
+            funcs = [getattr(pt, name) for name in names]
+            np_funcs = [_NP_ROTATION_CONVERSIONS[name] for name in names]
             if to_convention is not None:
                 funcs = [functools.partial(func, convention=to_convention) for func in funcs]
+                np_funcs = [functools.partial(func, convention=to_convention) for func in np_funcs]
             forward_funcs.append(funcs[0])
             inverse_funcs.append(funcs[1])
+            forward_np_funcs.append(np_funcs[0])
+            inverse_np_funcs.append(np_funcs[1])
 
         inverse_funcs = inverse_funcs[::-1]
+        inverse_np_funcs = inverse_np_funcs[::-1]
 
         self.forward_funcs = forward_funcs
         self.inverse_funcs = inverse_funcs
+        self.forward_np_funcs = forward_np_funcs if use_numpy else None
+        self.inverse_np_funcs = inverse_np_funcs if use_numpy else None
 
     @staticmethod
-    def _apply_funcs(x: torch.Tensor, funcs: list) -> torch.Tensor:
+    def _apply_funcs(x: torch.Tensor, funcs: list, np_funcs: list | None) -> torch.Tensor:
         assert isinstance(x, torch.Tensor)
-        for func in funcs:
-            x = func(x)
-        return x
+        if (
+            np_funcs is None
+            or x.device.type != "cpu"
+            or x.requires_grad
+            or x.dtype not in (torch.float32, torch.float64)
+        ):
+            for func in funcs:
+                x = func(x)
+            return x
+        array = x.numpy()
+        for func in np_funcs:
+            array = func(array)
+        return torch.from_numpy(np.ascontiguousarray(array))
 
     def forward(self, x: torch.Tensor) -> torch.Tensor:
         assert isinstance(
             x, torch.Tensor
         ), f"Unexpected input type: {type(x)}. Expected type: {torch.Tensor}"
-        return self._apply_funcs(x, self.forward_funcs)
+        return self._apply_funcs(x, self.forward_funcs, self.forward_np_funcs)
 
     def inverse(self, x: torch.Tensor) -> torch.Tensor:
         assert isinstance(
             x, torch.Tensor
         ), f"Unexpected input type: {type(x)}. Expected type: {torch.Tensor}"
-        return self._apply_funcs(x, self.inverse_funcs)
+        return self._apply_funcs(x, self.inverse_funcs, self.inverse_np_funcs)
 
 
 class Normalizer:
     valid_modes = ["q99", "mean_std", "min_max", "binary"]
 
-    def __init__(self, mode: str, statistics: dict):
+    def __init__(self, mode: str, statistics: dict, fused: bool = False):
         self.mode = mode
         self.statistics = statistics
         for key, value in self.statistics.items():
             self.statistics[key] = torch.tensor(value)
+        # With `fused`, every continuous mode is the affine map (x - offset) * scale + bias followed by an optional
+        # clamp; the per-dimension masks of degenerate statistics are folded into offset / scale / bias here instead
+        # of being applied at every call. Dimensions set to 0 are zeroed explicitly (x * 0 is NaN for inf / NaN inputs)
+        self.fused = fused
+        if fused:
+            self._compile()
+        self._kernels: dict[torch.dtype, tuple[torch.Tensor, torch.Tensor, torch.Tensor]] = {}
+
+    def _compile(self):
+        """Set the fused offset / scale / bias vectors (float64), the clamp bounds and the mask of the dimensions set
+        to 0 (None if there are none) of the mode; the vectors are None for binary and unknown modes."""
+        statistics = {key: value.to(torch.float64) for key, value in self.statistics.items()}
+        self._offset = self._scale = self._bias = self._clamp = self._zero = None
+        if self.mode in ("q99", "min_max"):
+            # Formula: 2 * (x - low) / (high - low) - 1
+            # the offset stays the low statistic itself, so that x - low is exact for close values as before
+            if self.mode == "q99":
+                low, high = statistics["q01"], statistics["q99"]
+            else:
+                low, high = statistics["min"], statistics["max"]
+            mask = low != high
+            self._offset = torch.where(mask, low, torch.zeros_like(low))
+            self._scale = torch.where(mask, 2 / (high - low), torch.ones_like(low))
+            self._bias = torch.where(mask, -torch.ones_like(low), torch.zeros_like(low))
+            # q01 == q99 keeps the original values, min == max sets them to 0
+            if self.mode == "q99":
+                self._clamp = (-1, 1)
+            elif bool((~mask).any()):
+                self._zero = ~mask
+        elif self.mode == "mean_std":
+            # Formula: (x - mean) / std, std == 0 keeps the original values
+            mask = statistics["std"] != 0
+            self._offset = torch.where(mask, statistics["mean"], torch.zeros_like(statistics["mean"]))
+            self._scale = torch.where(mask, 1 / statistics["std"], torch.ones_like(statistics["std"]))
+            self._bias = torch.zeros_like(self._offset)
+        elif self.mode == "scale":
+            # Formula: x / max(|min|, |max|), abs_max == 0 sets the values to 0
+            abs_max = torch.max(torch.abs(statistics["min"]), torch.abs(statistics["max"]))
+            mask = abs_max != 0
+            self._offset = torch.zeros_like(abs_max)
+            self._scale = torch.where(mask, 1 / abs_max, torch.ones_like(abs_max))
+            self._bias = torch.zeros_like(abs_max)
+            if bool((~mask).any()):
+                self._zero = ~mask
+
+    def _kernel(self, dtype: torch.dtype) -> tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+        """Contiguous offset / scale / bias vectors in `dtype`, converted once per dtype."""
+        if dtype not in self._kernels:
+            self._kernels[dtype] = tuple(
+                vector.to(dtype).contiguous() for vector in (self._offset, self._scale, self._bias)
+            )
+        return self._kernels[dtype]
 
     def forward(self, x: torch.Tensor) -> torch.Tensor:
         assert isinstance(
             x, torch.Tensor
         ), f"Unexpected input type: {type(x)}. Expected type: {torch.Tensor}"
 
+        if not self.fused:
+            return self._masked_forward(x)
+        if self.mode == "binary":
+            # Range of binary is [0, 1]
+            return (x > 0.5).to(x.dtype)
+        if self._scale is None:
+            raise ValueError(f"Invalid normalization mode: {self.mode}")
+
+        offset, scale, bias = self._kernel(x.dtype)
+        normalized = torch.sub(x, offset).mul_(scale).add_(bias)
+        if self._clamp is not None:
+            # Clip the normalized values, e.g. q99 to be between -1 and 1
+            normalized.clamp_(*self._clamp)
+        if self._zero is not None:
+            normalized.masked_fill_(self._zero, 0)
+        return normalized
+
+    def _masked_forward(self, x: torch.Tensor) -> torch.Tensor:
         # Normalize the tensor
         if self.mode == "q99":
             # Range of q99 is [-1, 1]
@@ -283,6 +520,9 @@ class StateActionTransform(InvertibleModalityTransform):
             If a state key in apply_to is not present in the dictionary, it will not be normalized.
         target_rotations (dict[str, str]): The target representations for each state key.
             If a state key in apply_to is not present in the dictionary, it will not be rotated.
+        fused_kernels (bool): Normalize with the precompiled offset / scale kernels and rotate CPU tensors with the
+            NumPy conversions instead of the masked normalization and pytorch3d. Check parity with
+            `scripts/eval/normalizer_kernel_benchmark.py` against the installed torch / pytorch3d before enabling it.
     """
 
     # Configurable attributes
@@ -299,6 +539,9 @@ class StateActionTransform(InvertibleModalityTransform):
     modality_metadata: dict[str, StateActionMetadata] = Field(
         default_factory=dict, description="The modality metadata for each state key."
     )
+    fused_kernels: bool = Field(
+        default=False, description="Use the precompiled normalizer kernels and NumPy rotation conversions."
+    )
 
     # Model variables
     _rotation_transformers: dict[str, RotationTransform] = PrivateAttr(default_factory=dict)
@@ -427,7 +670,7 @@ class StateActionTransform(InvertibleModalityTransform):
             # If the original representation is not the same as the target representation, initialize the rotation transformer
             if from_rep != to_rep:
                 self._rotation_transformers[key] = RotationTransform(
-                    from_rep=from_rep.value, to_rep=to_rep.value
+                    from_rep=from_rep.value, to_rep=to_rep.value, use_numpy=self.fused_kernels
                 )
 
         # Initialize the normalizers
@@ -467,7 +710,7 @@ class StateActionTransform(InvertibleModalityTransform):
             else:
                 statistics = self.normalization_statistics[key]
             self._normalizers[key] = Normalizer(
-                mode=self.normalization_modes[key], statistics=statistics
+                mode=self.normalization_modes[key], statistics=statistics, fused=self.fused_kernels
             )
 
     def apply(self, data: dict[str, Any]) -> dict[str, Any]:
@@ -12,6 +12,11 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import os
+from collections import OrderedDict
+from fractions import Fraction
+from pathlib import Path
+
 import torch  # noqa: F401 # isort: skip
 import torchvision  # noqa: F401 # isort: skip
 import av
@@ -20,30 +25,313 @@ import decord  # noqa: F401
 import numpy as np
 
 
+def _close_reader(video_backend: str, reader) -> None:
+    if video_backend == "opencv":
+        reader.release()
+    elif video_backend == "torchvision_av":
+        reader.close()
+    # decord readers are released when garbage collected
+
+
+class KeyframeIndex:
+    """
+    Presentation timestamp of every frame of a video and which frames are keyframes, read from the container
+    packets without decoding. Frames are in presentation order; `gop[i]` is the GOP (keyframe ordinal) of frame i.
+    Cached as a small `.npz` next to the dataset meta, validated against the video's size and mtime.
+    """
+
+    def __init__(self, pts: np.ndarray, is_keyframe: np.ndarray, time_base: Fraction):
+        order = np.argsort(pts, kind="stable")
+        self.pts = np.asarray(pts, dtype=np.int64)[order]
+        self.is_keyframe = np.asarray(is_keyframe, dtype=bool)[order]
+        self.time_base = Fraction(time_base)
+        self.frame_timestamps = self.pts * float(self.time_base)
+        self.gop = np.maximum(np.cumsum(self.is_keyframe) - 1, 0)
+        self.keyframe_pts = self.pts[self.is_keyframe] if self.is_keyframe.any() else self.pts[:1].copy()
+        # frames before the first keyframe (if any) are decoded from the start of the stream
+        self.keyframe_pts[0] = self.pts[0]
+
+    def __len__(self) -> int:
+        return len(self.pts)
+
+    @classmethod
+    def from_video(cls, video_path: str) -> "KeyframeIndex":
+        with av.open(video_path) as container:
+            stream = container.streams.video[0]
+            packets = [(packet.pts, packet.is_keyframe) for packet in container.demux(stream) if packet.pts is not None]
+            time_base = stream.time_base
+        assert len(packets) > 0, f"No video packets in {video_path}"
+        pts, is_keyframe = zip(*packets)
+        return cls(np.array(pts), np.array(is_keyframe), time_base)
+
+    @staticmethod
+    def _video_stat(video_path: str) -> np.ndarray:
+        stat = os.stat(video_path)
+        return np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+
+    @classmethod
+    def load(cls, path: Path | str, video_path: str) -> "KeyframeIndex | None":
+        """Cached index of `video_path`, None if missing or the video changed since it was built."""
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as cached:
+            if not np.array_equal(cached["video_stat"], cls._video_stat(video_path)):
+                return None
+            return cls(cached["pts"], cached["is_keyframe"], Fraction(*cached["time_base"].tolist()))
+
+    def save(self, path: Path | str, video_path: str) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + f".tmp{os.getpid()}")
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                pts=self.pts,
+                is_keyframe=self.is_keyframe,
+                time_base=np.array([self.time_base.numerator, self.time_base.denominator], dtype=np.int64),
+                video_stat=self._video_stat(video_path),
+            )
+        os.replace(tmp_path, path)
+
+
+# An open decord.VideoReader keeps its decoder thread polling (about 40% of a core per idle reader), so more than
+# one per process costs more CPU than re-opening saves; the other backends do not use CPU while idle.
+MAX_OPEN_READERS_PER_BACKEND = {"decord": 1}
+
+
+class VideoReaderPool:
+    """
+    Per-process pool of open video readers and of per-file frame timestamps.
+
+    Readers are kept open across samples (at most `max_open_readers`, and `MAX_OPEN_READERS_PER_BACKEND`;
+    least recently used ones are closed first), so consecutive samples of the same episode do not re-open the
+    container, re-parse its index and re-create the decoder. The frame timestamps of a file are read once and kept
+    (bounded by `max_cached_timestamps` files).
+    Use `get_video_reader_pool()` to get the pool of the calling process: readers are never shared over a fork.
+    """
+
+    def __init__(self, max_open_readers: int = 8, max_cached_timestamps: int = 4096):
+        self.max_open_readers = max_open_readers
+        self.max_cached_timestamps = max_cached_timestamps
+        self._readers: OrderedDict = OrderedDict()
+        self._frame_timestamps: OrderedDict = OrderedDict()
+        self._keyframe_indices: OrderedDict = OrderedDict()
+        self.opened = self.reused = 0
+
+    @staticmethod
+    def _key(video_path: str, video_backend: str, video_backend_kwargs: dict) -> tuple:
+        return video_path, video_backend, repr(sorted(video_backend_kwargs.items()))
+
+    def reader(self, video_path: str, video_backend: str, video_backend_kwargs: dict = {}):
+        """Open reader of `video_path` (decord.VideoReader, cv2.VideoCapture or torchvision.io.VideoReader)."""
+        key = self._key(video_path, video_backend, video_backend_kwargs)
+        if key in self._readers:
+            self._readers.move_to_end(key)
+            self.reused += 1
+            return self._readers[key]
+        reader = open_video_reader(video_path, video_backend, video_backend_kwargs)
+        self.opened += 1
+        backend_limit = MAX_OPEN_READERS_PER_BACKEND.get(video_backend, self.max_open_readers)
+        backend_limit = min(self.max_open_readers, backend_limit)
+        if backend_limit > 0:
+            open_keys = [open_key for open_key in self._readers if open_key[1] == video_backend]
+            for open_key in open_keys[: max(len(open_keys) + 1 - backend_limit, 0)]:
+                _close_reader(video_backend, self._readers.pop(open_key))
+            self._readers[key] = reader
+            self.resize(self.max_open_readers)
+        return reader
+
+    def release(self, video_path: str, video_backend: str, video_backend_kwargs: dict, reader) -> None:
+        """Close a reader that `reader()` did not keep open (pool disabled)."""
+        if self._readers.get(self._key(video_path, video_backend, video_backend_kwargs)) is not reader:
+            _close_reader(video_backend, reader)
+
+    def frame_timestamps(self, video_path: str, video_backend: str, video_backend_kwargs: dict = {}) -> np.ndarray:
+        """Start time (seconds) of every frame of `video_path`, read once per file."""
+        key = self._key(video_path, video_backend, video_backend_kwargs)
+        if key in self._frame_timestamps:
+            self._frame_timestamps.move_to_end(key)
+            return self._frame_timestamps[key]
+        reader = self.reader(video_path, video_backend, video_backend_kwargs)
+        if video_backend == "decord":
+            # Only take the first column, which corresponds to start_seconds
+            frame_ts = np.ascontiguousarray(reader.get_frame_timestamp(range(len(reader)))[:, 0])
+        elif video_backend == "opencv":
+            num_frames = int(reader.get(cv2.CAP_PROP_FRAME_COUNT))
+            frame_ts = np.arange(num_frames) / reader.get(cv2.CAP_PROP_FPS)
+        elif video_backend == "torchvision_av":
+            frame_ts = self.keyframe_index(video_path).frame_timestamps
+        else:
+            raise NotImplementedError(f"Frame timestamps are not available for video backend {video_backend}")
+        self.release(video_path, video_backend, video_backend_kwargs, reader)
+        self._frame_timestamps[key] = frame_ts
+        while len(self._frame_timestamps) > self.max_cached_timestamps:
+            self._frame_timestamps.popitem(last=False)
+        return frame_ts
+
+    def keyframe_index(self, video_path: str, cache_path: Path | str | None = None) -> KeyframeIndex:
+        """Keyframe index of `video_path`, read from / written to `cache_path` when given, built once per file."""
+        if video_path in self._keyframe_indices:
+            self._keyframe_indices.move_to_end(video_path)
+            return self._keyframe_indices[video_path]
+        keyframe_index = KeyframeIndex.load(cache_path, video_path) if cache_path is not None else None
+        if keyframe_index is None:
+            keyframe_index = KeyframeIndex.from_video(video_path)
+            if cache_path is not None:
+                try:
+                    keyframe_index.save(cache_path, video_path)
+                except OSError as e:  # e.g. read-only dataset directory, keep the in-memory index only
+                    print(f"Could not cache the keyframe index of {video_path} in {cache_path}: {e}")
+        self._keyframe_indices[video_path] = keyframe_index
+        while len(self._keyframe_indices) > self.max_cached_timestamps:
+            self._keyframe_indices.popitem(last=False)
+        return keyframe_index
+
+    def resize(self, max_open_readers: int) -> None:
+        """Change the number of open readers, closing the least recently used ones."""
+        self.max_open_readers = max_open_readers
+        while len(self._readers) > max(max_open_readers, 0):
+            (_, video_backend, _), reader = self._readers.popitem(last=False)
+            _close_reader(video_backend, reader)
+
+    def close(self) -> None:
+        for (_, video_backend, _), reader in self._readers.items():
+            _close_reader(video_backend, reader)
+        self._readers.clear()
+        self._frame_timestamps.clear()
+        self._keyframe_indices.clear()
+
+    def stats(self) -> dict:
+        return {"open_readers": len(self._readers), "opened": self.opened, "reused": self.reused}
+
+
+_reader_pool: VideoReaderPool | None = None
+_reader_pool_pid: int | None = None
+_inherited_reader_pools: list[VideoReaderPool] = []
+
+
+def get_video_reader_pool(max_open_readers: int | None = None) -> VideoReaderPool:
+    """
+    Video reader pool of the calling process (each dataloader worker gets its own after the fork).
+
+    Args:
+        max_open_readers (int, optional): Resize the pool; 0 opens and closes a reader for every call.
+    """
+    global _reader_pool, _reader_pool_pid
+    if _reader_pool is None or _reader_pool_pid != os.getpid():
+        # readers inherited from the parent process share its file offsets and decoder state: never use them, and
+        # never close them either (decord joins decoder threads that do not exist after a fork and hangs)
+        inherited = _reader_pool
+        _reader_pool = VideoReaderPool()
+        _reader_pool_pid = os.getpid()
+        if inherited is not None:
+            _inherited_reader_pools.append(inherited)
+            _reader_pool._frame_timestamps = inherited._frame_timestamps.copy()
+            _reader_pool._keyframe_indices = inherited._keyframe_indices.copy()
+    if max_open_readers is not None and max_open_readers != _reader_pool.max_open_readers:
+        _reader_pool.resize(max_open_readers)
+    return _reader_pool
+
+
+def open_video_reader(video_path: str, video_backend: str, video_backend_kwargs: dict = {}):
+    if video_backend == "decord":
+        return decord.VideoReader(video_path, **video_backend_kwargs)
+    elif video_backend == "opencv":
+        cap = cv2.VideoCapture(video_path, **video_backend_kwargs)
+        if not cap.isOpened():
+            raise ValueError(f"Unable to open video file: {video_path}")
+        return cap
+    elif video_backend == "torchvision_av":
+        # decoded with PyAV directly (the backend of torchvision.io.VideoReader, which newer torchvision dropped);
+        # the kwargs go to av.open (e.g. options={...} for the demuxer), like they go to the other backends' readers
+        return av.open(video_path, **video_backend_kwargs)
+    else:
+        raise NotImplementedError(f"Video backend {video_backend} not implemented")
+
+
+def nearest_frame_indices(frame_ts: np.ndarray, timestamps: list[float] | np.ndarray) -> np.ndarray:
+    """Index of the closest frame to every timestamp, by binary search over the (sorted) frame timestamps.
+    Same result as `np.abs(frame_ts[:, None] - timestamps).argmin(axis=0)`, ties going to the earlier frame."""
+    timestamps = np.asarray(timestamps)
+    dtype = np.result_type(frame_ts.dtype, timestamps.dtype)
+    frame_ts, timestamps = frame_ts.astype(dtype, copy=False), timestamps.astype(dtype, copy=False)
+    if len(frame_ts) < 2:
+        return np.zeros(timestamps.shape, dtype=np.int64)
+    right = np.clip(np.searchsorted(frame_ts, timestamps, side="left"), 1, len(frame_ts) - 1)
+    left = right - 1
+    closer_right = np.abs(frame_ts[right] - timestamps) < np.abs(frame_ts[left] - timestamps)
+    return np.where(closer_right, right, left)
+
+
+def _read_opencv_frames(cap: cv2.VideoCapture, indices: list[int] | np.ndarray) -> np.ndarray:
+    frames = []
+    for idx in indices:
+        # seeking decodes from the previous key frame, skip it when the next frame is the requested one
+        if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) != idx:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
+        ret, frame = cap.read()
+        if not ret:
+            raise ValueError(f"Unable to read frame at index {idx}")
+        frames.append(frame)
+    return np.array(frames)
+
+
+def decode_frames_at_indices(
+    container: av.container.InputContainer, keyframe_index: KeyframeIndex, indices: list[int] | np.ndarray
+) -> np.ndarray:
+    """
+    Decode exactly the frames at `indices` (positions in presentation order) as RGB (T, H, W, C).
+
+    Requested frames are visited in order: the decoder seeks to the keyframe of the GOP of the next frame and
+    decodes forward only up to it. Frames in the same or the following GOP are reached by decoding on instead of
+    seeking again, so requests sharing a GOP are decoded in one pass.
+    """
+    stream = container.streams.video[0]
+    wanted = np.unique(indices)
+    assert len(wanted) > 0 and wanted[0] >= 0 and wanted[-1] < len(keyframe_index), f"Invalid frame indices {indices}"
+    decoded = {}
+    next_wanted = 0
+    while next_wanted < len(wanted):
+        gop = keyframe_index.gop[wanted[next_wanted]]
+        container.seek(int(keyframe_index.keyframe_pts[gop]), stream=stream, backward=True, any_frame=False)
+        for frame in container.decode(stream):
+            if frame.pts is None:
+                continue
+            position = int(np.searchsorted(keyframe_index.pts, frame.pts))
+            if position >= len(keyframe_index) or keyframe_index.pts[position] != frame.pts:
+                continue
+            if position == wanted[next_wanted]:
+                decoded[position] = frame.to_ndarray(format="rgb24")
+                next_wanted += 1
+            elif position > wanted[next_wanted]:
+                missing = wanted[next_wanted]
+                raise ValueError(f"Frame {missing} (pts {keyframe_index.pts[missing]}) was not decoded")
+            if next_wanted == len(wanted):
+                break
+            if keyframe_index.gop[wanted[next_wanted]] > keyframe_index.gop[position] + 1:
+                break  # seeking is cheaper than decoding the GOPs in between
+        else:
+            raise ValueError(f"Reached the end of the stream before frame {wanted[next_wanted]}")
+    return np.stack([decoded[int(index)] for index in indices])
+
+
 def get_frames_by_indices(
     video_path: str,
     indices: list[int] | np.ndarray,
     video_backend: str = "decord",
     video_backend_kwargs: dict = {},
+    max_open_readers: int | None = None,
 ) -> np.ndarray:
+    if video_backend not in ["decord", "opencv"]:
+        raise NotImplementedError
+    pool = get_video_reader_pool(max_open_readers)
+    reader = pool.reader(video_path, video_backend, video_backend_kwargs)
     if video_backend == "decord":
-        vr = decord.VideoReader(video_path, **video_backend_kwargs)
-        frames = vr.get_batch(indices)
-        return frames.asnumpy()
-    elif video_backend == "opencv":
-        frames = []
-        cap = cv2.VideoCapture(video_path, **video_backend_kwargs)
-        for idx in indices:
-            cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
-            ret, frame = cap.read()
-            if not ret:
-                raise ValueError(f"Unable to read frame at index {idx}")
-            frames.append(frame)
-        cap.release()
-        frames = np.array(frames)
-        return frames
+        frames = reader.get_batch(indices).asnumpy()
     else:
-        raise NotImplementedError
+        frames = _read_opencv_frames(reader, indices)
+    pool.release(video_path, video_backend, video_backend_kwargs, reader)
+    return frames
 
 
 def get_frames_by_timestamps(
@@ -51,76 +339,34 @@ def get_frames_by_timestamps(
     timestamps: list[float] | np.ndarray,
     video_backend: str = "decord",
     video_backend_kwargs: dict = {},
+    max_open_readers: int | None = None,
+    keyframe_index_path: Path | str | None = None,
 ) -> np.ndarray:
     """Get frames from a video at specified timestamps.
     Args:
         video_path (str): Path to the video file.
         timestamps (list[int] | np.ndarray): Timestamps to retrieve frames for, in seconds.
         video_backend (str, optional): Video backend to use. Defaults to "decord".
+        max_open_readers (int, optional): Size of the per-process reader pool (see `VideoReaderPool`),
+            None keeps the current size, 0 opens and closes the video for every call.
+        keyframe_index_path (Path | str, optional): Cache file of the video's keyframe index (torchvision_av).
     Returns:
         np.ndarray: Frames at the specified timestamps.
     """
-    if video_backend == "decord":
-        vr = decord.VideoReader(video_path, **video_backend_kwargs)
-        num_frames = len(vr)
-        # Retrieve the timestamps for each frame in the video
-        frame_ts: np.ndarray = vr.get_frame_timestamp(range(num_frames))
-        # Map each requested timestamp to the closest frame index
-        # Only take the first element of the frame_ts array which corresponds to start_seconds
-        indices = np.abs(frame_ts[:, :1] - timestamps).argmin(axis=0)
-        frames = vr.get_batch(indices)
-        return frames.asnumpy()
-    elif video_backend == "opencv":
-        # Open the video file
-        cap = cv2.VideoCapture(video_path, **video_backend_kwargs)
-        if not cap.isOpened():
-            raise ValueError(f"Unable to open video file: {video_path}")
-        # Retrieve the total number of frames
-        num_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        # Calculate timestamps for each frame
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        frame_ts = np.arange(num_frames) / fps
-        frame_ts = frame_ts[:, np.newaxis]  # Reshape to (num_frames, 1) for broadcasting
+    pool = get_video_reader_pool(max_open_readers)
+    if video_backend in ["decord", "opencv"]:
         # Map each requested timestamp to the closest frame index
-        indices = np.abs(frame_ts - timestamps).argmin(axis=0)
-        frames = []
-        for idx in indices:
-            cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
-            ret, frame = cap.read()
-            if not ret:
-                raise ValueError(f"Unable to read frame at index {idx}")
-            frames.append(frame)
-        cap.release()
-        frames = np.array(frames)
-        return frames
+        frame_ts = pool.frame_timestamps(video_path, video_backend, video_backend_kwargs)
+        indices = nearest_frame_indices(frame_ts, timestamps)
+        return get_frames_by_indices(video_path, indices, video_backend, video_backend_kwargs)
     elif video_backend == "torchvision_av":
-        # set backend
-        torchvision.set_video_backend("pyav")
-        # set a video stream reader
-        reader = torchvision.io.VideoReader(video_path, "video")
-        # set the first and last requested timestamps
-        # Note: previous timestamps are usually loaded, since we need to access the previous key frame
-        first_ts = timestamps[0]
-        last_ts = timestamps[-1]
-        # access closest key frame of the first requested frame
-        # Note: closest key frame timestamp is usally smaller than `first_ts` (e.g. key frame can be the first frame of the video)
-        # for details on what `seek` is doing see: https://pyav.basswood-io.com/docs/stable/api/container.html?highlight=inputcontainer#av.container.InputContainer.seek
-        reader.seek(first_ts, keyframes_only=True)
-        # load all frames until last requested frame
-        loaded_frames = []
-        loaded_ts = []
-        for frame in reader:
-            current_ts = frame["pts"]
-            loaded_frames.append(frame["data"])
-            loaded_ts.append(current_ts)
-            if current_ts >= last_ts:
-                break
-            if len(loaded_frames) >= len(timestamps):
-                break
-        reader.container.close()
-        reader = None
-        frames = np.array(loaded_frames)
-        return frames.transpose(0, 2, 3, 1)
+        # only the GOPs holding the requested frames are decoded, see `decode_frames_at_indices`
+        keyframe_index = pool.keyframe_index(video_path, keyframe_index_path)
+        indices = nearest_frame_indices(keyframe_index.frame_timestamps, timestamps)
+        container = pool.reader(video_path, video_backend, video_backend_kwargs)
+        frames = decode_frames_at_indices(container, keyframe_index, indices)
+        pool.release(video_path, video_backend, video_backend_kwargs, container)
+        return frames
     else:
         raise NotImplementedError
 
@@ -1,6 +1,7 @@
 from pathlib import Path
 from typing import Sequence
 from omegaconf import OmegaConf
+import torch.distributed as dist
 
 from InternVLA.dataloader.gr00t_lerobot.datasets import LeRobotSingleDataset, LeRobotMixtureDataset
 from InternVLA.dataloader.gr00t_lerobot.mixtures import DATASET_NAMED_MIXTURES
@@ -15,6 +16,10 @@ def make_LeRobotSingleDataset(
     data_name: str,
     robot_type: str,  # 新增参数
     delete_pause_frame: bool = False,
+    trajectory_cache_mb: float = 64,
+    use_columnar_store: bool = True,
+    video_reader_pool_size: int = 8,
+    use_frame_store: bool = False,
 ) -> LeRobotSingleDataset:
     """
     Make a LeRobotSingleDataset object.
@@ -23,6 +28,10 @@ def make_LeRobotSingleDataset(
     :param data_name: The name of the dataset.
     :param robot_type: The robot type config to use.
     :param crop_obs_camera: Whether to crop the observation camera images.
+    :param trajectory_cache_mb: Per-worker budget of the decoded trajectory cache.
+    :param use_columnar_store: Read low-dimensional data from the dataset's columnar store when it exists.
+    :param video_reader_pool_size: Video readers kept open per dataloader worker.
+    :param use_frame_store: Read video frames from the dataset's pre-resized frame store when it exists.
     :return: A LeRobotSingleDataset object.
     """
     
@@ -42,6 +51,10 @@ def make_LeRobotSingleDataset(
         embodiment_tag=embodiment_tag,
         video_backend="torchvision_av",
         delete_pause_frame=delete_pause_frame,
+        trajectory_cache_mb=trajectory_cache_mb,
+        use_columnar_store=use_columnar_store,
+        video_reader_pool_size=video_reader_pool_size,
+        use_frame_store=use_frame_store,
     )
 
 def get_vla_dataset(
@@ -58,6 +71,16 @@ def get_vla_dataset(
     """
     data_root_dir = data_cfg.data_root_dir
     data_mix = data_cfg.data_mix
+    trajectory_cache_mb = data_cfg.get("trajectory_cache_mb", 64)
+    use_columnar_store = data_cfg.get("use_columnar_store", True)
+    video_reader_pool_size = data_cfg.get("video_reader_pool_size", 8)
+    use_frame_store = data_cfg.get("use_frame_store", False)
+    locality_run_length = data_cfg.get("locality_run_length", 1)
+    # opt-in cache of the merged mixture statistics, keyed by their inputs (see LeRobotMixtureDataset.update_metadata)
+    statistics_cache_dir = data_cfg.get("statistics_cache_dir", None)
+    # batch g is built by dataloader worker g mod (num_workers x world size), see TrajectoryBlockSampler
+    world_size = dist.get_world_size() if dist.is_available() and dist.is_initialized() else 1
+    batch_stride = data_cfg.get("num_workers", 8) * world_size
     mixture_spec = DATASET_NAMED_MIXTURES[data_mix]
     included_datasets, filtered_mixture_spec = set(), []
     for d_name, d_weight, robot_type in mixture_spec:  
@@ -71,7 +94,17 @@ def get_vla_dataset(
 
     dataset_mixture = []
     for d_name, d_weight, robot_type in filtered_mixture_spec:
-        dataset_mixture.append((make_LeRobotSingleDataset(Path(data_root_dir), d_name, robot_type, delete_pause_frame=delete_pause_frame), d_weight))
+        dataset = make_LeRobotSingleDataset(
+            Path(data_root_dir),
+            d_name,
+            robot_type,
+            delete_pause_frame=delete_pause_frame,
+            trajectory_cache_mb=trajectory_cache_mb,
+            use_columnar_store=use_columnar_store,
+            video_reader_pool_size=video_reader_pool_size,
+            use_frame_store=use_frame_store,
+        )
+        dataset_mixture.append((dataset, d_weight))
 
     return LeRobotMixtureDataset(
         dataset_mixture,
@@ -79,6 +112,10 @@ def get_vla_dataset(
         balance_dataset_weights=balance_dataset_weights,
         balance_trajectory_weights=balance_trajectory_weights,
         seed=seed,
+        locality_run_length=locality_run_length,
+        batch_size=data_cfg.get("per_device_batch_size", 1),
+        batch_stride=batch_stride,
+        statistics_cache_dir=statistics_cache_dir,
         **kwargs,
     )
 
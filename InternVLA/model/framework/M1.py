@@ -10,12 +10,11 @@ Primary goal: predict continuous future actions conditioned on multi-view images
 
 from typing import List
 from tqdm import tqdm
-from typing import List, Optional, Tuple
+from typing import Callable, List, Optional, Tuple, Union
 import torch
 import torch.nn as nn
 import numpy as np
 from PIL import Image
-from qwen_vl_utils import process_vision_info
 
 
 from InternVLA.training.trainer_utils import initialize_overwatch
@@ -26,9 +25,13 @@ logger = initialize_overwatch(__name__)
 IGNORE_INDEX = -100
 
 from InternVLA.model.framework.base_framework import baseframework
+from InternVLA.model.framework.feature_cache import FeatureCache
+from InternVLA.model.framework.sample_selection import select_action_samples
 from InternVLA.model.modules.vlm.QWen2_5 import get_qwen2_5_interface
+from InternVLA.model.modules.vlm.token_reduction import merge_tokens_to_budget
 from InternVLA.model.modules.projector.QFormer import get_layerwise_qformer
 from InternVLA.model.modules.action_model.DiTActionHeader import get_action_model
+from InternVLA.model.modules.action_model.FlowMatchingActionHeader import get_flow_matching_action_model
 from InternVLA.model.modules.dino_model.dino import get_dino_model
 from InternVLA.training.trainer_utils.metrics import resize_images
 
@@ -62,7 +65,11 @@ class InternVLA_M1(baseframework):
         self.config = config
         self.qwen_vl_interface = get_qwen2_5_interface(config=self.config)
         self.layer_qformer = get_layerwise_qformer(config=self.config)
-        self.action_model = get_action_model(config=self.config)
+        self.action_head_type = config.framework.action_model.get("action_head_type", "diffusion")
+        if self.action_head_type == "flow_matching":
+            self.action_model = get_flow_matching_action_model(config=self.config)
+        else:
+            self.action_model = get_action_model(config=self.config)
         self.dino_encoder = get_dino_model(
             backone_name=getattr(self.config.framework.dino, "dino_backbone", "dinov2_vits14")
         )
@@ -70,6 +77,11 @@ class InternVLA_M1(baseframework):
             in_features=self.dino_encoder.num_channels, out_features=self.qwen_vl_interface.model.config.hidden_size
         )
 
+        # optional visual token budgets (per view): Qwen image tokens before the decoder, DINO patches before QFormer
+        self.visual_token_budget = config.framework.qwenvl.get("visual_token_budget", None)
+        self.dino_token_budget = config.framework.dino.get("token_budget", None)
+        self.feature_cache = None  # opt-in, see enable_feature_cache
+
         self.future_action_window_size = config.framework.action_model.future_action_window_size
         self.past_action_window_size = config.framework.action_model.past_action_window_size
 
@@ -113,6 +125,7 @@ class InternVLA_M1(baseframework):
                 output_attentions=False,
                 output_hidden_states=True,
                 return_dict=True,
+                visual_token_budget=self.visual_token_budget,
             )
             pass
 
@@ -120,6 +133,8 @@ class InternVLA_M1(baseframework):
         image_tensors = self.dino_encoder.prepare_dino_input(batch_images)  #
         B = len(batch_images)
         dino_features = self.dino_encoder(image_tensors)  # DINO output is [B*num_view, token, dim]
+        if self.dino_token_budget is not None:
+            dino_features, _ = merge_tokens_to_budget(dino_features, self.dino_token_budget)  # [B*num_view, budget, dim]
         dino_encoded_features = dino_features.reshape(B, -1, dino_features.shape[-1])  # [B, num_view * token, dim]
         dino_encoded_features = self.dino_pro(dino_encoded_features)  # [B, num_view * token, hidden_size]
 
@@ -145,20 +160,19 @@ class InternVLA_M1(baseframework):
             actions = torch.tensor(np.array(actions), device=action_condition.device)  # [B, chunk, 7]
             actions_future = actions[:, -(self.future_action_window_size + 1) :, :]
 
-            # tips: Repeat 'actions' 'repeated_diffusion_steps' times, resulting in [repeated_diffusion_steps*B, T, D]
+            # tips: noise every sample 'repeated_diffusion_steps' times, resulting in [repeated_diffusion_steps*B, T, D];
+            # the action head broadcasts the [B, 64, D_action] condition over the copies instead of repeating it
             repeated_diffusion_steps = (
                 self.config.trainer.get("repeated_diffusion_steps", 4) if self.config and self.config.trainer else 4
             )
-            actions_repeated = actions_future.repeat(repeated_diffusion_steps, 1, 1)
-            action_condition = action_condition.repeat(
-                repeated_diffusion_steps, 1, 1
-            )  # [repeated_diffusion_steps*B, T, D_action]
 
             # DiT noise add and predict
-            noise_pred, noise, timestep = self.action_model(actions_repeated, action_condition)
+            noise_pred, noise, timestep = self.action_model(
+                actions_future, action_condition, repeat=repeated_diffusion_steps
+            )
 
             # perdition loss
-            action_loss = self.action_model.loss(noise_pred, noise)
+            action_loss = self.action_model.loss(noise_pred, noise, timestep)
 
         return {"action_loss": action_loss}
 
@@ -170,6 +184,14 @@ class InternVLA_M1(baseframework):
         cfg_scale: float = 1.5,
         use_ddim: bool = False,
         num_ddim_steps: int = 5,
+        sampler_type: str = "ddim",
+        init_actions: Optional[np.ndarray] = None,
+        warm_start_strength: float = 0.5,
+        vlm_condition_features: Optional[Tuple[torch.Tensor, ...]] = None,
+        return_vlm_features: bool = False,
+        num_samples: int = 1,
+        sample_selection: Union[str, Callable] = "medoid",
+        reference_actions: Optional[np.ndarray] = None,
         **kwargs: str,
     ) -> np.ndarray:
         """
@@ -177,7 +199,8 @@ class InternVLA_M1(baseframework):
 
         Steps:
           1. Resize images to training resolution (if specified)
-          2. Encode with QwenVL (hidden states retained)
+          2. Encode with QwenVL (hidden states retained; skipped when cached features are passed in)
+             (steps 2-4 are looked up instead when the feature cache is enabled)
           3. Extract DINO tokens and project to vlm hidden size
           4. Build multi-layer fused QwenVL and DINO features via QFormer
           5. Run diffusion sampling (DDIM optional, CFG optional)
@@ -187,13 +210,33 @@ class InternVLA_M1(baseframework):
             batch_images: List of samples; each sample is List[PIL.Image] (multi-view).
             instructions: List[str] natural language task instructions.
             cfg_scale: >1 enables classifier-free guidance (scales conditional vs unconditional).
-            use_ddim: Whether to use DDIM deterministic sampling.
-            num_ddim_steps: Number of DDIM steps if enabled.
+            use_ddim: Whether to use fast few-step sampling (see sampler_type).
+            num_ddim_steps: Number of sampling steps (model evaluations) if enabled; the number of Euler steps of
+                the flow-matching head (its fm_head_config num_inference_timesteps when use_ddim is False).
+            sampler_type: Few-step sampler, one of {"ddim", "dpm_solver++"}; the flow-matching head only accepts
+                "ddim" (Euler steps).
+            init_actions: Optional [B, T, action_dim] normalized chunk to warm-start DDIM from (e.g. the previous
+                chunk shifted by the executed steps). It is noised with q_sample and only the remaining steps are run.
+                DDIM only: raises with sampler_type="dpm_solver++" and with the flow-matching head.
+            warm_start_strength: Fraction in (0, 1] of the DDIM steps re-run from init_actions (1.0 ~ cold start).
+            vlm_condition_features: Optional cached QwenVL hidden states (as returned with return_vlm_features).
+                When given, the QwenVL forward is skipped; DINO, QFormer and the action head still run.
+            return_vlm_features: Also return the QwenVL hidden states used for conditioning.
+            num_samples: Best-of-N sampling: the condition is computed once and expanded across N noise draws
+                denoised in one batched loop; one chunk per sample is then picked by `sample_selection`.
+            sample_selection: "medoid", "closest_to_previous" or a scorer (samples [B, N, T, D], reference) -> [B, N]
+                (higher is better), see sample_selection.py.
+            reference_actions: Optional [B, T, action_dim] reference chunk for the selection
+                (defaults to init_actions).
             **kwargs: Reserved.
 
         Returns:
             dict:
                 normalized_actions (np.ndarray): Shape [B, T, action_dim], diffusion-sampled normalized actions.
+                vlm_condition_features (tuple[torch.Tensor]): Only if return_vlm_features, per-layer [B, L, D] states.
+                all_normalized_actions (np.ndarray): Only if num_samples > 1, [B, N, T, action_dim] all samples.
+                sample_scores (np.ndarray): Only if num_samples > 1, [B, N] selection scores.
+                selected_sample_index (np.ndarray): Only if num_samples > 1, [B] index of the returned sample.
         """
         # align obs and lang
         train_obs_image_size = getattr(self.config.datasets.vla_data, "image_size", None)
@@ -201,39 +244,27 @@ class InternVLA_M1(baseframework):
             batch_images = resize_images(batch_images, target_size=train_obs_image_size)
         instructions = [instruction.lower() for instruction in instructions]
 
-        inferface_inputs = self.qwen_vl_interface.build_qwenvl_inputs(images=batch_images, instructions=instructions)
-        qwen_inputs = inferface_inputs
-
-        with torch.autocast("cuda", dtype=torch.bfloat16):
-            qwenvl_outputs = self.qwen_vl_interface(
-                **qwen_inputs,
-                output_hidden_states=True,
-                return_dict=True,
+        if self.feature_cache is not None and vlm_condition_features is None and not return_vlm_features:
+            action_condition_feature = self.feature_cache.get_or_compute(
+                batch_images,
+                instructions,
+                lambda images, texts: self.encode_action_condition(images, texts)[0],
+                device=next(self.action_model.parameters()).device,
+            )  # [B, 64, D_action]
+        else:
+            action_condition_feature, vlm_condition_features = self.encode_action_condition(
+                batch_images, instructions, vlm_condition_features
             )
 
-            B = len(batch_images)
-            image_tensors = self.dino_encoder.prepare_dino_input(batch_images)
-            dino_features = self.dino_encoder(image_tensors)
-
-            B = len(batch_images)
-            dino_encoded_features = dino_features.reshape(B, -1, dino_features.shape[-1])  # [B, num_view * token, dim]
-            dino_encoded_features = self.dino_pro(dino_encoded_features)  # [B, 256, D]
+        assert num_samples >= 1, f"num_samples must be >= 1, got {num_samples}"
+        if num_samples > 1:
+            # best-of-N: only the action head runs per sample
+            action_condition_feature = action_condition_feature.repeat_interleave(num_samples, dim=0)  # [B*N, 64, D]
+            if init_actions is not None:
+                init_actions = np.repeat(init_actions, num_samples, axis=0)
 
         with torch.autocast("cuda", dtype=torch.float32):
 
-            start_layer = self.config.framework.layer_qformer.qformer_start_layer
-            end_layer = self.config.framework.layer_qformer.qformer_end_layer
-            condition_features = qwenvl_outputs.hidden_states[start_layer:end_layer]
-            cat_conditions = []
-            for layer_index in range(len(condition_features)):
-                layer_features = condition_features[layer_index]  # [B, n_qformer_token, D]
-                layer_features = torch.cat(
-                    [layer_features, dino_encoded_features], dim=1
-                )  # [B, n_qformer_token + num_view * token, D]
-                cat_conditions.append(layer_features)
-
-            action_condition_feature = self.layer_qformer(cat_conditions)  # [B, 64, D_action]
-
             using_cfg = cfg_scale > 1.0
 
             model_dtype = next(self.action_model.net.parameters()).dtype
@@ -266,10 +297,50 @@ class InternVLA_M1(baseframework):
                 model_kwargs = dict(z=action_condition_feature)
                 sample_fn = self.action_model.net.forward
 
+            # cross-attention DiT: condition keys / values are shared by all denoising steps and both CFG branches
+            if hasattr(self.action_model.net, "precompute_condition"):
+                model_kwargs["cond_kv"] = self.action_model.net.precompute_condition(model_kwargs["z"])
+
+            assert sampler_type in ("ddim", "dpm_solver++"), f"Unknown sampler_type: {sampler_type}"
+            # Flow-matching head: few-step Euler integration, num_ddim_steps Euler steps when use_ddim is set
+            # (num_inference_timesteps from fm_head_config otherwise)
+            if self.action_head_type == "flow_matching":
+                if sampler_type != "ddim":
+                    raise ValueError(f"The flow-matching head samples with Euler steps, got sampler_type={sampler_type}")
+                if init_actions is not None:
+                    raise ValueError("init_actions / warm_start_strength (warm start) are only supported with DDIM")
+                num_steps = num_ddim_steps if use_ddim else None
+                samples = self.action_model.sample_loop(sample_fn, noise, model_kwargs=model_kwargs, num_steps=num_steps)
+            # DPM-Solver++ Sampling (multistep, on the full diffusion schedule)
+            elif use_ddim and num_ddim_steps is not None and sampler_type == "dpm_solver++":
+                if init_actions is not None:
+                    raise ValueError("init_actions / warm_start_strength (warm start) are only supported with DDIM")
+                samples = self.action_model.diffusion.dpm_solver_sample_loop(
+                    sample_fn,
+                    noise.shape,
+                    noise,
+                    num_steps=num_ddim_steps,
+                    clip_denoised=False,
+                    model_kwargs=model_kwargs,
+                    progress=False,
+                    device=action_condition_feature.device,
+                )
             # DDIM Sampling
-            if use_ddim and num_ddim_steps is not None:
-                if self.action_model.ddim_diffusion is None:
+            elif use_ddim and num_ddim_steps is not None:
+                if self.action_model.ddim_diffusion is None or self.action_model.ddim_step != num_ddim_steps:
                     self.action_model.create_ddim(ddim_step=num_ddim_steps)
+                start_timestep = None
+                # Warm start: noise the previous chunk to an intermediate DDIM step and denoise from there
+                if init_actions is not None:
+                    assert 0.0 < warm_start_strength <= 1.0, (
+                        f"warm_start_strength must be in (0, 1], got {warm_start_strength}"
+                    )
+                    start_timestep = max(int(round(warm_start_strength * num_ddim_steps)) - 1, 0)
+                    init = torch.as_tensor(init_actions, device=noise.device, dtype=noise.dtype)
+                    if using_cfg:
+                        init = torch.cat([init, init], 0)
+                    t_start = torch.full((noise.shape[0],), start_timestep, device=noise.device, dtype=torch.long)
+                    noise = self.action_model.ddim_diffusion.q_sample(init, t_start, noise=noise).to(model_dtype)
                 samples = self.action_model.ddim_diffusion.ddim_sample_loop(
                     sample_fn,
                     noise.shape,
@@ -279,13 +350,124 @@ class InternVLA_M1(baseframework):
                     progress=False,
                     device=action_condition_feature.device,
                     eta=0.0,
+                    start_timestep=start_timestep,
                 )
 
             if using_cfg:
                 samples, _ = samples.chunk(2, dim=0)  # Remove null class samples
             normalized_actions = samples.cpu().numpy()
 
-        return {"normalized_actions": normalized_actions}  # [B, T, action_dim]
+        output = {}
+        if num_samples > 1:
+            all_normalized_actions = normalized_actions.reshape(-1, num_samples, *normalized_actions.shape[1:])
+            if reference_actions is None and init_actions is not None:
+                reference_actions = init_actions[::num_samples]
+            normalized_actions, selected_index, scores = select_action_samples(
+                all_normalized_actions, sample_selection, reference_actions
+            )
+            output.update(
+                all_normalized_actions=all_normalized_actions, sample_scores=scores, selected_sample_index=selected_index
+            )
+        output["normalized_actions"] = normalized_actions  # [B, T, action_dim]
+        if return_vlm_features:
+            output["vlm_condition_features"] = vlm_condition_features
+        return output
+
+    @torch.inference_mode()
+    def encode_action_condition(
+        self,
+        batch_images: List[List[Image.Image]],
+        instructions: List[str],
+        vlm_condition_features: Optional[Tuple[torch.Tensor, ...]] = None,
+    ) -> Tuple[torch.Tensor, Tuple[torch.Tensor, ...]]:
+        """
+        QwenVL + DINO + layer-wise QFormer: the action-head condition tokens of predict_action.
+
+        Args:
+            batch_images: List of samples; each sample is List[PIL.Image] (multi-view), already resized.
+            instructions: List[str] task instructions (lower-cased).
+            vlm_condition_features: Optional cached QwenVL hidden states; skips the QwenVL forward.
+
+        Returns:
+            tuple:
+                action_condition_feature (torch.Tensor): [B, n_query, D_action] QFormer output.
+                vlm_condition_features (tuple[torch.Tensor]): QwenVL hidden states used.
+        """
+        with torch.autocast("cuda", dtype=torch.bfloat16):
+            if vlm_condition_features is None:
+                vlm_condition_features = self.encode_vlm_condition(batch_images, instructions)
+
+            B = len(batch_images)
+            image_tensors = self.dino_encoder.prepare_dino_input(batch_images)
+            dino_features = self.dino_encoder(image_tensors)
+            if self.dino_token_budget is not None:
+                dino_features, _ = merge_tokens_to_budget(dino_features, self.dino_token_budget)
+            dino_encoded_features = dino_features.reshape(B, -1, dino_features.shape[-1])  # [B, num_view * token, dim]
+            dino_encoded_features = self.dino_pro(dino_encoded_features)  # [B, 256, D]
+
+        with torch.autocast("cuda", dtype=torch.float32):
+            cat_conditions = []
+            for layer_index in range(len(vlm_condition_features)):
+                layer_features = vlm_condition_features[layer_index]  # [B, n_qformer_token, D]
+                layer_features = torch.cat(
+                    [layer_features, dino_encoded_features], dim=1
+                )  # [B, n_qformer_token + num_view * token, D]
+                cat_conditions.append(layer_features)
+
+            action_condition_feature = self.layer_qformer(cat_conditions)  # [B, 64, D_action]
+        return action_condition_feature, vlm_condition_features
+
+    def enable_feature_cache(
+        self, max_memory_mb: float = 1024, disk_dir: Optional[str] = None, model_version: Optional[str] = None
+    ) -> FeatureCache:
+        """
+        Opt in to caching condition tokens by (frames, instruction, model version) across predict_action calls.
+
+        Args:
+            max_memory_mb: Memory LRU capacity.
+            disk_dir: Optional on-disk tier.
+            model_version: Version tag of the weights; defaults to the checkpoint loaded by from_pretrained.
+                The visual token budgets and image size are appended since they change the features.
+
+        Returns:
+            FeatureCache: The cache (also at self.feature_cache; its metrics() report hit rate / saved time).
+        """
+        if model_version is None:
+            model_version = getattr(self, "model_version", None)
+        assert model_version is not None, "model_version is required for models not loaded with from_pretrained"
+        image_size = getattr(self.config.datasets.vla_data, "image_size", None)
+        model_version = f"{model_version}|{self.visual_token_budget}|{self.dino_token_budget}|{image_size}"
+        self.feature_cache = FeatureCache(max_memory_mb=max_memory_mb, disk_dir=disk_dir, model_version=model_version)
+        return self.feature_cache
+
+    @torch.inference_mode()
+    def encode_vlm_condition(
+        self, batch_images: List[List[Image.Image]], instructions: List[str]
+    ) -> Tuple[torch.Tensor, ...]:
+        """
+        Run the QwenVL backbone and keep the hidden states consumed by the layer-wise QFormer.
+
+        This is the expensive part of predict_action; callers may cache its output across calls
+        (e.g. per serving session) and pass it back via `vlm_condition_features`.
+
+        Args:
+            batch_images: List of samples; each sample is List[PIL.Image] (multi-view), already resized.
+            instructions: List[str] task instructions (lower-cased).
+
+        Returns:
+            tuple[torch.Tensor]: Hidden states [B, L, D] for layers qformer_start_layer:qformer_end_layer.
+        """
+        qwen_inputs = self.qwen_vl_interface.build_qwenvl_inputs(images=batch_images, instructions=instructions)
+        with torch.autocast("cuda", dtype=torch.bfloat16):
+            qwenvl_outputs = self.qwen_vl_interface(
+                **qwen_inputs,
+                output_hidden_states=True,
+                return_dict=True,
+                visual_token_budget=self.visual_token_budget,
+            )
+        start_layer = self.config.framework.layer_qformer.qformer_start_layer
+        end_layer = self.config.framework.layer_qformer.qformer_end_layer
+        return qwenvl_outputs.hidden_states[start_layer:end_layer]
 
     @torch.inference_mode()
     def chat_with_M1(
@@ -295,45 +477,67 @@ class InternVLA_M1(baseframework):
         max_new_tokens: int = 128,
         device: Optional[str] = "cuda",
     ) -> List[str]:
-        processor = getattr(self.qwen_vl_interface, "processor", None)
-        model = getattr(self.qwen_vl_interface, "model", None)
-        # if processor is None or model is None:
-        #     raise RuntimeError("qwen_vl_interface 缺少 processor 或 model。")
-
-        messages0 = [
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "image",
-                        "image": image,
-                    },
-                    {"type": "text", "text": text},
-                ],
-            }
-        ]
-
-        messages = [messages0]
-        # text info
-        texts = [processor.apply_chat_template(msg, tokenize=False, add_generation_prompt=True) for msg in messages]
-        # visual info
-        image_inputs, video_inputs = process_vision_info(messages)
-
-        # tokenizer
-        inputs = processor(
-            text=texts,
-            images=image_inputs,
-            videos=video_inputs,
-            padding=True,
-            return_tensors="pt",
-        ).to(device)
-
-        model.eval()
-        generated_ids = model.generate(**inputs, max_new_tokens=max_new_tokens)
-        generated_ids_trimmed = [out_ids[len(in_ids) :] for in_ids, out_ids in zip(inputs.input_ids, generated_ids)]
-        outputs = processor.batch_decode(
-            generated_ids_trimmed, skip_special_tokens=True, clean_up_tokenization_spaces=False
-        )
+        """Single image + text chat with the underlying Qwen-VL, inputs on `device`; returns a one-element list."""
+        return self.chat_with_M1_batch([image], [text], max_new_tokens=max_new_tokens, device=device)
+
+    @torch.inference_mode()
+    def chat_with_M1_batch(
+        self,
+        images: List[Image.Image],
+        texts: List[str],
+        max_new_tokens: int = 128,
+        batch_size: int = 8,
+        stop_strings: Optional[List[str]] = None,
+        reuse_image_prefix: bool = True,
+        device: Optional[str] = None,
+    ) -> List[str]:
+        """
+        Batched chat with the underlying Qwen-VL.
+
+        Prompts are left padded and decoded together; every sample stops on its own EOS / stop string.
+        Prompts that refer to the same image object are grouped so the image prefix is encoded and
+        prefilled once and its KV cache shared (`reuse_image_prefix`).
+
+        Args:
+            images: Length B list of PIL images (pass the same object to share its prefix).
+            texts: Length B list of prompts.
+            max_new_tokens: Maximum number of new tokens per prompt.
+            batch_size: Maximum number of prompts decoded together.
+            stop_strings: Optional extra strings ending a sample.
+            reuse_image_prefix: Share the prefilled image prefix between prompts on the same image.
+            device: Device of the model inputs (defaults to the Qwen-VL device).
+
+        Returns:
+            List[str]: Length B answers, in input order.
+        """
+        assert len(images) == len(texts), "images and texts must have the same length"
+        interface = self.qwen_vl_interface
+        interface.model.eval()
+        outputs = [None] * len(texts)
+
+        groups = {}
+        for i, image in enumerate(images):
+            groups.setdefault(id(image) if reuse_image_prefix else i, []).append(i)
+        shared = [idx for idx in groups.values() if len(idx) > 1]
+        single = [idx[0] for idx in groups.values() if len(idx) == 1]
+
+        chunks = [(idx[k : k + batch_size], True) for idx in shared for k in range(0, len(idx), batch_size)]
+        chunks += [(single[k : k + batch_size], False) for k in range(0, len(single), batch_size)]
+        for indices, share_prefix in chunks:
+            inputs = interface.build_chat_inputs(
+                [[images[i]] for i in indices], [texts[i] for i in indices], device=device
+            )
+            if share_prefix and len(indices) > 1:
+                generated = interface.generate_with_shared_prefix(
+                    inputs, max_new_tokens=max_new_tokens, stop_strings=stop_strings
+                )
+            else:
+                generated = interface.batch_generate(inputs, max_new_tokens=max_new_tokens, stop_strings=stop_strings)
+            answers = interface.processor.batch_decode(
+                generated, skip_special_tokens=True, clean_up_tokenization_spaces=False
+            )
+            for i, answer in zip(indices, answers):
+                outputs[i] = answer
         return outputs
 
 
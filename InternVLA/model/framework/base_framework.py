@@ -83,6 +83,8 @@ class baseframework(nn.Module):
         FrameworkModel = cls(config=model_config, **kwargs)
         # set for action un-norm
         FrameworkModel.norm_stats = norm_stats
+        # identifies these weights, e.g. for the feature cache key
+        FrameworkModel.model_version = f"{pretrained_checkpoint.resolve()}@{pretrained_checkpoint.stat().st_mtime_ns}"
         # Load from Checkpoint (Custom --> should load both *projector* and *llm* weights)
         model_state_dict = torch.load(pretrained_checkpoint, map_location="cpu")
         # logger.info(f"Loading model weights from `{pretrained_checkpoint}`")
@@ -0,0 +1,213 @@
+"""
+Content-addressed cache for action-condition features.
+
+Identical (frames, instruction) pairs recur across simulator retries, eval sampler sweeps and repeated
+checkpoint evals. The Qwen-VL / DINO / QFormer forwards are deterministic for a fixed model, so their output
+(the condition tokens fed to the action head) can be looked up instead of recomputed.
+
+Key: blake2b over (model version, instruction, uint8 bytes + shape of every view).
+Tiers:
+  - memory: LRU bounded by tensor bytes (tensors stay on their device)
+  - disk (optional): one torch file per key, written through and promoted to memory (on the compute device) on hit
+"""
+
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import torch
+from PIL import Image
+
+
+def feature_cache_key(images: Sequence[Image.Image], instruction: str, model_version: str) -> str:
+    """Hash of the uint8 pixels (and shapes) of all views, the instruction and the model version."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str(model_version).encode())
+    h.update(b"\0" + instruction.encode())
+    for img in images:
+        array = np.ascontiguousarray(np.asarray(img, dtype=np.uint8))
+        h.update(b"\0" + str(array.shape).encode())
+        h.update(array.data)
+    return h.hexdigest()
+
+
+class FeatureCache:
+    """Size-bounded LRU of per-sample condition features with an optional on-disk tier.
+
+    Args:
+        max_memory_mb: Memory tier capacity (sum of cached tensor bytes).
+        disk_dir: Optional directory of the disk tier (shared across runs; keys include the model version).
+        model_version: Identifies the weights / config producing the features (checkpoint path, train step, ...).
+    """
+
+    def __init__(self, max_memory_mb: float = 1024, disk_dir: Optional[str] = None, model_version: str = "") -> None:
+        self.max_memory_bytes = int(max_memory_mb * 2**20)
+        self.disk_dir = disk_dir
+        if disk_dir is not None:
+            os.makedirs(disk_dir, exist_ok=True)
+        self.model_version = str(model_version)
+        self.entries = OrderedDict()
+        self.memory_bytes = 0
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.compute_time = 0.0  # seconds spent computing misses
+        self.lookup_time = 0.0  # seconds spent hashing / loading
+
+    def set_model_version(self, model_version: str) -> None:
+        """switch to new weights: memory entries of the old version can never hit again, so drop them"""
+        if str(model_version) != self.model_version:
+            self.model_version = str(model_version)
+            self.clear_memory()
+
+    def clear_memory(self) -> None:
+        self.entries.clear()
+        self.memory_bytes = 0
+
+    def key(self, images: Sequence[Image.Image], instruction: str) -> str:
+        return feature_cache_key(images, instruction, self.model_version)
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.pt")
+
+    def _put_memory(self, key: str, value: torch.Tensor) -> None:
+        size = value.numel() * value.element_size()
+        if size > self.max_memory_bytes:
+            return
+        if key in self.entries:
+            self.memory_bytes -= self.entries.pop(key)[1]
+        self.entries[key] = (value, size)
+        self.memory_bytes += size
+        while self.memory_bytes > self.max_memory_bytes:
+            _, (_, evicted_size) = self.entries.popitem(last=False)
+            self.memory_bytes -= evicted_size
+
+    def get(self, key: str, device=None) -> Optional[torch.Tensor]:
+        """Cached features of `key`; disk hits are loaded to `device` (None: CPU) before entering the memory tier."""
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key][0]
+        if self.disk_dir is not None and os.path.exists(self._disk_path(key)):
+            value = torch.load(self._disk_path(key), map_location=device if device is not None else "cpu")
+            self._put_memory(key, value)
+            self.disk_hits += 1
+            return value
+        return None
+
+    def put(self, key: str, value: torch.Tensor) -> None:
+        value = value.detach()
+        self._put_memory(key, value)
+        if self.disk_dir is not None:
+            # write to a temp file first so concurrent readers never see a partial file
+            path = self._disk_path(key)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            torch.save(value.cpu().clone(), tmp_path)
+            os.replace(tmp_path, path)
+
+    def get_or_compute(
+        self,
+        batch_images: List[List[Image.Image]],
+        instructions: List[str],
+        compute_fn: Callable[[List[List[Image.Image]], List[str]], torch.Tensor],
+        device=None,
+    ) -> torch.Tensor:
+        """
+        Look up every sample and run `compute_fn` once on the sub-batch of misses.
+
+        Args:
+            batch_images: B samples, each a list of views (exactly as fed to the model).
+            instructions: B instructions.
+            compute_fn: (images, instructions) -> [b, ...] features for a sub-batch.
+            device: Compute device: disk hits are loaded there and cached tensors are moved there. None keeps
+                memory hits on their device and loads disk hits to CPU.
+
+        Returns:
+            torch.Tensor: [B, ...] features in batch order.
+        """
+        start = time.perf_counter()
+        keys = [self.key(images, instruction) for images, instruction in zip(batch_images, instructions)]
+        features = [self.get(key, device) for key in keys]
+        self.lookup_time += time.perf_counter() - start
+
+        missing = [i for i, feature in enumerate(features) if feature is None]
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            start = time.perf_counter()
+            computed = compute_fn([batch_images[i] for i in missing], [instructions[i] for i in missing])
+            if computed.is_cuda:
+                torch.cuda.synchronize(computed.device)
+            self.compute_time += time.perf_counter() - start
+            for j, i in enumerate(missing):
+                features[i] = computed[j]
+                # own storage: a view would keep the whole sub-batch alive and escape the byte bound
+                self.put(keys[i], computed[j].clone())
+        return torch.stack([feature.to(device) if device is not None else feature for feature in features])
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / max(self.hits + self.misses, 1)
+
+    @property
+    def saved_time(self) -> float:
+        """estimated seconds saved: hits x mean compute time per missed sample, minus lookup overhead"""
+        per_sample = self.compute_time / max(self.misses, 1)
+        return self.hits * per_sample - self.lookup_time
+
+    def metrics(self, prefix: str = "feature_cache/") -> Dict[str, float]:
+        return {
+            f"{prefix}hit_rate": self.hit_rate,
+            f"{prefix}hits": self.hits,
+            f"{prefix}disk_hits": self.disk_hits,
+            f"{prefix}misses": self.misses,
+            f"{prefix}saved_time_s": self.saved_time,
+            f"{prefix}memory_mb": self.memory_bytes / 2**20,
+            f"{prefix}entries": len(self.entries),
+        }
+
+
+if __name__ == "__main__":
+    # sanity check of the cache mechanics (model-level cached vs uncached actions:
+    # scripts/eval/feature_cache_parity.py)
+    import tempfile
+
+    rng = np.random.default_rng(0)
+    frames = [[Image.fromarray(rng.integers(0, 255, (224, 224, 3), dtype=np.uint8)) for _ in range(2)] for _ in range(4)]
+    instructions = ["pick up the cup"] * 4
+    calls = []
+
+    def compute_fn(images, texts):
+        calls.append(len(images))
+        return torch.stack([torch.from_numpy(np.asarray(views[0], dtype=np.float32)[:8, :8, 0]) for views in images])
+
+    with tempfile.TemporaryDirectory() as disk_dir:
+        cache = FeatureCache(max_memory_mb=1, disk_dir=disk_dir, model_version="v1")
+        reference = compute_fn(frames, instructions)
+        calls.clear()
+        assert torch.equal(cache.get_or_compute(frames, instructions, compute_fn), reference)
+        assert torch.equal(cache.get_or_compute(frames[1:3], instructions[1:3], compute_fn), reference[1:3])
+        assert calls == [4] and cache.hit_rate == 2 / 6
+
+        # instruction and model version are part of the key
+        cache.get_or_compute(frames[:1], ["open the drawer"], compute_fn)
+        assert calls == [4, 1]
+        cache.set_model_version("v2")
+        cache.get_or_compute(frames[:1], instructions[:1], compute_fn)
+        assert calls == [4, 1, 1]
+
+        # disk tier survives a new process
+        cache = FeatureCache(max_memory_mb=1, disk_dir=disk_dir, model_version="v1")
+        assert torch.equal(cache.get_or_compute(frames, instructions, compute_fn), reference)
+        assert calls == [4, 1, 1] and cache.disk_hits == 4
+
+        # LRU bound
+        cache = FeatureCache(max_memory_mb=2 * reference[0].numel() * 4 / 2**20, model_version="v1")
+        cache.get_or_compute(frames, instructions, compute_fn)
+        assert len(cache.entries) == 2 and cache.memory_bytes <= cache.max_memory_bytes
+    print("feature cache ok:", cache.metrics())
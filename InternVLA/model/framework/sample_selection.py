@@ -0,0 +1,61 @@
+"""
+Selection rules for best-of-N action sampling (predict_action(num_samples=N)).
+
+Every rule scores the N candidate chunks of each batch element (higher is better):
+  - "medoid": negative mean distance to the other samples (the most consistent sample)
+  - "closest_to_previous": negative distance to a reference chunk (e.g. the previous chunk, shifted)
+  - callable: user scorer (samples [B, N, T, D], reference [B, T, D] | None) -> scores [B, N]
+"""
+
+from typing import Callable, Optional, Tuple, Union
+
+import numpy as np
+
+
+def _flat(x: np.ndarray) -> np.ndarray:
+    return x.reshape(*x.shape[:-2], -1)
+
+
+def medoid_scores(samples: np.ndarray, reference: Optional[np.ndarray] = None) -> np.ndarray:
+    """samples [B, N, T, D] -> [B, N] negative mean L2 distance to the other samples"""
+    flat = _flat(samples)  # [B, N, T*D]
+    distances = np.linalg.norm(flat[:, :, None] - flat[:, None], axis=-1)  # [B, N, N]
+    return -distances.sum(-1) / max(samples.shape[1] - 1, 1)
+
+
+def closest_to_previous_scores(samples: np.ndarray, reference: Optional[np.ndarray] = None) -> np.ndarray:
+    """samples [B, N, T, D], reference [B, T, D] -> [B, N] negative L2 distance to the reference chunk"""
+    assert reference is not None, "closest_to_previous selection needs reference_actions"
+    return -np.linalg.norm(_flat(samples) - _flat(reference)[:, None], axis=-1)
+
+
+SAMPLE_SELECTIONS = {
+    "medoid": medoid_scores,
+    "closest_to_previous": closest_to_previous_scores,
+}
+
+
+def select_action_samples(
+    samples: np.ndarray,
+    selection: Union[str, Callable] = "medoid",
+    reference: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Pick one chunk per batch element.
+
+    Args:
+        samples: [B, N, T, D] candidate normalized action chunks.
+        selection: Name in SAMPLE_SELECTIONS or a scorer (samples, reference) -> [B, N] (higher is better).
+        reference: Optional [B, T, D] reference chunk.
+
+    Returns:
+        tuple: selected [B, T, D], selected index [B], scores [B, N].
+    """
+    if isinstance(selection, str):
+        if selection not in SAMPLE_SELECTIONS:
+            raise ValueError(f"Unknown sample selection: {selection}, expected one of {list(SAMPLE_SELECTIONS)}")
+        selection = SAMPLE_SELECTIONS[selection]
+    scores = np.asarray(selection(samples, reference), dtype=np.float64)
+    assert scores.shape == samples.shape[:2], f"scorer must return [B, N] scores, got {scores.shape}"
+    index = scores.argmax(axis=1)
+    return samples[np.arange(samples.shape[0]), index], index, scores
@@ -3,14 +3,18 @@ Diffusion-based action prediction head (DiT variant).
 
 Provides:
   - Size presets (S/B/L) for transformer-based temporal action diffusion backbone
+  - Cross-attention presets (S/B/L-CrossAttn) whose condition keys / values are cached across denoising steps
   - ActionModel: wraps diffusion process (training + optional DDIM sampling creation)
+  - Optional loss-aware timestep importance sampling (schedule_sampler="loss-second-moment")
 """
 
-from InternVLA.model.modules.action_model.DiT_modules.models import DiT
+from InternVLA.model.modules.action_model.DiT_modules.models import DiT, DiTCrossAttn
 from InternVLA.model.modules.action_model import create_diffusion
 from .DiT_modules import gaussian_diffusion as gd
+from .DiT_modules.timestep_sampler import LossAwareSampler, UniformSampler, create_named_schedule_sampler
 
 import torch
+import torch.distributed as dist
 from torch import nn
 
 
@@ -54,8 +58,54 @@ def DiT_L(**kwargs):
     return DiT(depth=24, token_size=1024, num_heads=16, **kwargs)
 
 
+def DiT_S_CrossAttn(**kwargs):
+    """
+    Small cross-attention DiT variant (condition tokens attended via cross-attention).
+
+    Args:
+        **kwargs: Passed through to DiTCrossAttn constructor.
+
+    Returns:
+        DiTCrossAttn: Initialized small model.
+    """
+    return DiTCrossAttn(depth=6, token_size=384, num_heads=4, **kwargs)
+
+
+def DiT_B_CrossAttn(**kwargs):
+    """
+    Base cross-attention DiT variant.
+
+    Args:
+        **kwargs: Passed through to DiTCrossAttn constructor.
+
+    Returns:
+        DiTCrossAttn: Initialized base model.
+    """
+    return DiTCrossAttn(depth=12, token_size=768, num_heads=12, **kwargs)
+
+
+def DiT_L_CrossAttn(**kwargs):
+    """
+    Large cross-attention DiT variant.
+
+    Args:
+        **kwargs: Passed through to DiTCrossAttn constructor.
+
+    Returns:
+        DiTCrossAttn: Initialized large model.
+    """
+    return DiTCrossAttn(depth=24, token_size=1024, num_heads=16, **kwargs)
+
+
 # Model size
-DiT_models = {"DiT-S": DiT_S, "DiT-B": DiT_B, "DiT-L": DiT_L}
+DiT_models = {
+    "DiT-S": DiT_S,
+    "DiT-B": DiT_B,
+    "DiT-L": DiT_L,
+    "DiT-S-CrossAttn": DiT_S_CrossAttn,
+    "DiT-B-CrossAttn": DiT_B_CrossAttn,
+    "DiT-L-CrossAttn": DiT_L_CrossAttn,
+}
 
 
 # Create ActionModel
@@ -72,6 +122,9 @@ class ActionModel(nn.Module):
         - Forward: add noise + predict denoised residual
         - loss(): simple MSE on noise prediction
         - create_ddim(): build deterministic sampler
+        - schedule_sampler: training timestep distribution; loss-aware samplers importance-sample timesteps by
+          their recent loss (second moment) and reweight the loss so its expectation is unchanged
+        - Few-step DPM-Solver++ sampling runs directly on `diffusion` (see dpm_solver_sample_loop)
     """
 
     def __init__(
@@ -83,18 +136,20 @@ class ActionModel(nn.Module):
         past_action_window_size,
         diffusion_steps=100,
         noise_schedule="squaredcos_cap_v2",
+        schedule_sampler="uniform",
     ):
         """
         Initialize diffusion model and backbone.
 
         Args:
             action_hidden_dim: Hidden size of conditioning tokens (QFormer output dim).
-            model_type: One of {'DiT-S','DiT-B','DiT-L'}.
+            model_type: One of DiT_models, e.g. {'DiT-S','DiT-B','DiT-L','DiT-B-CrossAttn'}.
             in_channels: Action dimensionality (per timestep).
             future_action_window_size: Number of future steps modeled.
             past_action_window_size: Number of past steps possibly encoded (for context).
             diffusion_steps: Total diffusion timesteps.
             noise_schedule: Scheduler type string.
+            schedule_sampler: Training timestep sampler, "uniform" or "loss-second-moment".
         """
         super().__init__()
         self.in_channels = in_channels
@@ -109,6 +164,8 @@ class ActionModel(nn.Module):
             learn_sigma=False,
         )
         self.ddim_diffusion = None
+        self.ddim_step = None
+        self.schedule_sampler = create_named_schedule_sampler(schedule_sampler, self.diffusion)
         if self.diffusion.model_var_type in [gd.ModelVarType.LEARNED, gd.ModelVarType.LEARNED_RANGE]:
             learn_sigma = True
         else:
@@ -124,51 +181,73 @@ class ActionModel(nn.Module):
             past_action_window_size=past_action_window_size,
         )
 
-    def forward(self, gt_action, condition, **kwargs):
+    def forward(self, gt_action, condition, repeat=1, **kwargs):
         """
         Perform one diffusion training step.
 
         Args:
             gt_action: Ground truth action tensor [B, T, C].
             condition: Conditioning tokens [B, L, D].
+            repeat: Repeated diffusion steps: every sample is noised `repeat` times (rows ordered as
+                gt_action.repeat(repeat, 1, 1)). The condition is not copied; the DiT embeds it once and
+                broadcasts it over the copies.
             **kwargs: Ignored (reserved).
 
         Returns:
             tuple:
-                noise_pred: Predicted noise tensor.
-                noise: Sampled noise tensor.
-                timestep: Timesteps used per batch element.
+                noise_pred: Predicted noise tensor [repeat * B, T, C].
+                noise: Sampled noise tensor [repeat * B, T, C].
+                timestep: Timesteps used per batch element [repeat * B].
         """
+        if repeat > 1:
+            gt_action = gt_action.repeat(repeat, 1, 1)  # [R*B, T, C], tiny compared to the condition
         # sample random noise and timestep
         noise = torch.randn_like(gt_action)  # [B, T, C]
-        timestep = torch.randint(0, self.diffusion.num_timesteps, (gt_action.size(0),), device=gt_action.device)
+        if isinstance(self.schedule_sampler, UniformSampler):
+            timestep = torch.randint(0, self.diffusion.num_timesteps, (gt_action.size(0),), device=gt_action.device)
+        else:
+            timestep, _ = self.schedule_sampler.sample(gt_action.size(0), gt_action.device)
 
         # sample x_t from x
         x_t = self.diffusion.q_sample(gt_action, timestep, noise)
 
         # predict noise from x_t
-        noise_pred = self.net(x_t, timestep, condition)
+        noise_pred = self.net(x_t, timestep, condition, repeat=repeat)
 
         assert noise_pred.shape == noise.shape == gt_action.shape
 
         return noise_pred, noise, timestep
 
-    def loss(self, noise_pred, noise):
+    def loss(self, noise_pred, noise, timestep=None):
         """
         Compute MSE noise prediction loss.
 
         Args:
             noise_pred: Predicted noise tensor.
             noise: Target noise tensor.
+            timestep: Timesteps returned by forward; required by loss-aware schedule samplers, which are updated
+                with the per-sample losses (all-gathered across ranks) and reweight them by 1 / (N * p(t)).
 
         Returns:
             torch.Tensor: Scalar loss.
         """
-        # Compute L2 loss
-        loss = ((noise_pred - noise) ** 2).mean()
-        # Optional: loss += loss_vlb
-
-        return loss
+        if not isinstance(self.schedule_sampler, LossAwareSampler):
+            # Compute L2 loss
+            loss = ((noise_pred - noise) ** 2).mean()
+            # Optional: loss += loss_vlb
+            return loss
+
+        assert timestep is not None, "loss-aware schedule samplers need the sampled timesteps"
+        losses = ((noise_pred - noise) ** 2).flatten(1).mean(dim=1)  # [B]
+        # importance weights of the distribution the timesteps were drawn from (before this update)
+        p = self.schedule_sampler.weights()
+        p = p / p.sum()
+        weights = torch.as_tensor(1.0 / (len(p) * p), device=losses.device, dtype=losses.dtype)[timestep]
+        if dist.is_available() and dist.is_initialized():
+            self.schedule_sampler.update_with_local_losses(timestep, losses.detach().float())
+        else:
+            self.schedule_sampler.update_with_all_losses(timestep.tolist(), losses.detach().float().tolist())
+        return (losses * weights).mean()
 
     def create_ddim(self, ddim_step=10):
         """
@@ -187,6 +266,7 @@ class ActionModel(nn.Module):
             sigma_small=True,
             learn_sigma=False,
         )
+        self.ddim_step = ddim_step
         return self.ddim_diffusion
 
 
@@ -208,6 +288,7 @@ def get_action_model(model_typ="DiT-B", config=None):
     action_dim = action_model_cfg.action_dim
     future_action_window_size = action_model_cfg.future_action_window_size
     past_action_window_size = action_model_cfg.past_action_window_size
+    schedule_sampler = action_model_cfg.get("schedule_sampler", "uniform")
 
     return ActionModel(
         model_type=model_type,  # Model type, e.g., 'DiT-B'
@@ -215,4 +296,5 @@ def get_action_model(model_typ="DiT-B", config=None):
         in_channels=action_dim,  # Input channel size
         future_action_window_size=future_action_window_size,  # Future action window size
         past_action_window_size=past_action_window_size,  # Past action window size
+        schedule_sampler=schedule_sampler,  # Training timestep distribution
     )
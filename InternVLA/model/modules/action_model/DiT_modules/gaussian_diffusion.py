@@ -590,10 +590,15 @@ class GaussianDiffusion:
         device=None,
         progress=False,
         eta=0.0,
+        start_timestep=None,
     ):
         """
         Generate samples from the model using DDIM.
         Same usage as p_sample_loop().
+        :param start_timestep: if given, `noise` is taken to be x_t at this
+                               (spaced) timestep, e.g. a q_sample of a prior
+                               sample, and only timesteps <= start_timestep
+                               are denoised.
         """
         final = None
         for sample in self.ddim_sample_loop_progressive(
@@ -607,6 +612,7 @@ class GaussianDiffusion:
             device=device,
             progress=progress,
             eta=eta,
+            start_timestep=start_timestep,
         ):
             final = sample
         return final["sample"]
@@ -623,6 +629,7 @@ class GaussianDiffusion:
         device=None,
         progress=False,
         eta=0.0,
+        start_timestep=None,
     ):
         """
         Use DDIM to sample from the model and yield intermediate samples from
@@ -635,8 +642,12 @@ class GaussianDiffusion:
         if noise is not None:
             img = noise
         else:
+            assert start_timestep is None, "start_timestep requires a noised starting sample"
             img = th.randn(*shape, device=device)
-        indices = list(range(self.num_timesteps))[::-1]
+        if start_timestep is None:
+            start_timestep = self.num_timesteps - 1
+        assert 0 <= start_timestep < self.num_timesteps, f"invalid start_timestep {start_timestep}"
+        indices = list(range(start_timestep + 1))[::-1]
 
         if progress:
             # Lazy import so that we don't depend on tqdm.
@@ -660,6 +671,145 @@ class GaussianDiffusion:
                 yield out
                 img = out["sample"]
 
+    def dpm_solver_timesteps(self, num_steps, skip_type="logSNR"):
+        """
+        Pick the (descending) timesteps visited by the DPM-Solver++ sampler.
+        The model is evaluated at the first num_steps of them, each evaluation
+        followed by a solver update to the next timestep, the last update ending
+        at t=0.
+        :param num_steps: the number of model evaluations (and solver updates).
+        :param skip_type: "logSNR" spaces the timesteps uniformly in the half
+                          log-SNR lambda_t (nearest discrete timesteps), "time_uniform"
+                          uniformly over [0, num_timesteps - 1].
+        :return: a list of num_steps + 1 strictly decreasing int timesteps.
+        """
+        assert 1 <= num_steps < self.num_timesteps, f"cannot take {num_steps} steps out of {self.num_timesteps}"
+        if skip_type == "time_uniform":
+            steps = np.round(np.linspace(self.num_timesteps - 1, 0, num_steps + 1)).astype(np.int64)
+        elif skip_type == "logSNR":
+            lambdas = np.log(self.sqrt_alphas_cumprod) - np.log(self.sqrt_one_minus_alphas_cumprod)
+            targets = np.linspace(lambdas[-1], lambdas[0], num_steps + 1)
+            steps = np.abs(lambdas[None, :] - targets[:, None]).argmin(axis=1)
+            # nearby lambdas can round to the same timestep close to t=0: keep the timesteps strictly decreasing
+            # (and below num_timesteps)
+            for i in range(num_steps - 1, -1, -1):
+                steps[i] = max(steps[i], steps[i + 1] + 1)
+            steps = np.minimum(steps, self.num_timesteps - 1 - np.arange(num_steps + 1))
+        else:
+            raise ValueError(f"unsupported DPM-Solver++ skip_type: {skip_type}")
+        return [int(s) for s in steps]
+
+    def dpm_solver_sample_loop(
+        self,
+        model,
+        shape,
+        noise=None,
+        num_steps=5,
+        order=2,
+        skip_type="logSNR",
+        clip_denoised=True,
+        denoised_fn=None,
+        model_kwargs=None,
+        device=None,
+        progress=False,
+    ):
+        """
+        Generate samples from the model using multistep DPM-Solver++
+        (Lu et al., 2022, https://arxiv.org/abs/2211.01095).
+        Same usage as ddim_sample_loop(), but the number of model evaluations is
+        given by num_steps instead of being baked into a respaced diffusion.
+        :param num_steps: the number of model evaluations (NFE), one solver update each.
+        :param order: 1 (equivalent to DDIM) or 2 (DPM-Solver++ 2M; as in the reference
+                      implementation, the final update is first order below 10 steps).
+        :param skip_type: timestep spacing, see dpm_solver_timesteps().
+        :return: a non-differentiable batch of samples.
+        """
+        final = None
+        for sample in self.dpm_solver_sample_loop_progressive(
+            model,
+            shape,
+            noise=noise,
+            num_steps=num_steps,
+            order=order,
+            skip_type=skip_type,
+            clip_denoised=clip_denoised,
+            denoised_fn=denoised_fn,
+            model_kwargs=model_kwargs,
+            device=device,
+            progress=progress,
+        ):
+            final = sample
+        return final["sample"]
+
+    def dpm_solver_sample_loop_progressive(
+        self,
+        model,
+        shape,
+        noise=None,
+        num_steps=5,
+        order=2,
+        skip_type="logSNR",
+        clip_denoised=True,
+        denoised_fn=None,
+        model_kwargs=None,
+        device=None,
+        progress=False,
+    ):
+        """
+        Use multistep DPM-Solver++ to sample from the model and yield
+        intermediate samples after each model evaluation.
+        The solver works on the data prediction x_0(x_t, t) obtained from
+        p_mean_variance(), so it supports any model_mean_type and respects the
+        timestep mapping of SpacedDiffusion.
+        Same usage as ddim_sample_loop_progressive().
+        """
+        assert order in (1, 2), f"unsupported DPM-Solver++ order: {order}"
+        if device is None:
+            device = next(model.parameters()).device
+        assert isinstance(shape, (tuple, list))
+        if noise is not None:
+            img = noise
+        else:
+            img = th.randn(*shape, device=device)
+
+        timesteps = self.dpm_solver_timesteps(num_steps, skip_type)
+        # alpha_t, sigma_t and the half log-SNR lambda_t = log(alpha_t / sigma_t) of each visited timestep
+        alphas = self.sqrt_alphas_cumprod[timesteps]
+        sigmas = self.sqrt_one_minus_alphas_cumprod[timesteps]
+        lambdas = np.log(alphas) - np.log(sigmas)
+
+        indices = list(range(num_steps))
+        if progress:
+            # Lazy import so that we don't depend on tqdm.
+            from tqdm.auto import tqdm
+
+            indices = tqdm(indices)
+
+        prev_xstart = None
+        for i in indices:
+            t = th.tensor([timesteps[i]] * shape[0], device=device)
+            with th.no_grad():
+                out = self.p_mean_variance(
+                    model,
+                    img,
+                    t,
+                    clip_denoised=clip_denoised,
+                    denoised_fn=denoised_fn,
+                    model_kwargs=model_kwargs,
+                )
+                pred_xstart = out["pred_xstart"]
+                # the update from the last evaluation ends at t=0 and gives the final sample (no extra evaluation)
+                h = lambdas[i + 1] - lambdas[i]
+                lower_order_final = i == num_steps - 1 and num_steps < 10
+                if order == 1 or prev_xstart is None or lower_order_final:
+                    denoised = pred_xstart
+                else:
+                    r = (lambdas[i] - lambdas[i - 1]) / h
+                    denoised = (1 + 1 / (2 * r)) * pred_xstart - (1 / (2 * r)) * prev_xstart
+                img = (sigmas[i + 1] / sigmas[i]) * img - alphas[i + 1] * np.expm1(-h) * denoised
+                prev_xstart = pred_xstart
+                yield {"sample": img, "pred_xstart": pred_xstart}
+
     def _vb_terms_bpd(self, model, x_start, x_t, t, clip_denoised=True, model_kwargs=None):
         """
         Get a term for the variational lower-bound.
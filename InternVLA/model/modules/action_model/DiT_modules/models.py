@@ -14,7 +14,9 @@
 
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
 import math
+from typing import NamedTuple, Optional
 from timm.models.vision_transformer import Attention, Mlp
 
 
@@ -102,6 +104,25 @@ class LabelEmbedder(nn.Module):
         embeddings = self.linear(conditions)
         return embeddings
 
+    def forward_repeated(self, conditions, train, repeat, force_drop_ids=None):
+        """
+        Embed B conditions shared by `repeat` copies of the batch (row r * B + b uses condition b, the order of
+        conditions.repeat(repeat, 1, 1)) without materializing the copies: the linear runs once per condition
+        and once for the uncondition token, dropout is drawn per copy.
+
+        Returns:
+            tuple: embeddings [B, L, D], uncondition embedding [L, D] (or None) and drop mask [repeat, B] (or None).
+        """
+        embeddings = self.linear(conditions)
+        use_dropout = self.dropout_prob > 0
+        if not ((train and use_dropout) or (force_drop_ids is not None)):
+            return embeddings, None, None
+        if force_drop_ids is None:
+            drop_ids = torch.rand(repeat, conditions.shape[0], device=conditions.device) < self.dropout_prob
+        else:
+            drop_ids = (force_drop_ids == 1).view(repeat, conditions.shape[0])
+        return embeddings, self.linear(self.uncondition), drop_ids
+
 
 #################################################################################
 #                      Embedding Layers for Actions and                         #
@@ -255,18 +276,29 @@ class DiT(nn.Module):
         nn.init.constant_(self.final_layer.linear.weight, 0)
         nn.init.constant_(self.final_layer.linear.bias, 0)
 
-    def forward(self, x, t, z):
+    def forward(self, x, t, z, repeat=1):
         """
         Forward pass of DiT.
         history: (B, H, D) tensor of action history # not used now
         x: (B, T, D) tensor of predicting action inputs
         t: (B,) tensor of diffusion timesteps
         z: [B, num_cond_tokens, D] -- condition token
+        repeat: if > 1, x / t hold `repeat` copies of the batch (see ActionModel.forward) and z only one:
+            the condition is embedded once and broadcast over the copies
         """
         x = self.x_embedder(x)  # (N, T, D)
         t = self.t_embedder(t)  # (N, D)
-        z = self.z_embedder(z, self.training)  # [N, num_cond_tokens, D]
-        c = t.unsqueeze(1) + z  # (N, 64, D)
+        if repeat == 1:
+            z = self.z_embedder(z, self.training)  # [N, num_cond_tokens, D]
+            c = t.unsqueeze(1) + z  # (N, 64, D)
+        else:
+            z, uncondition, drop_ids = self.z_embedder.forward_repeated(z, self.training, repeat)  # [B, 64, D]
+            t = t.view(repeat, z.shape[0], 1, t.shape[-1])  # (R, B, 1, D)
+            if drop_ids is None:
+                c = t + z
+            else:
+                c = torch.where(drop_ids[..., None, None], t + uncondition, t + z)
+            c = c.flatten(0, 1)  # (N, 64, D)
         x = torch.cat((c, x), dim=1)  # (N, T+64, D)
         x = x + self.positional_embedding  # (N, T+64, D)
         for block in self.blocks:
@@ -295,9 +327,23 @@ class DiT(nn.Module):
 # Cross-Attention DiT Implementation
 
 
+class RepeatedKV(NamedTuple):
+    """
+    Keys / values of B contexts shared by `repeat` copies of the query batch (query row r * B + b reads context b).
+    Rows flagged in `drop_ids` [repeat, B] read the uncondition keys / values [1, H, M, hd] instead.
+    """
+
+    k: torch.Tensor
+    v: torch.Tensor
+    uncondition_k: Optional[torch.Tensor] = None
+    uncondition_v: Optional[torch.Tensor] = None
+    drop_ids: Optional[torch.Tensor] = None
+
+
 class CrossAttention(nn.Module):
     """
     Cross-attention module that supports both self-attention and cross-attention.
+    Keys / values of a fixed context can be projected once (project_kv) and passed back in as `kv`.
     """
 
     def __init__(self, hidden_size, num_heads, qkv_bias=True, attn_drop=0.0, proj_drop=0.0):
@@ -313,11 +359,23 @@ class CrossAttention(nn.Module):
         self.proj = nn.Linear(hidden_size, hidden_size)
         self.proj_drop = nn.Dropout(proj_drop)
 
-    def forward(self, x, context=None):
+    def project_kv(self, context):
+        """
+        Args:
+            context: key/value tensor [B, M, C]
+        Returns:
+            tuple(k, v): each [B, num_heads, M, head_dim]
+        """
+        B, M, _ = context.shape
+        kv = self.kv(context).reshape(B, M, 2, self.num_heads, self.head_dim).permute(2, 0, 3, 1, 4)
+        return kv.unbind(0)
+
+    def forward(self, x, context=None, kv=None):
         """
         Args:
             x: query tensor [B, N, C]
-            context: key/value tensor [B, M, C]. If None, performs self-attention
+            context: key/value tensor [B, M, C]. If None (and kv is None), performs self-attention
+            kv: optional precomputed (k, v) from project_kv; takes precedence over context
         """
         B, N, C = x.shape
 
@@ -325,22 +383,36 @@ class CrossAttention(nn.Module):
         q = self.q(x).reshape(B, N, self.num_heads, self.head_dim).permute(0, 2, 1, 3)
 
         # Key and Value from context (or x if self-attention)
-        if context is None:
-            context = x
-        M = context.shape[1]
-        kv = self.kv(context).reshape(B, M, 2, self.num_heads, self.head_dim).permute(2, 0, 3, 1, 4)
-        k, v = kv.unbind(0)
-
-        # Attention computation
-        attn = (q @ k.transpose(-2, -1)) * self.scale
-        attn = attn.softmax(dim=-1)
-        attn = self.attn_drop(attn)
+        if kv is None:
+            kv = self.project_kv(x if context is None else context)
+        k, v = kv[:2]
+
+        # Attention computation (fused kernel, attention weights are never materialized)
+        if isinstance(kv, RepeatedKV):
+            x = self._shared_context_attention(q, k, v)
+            if kv.drop_ids is not None:
+                x_uncondition = self._shared_context_attention(q, kv.uncondition_k, kv.uncondition_v)
+                x = torch.where(kv.drop_ids.reshape(-1, 1, 1, 1), x_uncondition, x)
+        else:
+            x = F.scaled_dot_product_attention(q, k, v, dropout_p=self.attn_drop.p if self.training else 0.0)
 
-        x = (attn @ v).transpose(1, 2).reshape(B, N, C)
+        x = x.transpose(1, 2).reshape(B, N, C)
         x = self.proj(x)
         x = self.proj_drop(x)
         return x
 
+    def _shared_context_attention(self, q, k, v):
+        """
+        q [R * Bk, H, N, hd] attends to k / v [Bk, H, M, hd] shared by the R copies of the batch: queries
+        are folded into the sequence dimension instead of expanding the keys / values R times.
+        """
+        Bk = k.shape[0]
+        RB, H, N, hd = q.shape
+        R = RB // Bk
+        q = q.reshape(R, Bk, H, N, hd).permute(1, 2, 0, 3, 4).reshape(Bk, H, R * N, hd)
+        x = F.scaled_dot_product_attention(q, k, v, dropout_p=self.attn_drop.p if self.training else 0.0)
+        return x.reshape(Bk, H, R, N, hd).permute(2, 0, 1, 3, 4).reshape(RB, H, N, hd)
+
 
 class DiTBlockCrossAttn(nn.Module):
     """
@@ -360,19 +432,15 @@ class DiTBlockCrossAttn(nn.Module):
         approx_gelu = lambda: nn.GELU(approximate="tanh")
         self.mlp = Mlp(in_features=hidden_size, hidden_features=mlp_hidden_dim, act_layer=approx_gelu, drop=0)
 
-    def forward(self, x, encoder_features=None):
+    def forward(self, x, encoder_features=None, kv=None):
         """
         Args:
             x: input tensor [B, N, C] (action-related tokens)
             encoder_features: encoder features [B, M, C] (e.g., vision-language features)
+            kv: optional precomputed (k, v) of the encoder features (see CrossAttention.project_kv)
         """
-        # Cross-attention (if encoder features provided) or self-attention (if None)
-        if encoder_features is not None:
-            # Cross-attention: Query from x, Key/Value from encoder_features
-            x = x + self.cross_attn(self.norm_attn(x), context=encoder_features)
-        else:
-            # Self-attention: Query, Key, Value all from x (for backward compatibility)
-            x = x + self.cross_attn(self.norm_attn(x), context=None)
+        # Cross-attention: Query from x, Key/Value from encoder features (or x itself if none provided)
+        x = x + self.cross_attn(self.norm_attn(x), context=encoder_features, kv=kv)
 
         # MLP
         x = x + self.mlp(self.norm_mlp(x))
@@ -397,11 +465,12 @@ class DiTBlockSelfAttn(nn.Module):
         approx_gelu = lambda: nn.GELU(approximate="tanh")
         self.mlp = Mlp(in_features=hidden_size, hidden_features=mlp_hidden_dim, act_layer=approx_gelu, drop=0)
 
-    def forward(self, x, encoder_features=None):
+    def forward(self, x, encoder_features=None, kv=None):
         """
         Args:
             x: input tensor [B, N, C] (action-related tokens)
-            encoder_features: encoder features [B, M, C] (not used in self-attention, for interface compatibility)
+            encoder_features: not used in self-attention, for interface compatibility
+            kv: not used in self-attention, for interface compatibility
         """
         # Self-attention (identical to original DiTBlock)
         x = x + self.attn(self.norm1(x))
@@ -414,6 +483,11 @@ class DiTBlockSelfAttn(nn.Module):
 class DiTCrossAttn(nn.Module):
     """
     Diffusion model with a Transformer backbone supporting cross-attention.
+
+    Unlike DiT, the transformer sequence only holds the action tokens (plus the timestep embedding);
+    the condition tokens are read through the cross-attention blocks. They do not depend on the
+    diffusion timestep, so their per-block keys / values can be computed once per request
+    (precompute_condition) and passed to every denoising step via `cond_kv`.
     """
 
     def __init__(
@@ -457,7 +531,7 @@ class DiTCrossAttn(nn.Module):
         )
         scale = token_size**-0.5
 
-        # Learnable positional embeddings
+        # Learnable positional embeddings: first num_cond_tokens rows for the condition tokens, the rest for actions
         actual_action_length = future_action_window_size + past_action_window_size + 1
         self.positional_embedding = nn.Parameter(
             scale * torch.randn(self.num_cond_tokens + actual_action_length, token_size)
@@ -504,48 +578,71 @@ class DiTCrossAttn(nn.Module):
         nn.init.constant_(self.final_layer.linear.weight, 0)
         nn.init.constant_(self.final_layer.linear.bias, 0)
 
-    def forward(self, x, t, z, encoder_features=None):
+    def precompute_condition(self, z, repeat=1):
+        """
+        Embed the condition tokens and project them to per-block cross-attention keys / values.
+        Args:
+            z: [B, num_cond_tokens, D] -- condition token
+            repeat: number of copies of the batch reading these conditions (training with repeated diffusion
+                steps); keys / values are still computed once per condition (RepeatedKV)
+        Returns:
+            List[tuple(k, v) | RepeatedKV | None]: one entry per block (None for self-attention blocks)
+        """
+        positional_embedding = self.positional_embedding[: self.num_cond_tokens]
+        if repeat == 1:
+            z = self.z_embedder(z, self.training)  # [N, num_cond_tokens, D]
+            z = z + positional_embedding
+            return [
+                block.cross_attn.project_kv(z) if isinstance(block, DiTBlockCrossAttn) else None for block in self.blocks
+            ]
+
+        z, uncondition, drop_ids = self.z_embedder.forward_repeated(z, self.training, repeat)  # [B, num_cond_tokens, D]
+        z = z + positional_embedding
+        cond_kv = []
+        for block in self.blocks:
+            if not isinstance(block, DiTBlockCrossAttn):
+                cond_kv.append(None)
+                continue
+            k, v = block.cross_attn.project_kv(z)
+            if drop_ids is None:
+                cond_kv.append(RepeatedKV(k, v))
+            else:
+                uncondition_k, uncondition_v = block.cross_attn.project_kv((uncondition + positional_embedding)[None])
+                cond_kv.append(RepeatedKV(k, v, uncondition_k, uncondition_v, drop_ids))
+        return cond_kv
+
+    def forward(self, x, t, z, cond_kv=None, repeat=1):
         """
         Forward pass of DiT with cross-attention.
         Args:
             x: (B, T, D) tensor of predicting action inputs
             t: (B,) tensor of diffusion timesteps
-            z: [B, num_cond_tokens, D] -- condition token
-            encoder_features: [B, M, D] -- encoder features for cross-attention (e.g., vision-language features)
+            z: [B, num_cond_tokens, D] -- condition token (ignored when cond_kv is given)
+            cond_kv: optional output of precompute_condition(z), reused across denoising steps
+            repeat: if > 1, x / t hold `repeat` copies of the batch and z only one (see ActionModel.forward)
         """
+        if cond_kv is None:
+            cond_kv = self.precompute_condition(z, repeat=repeat)
         x = self.x_embedder(x)  # (N, T, D)
         t = self.t_embedder(t)  # (N, D)
-        z = self.z_embedder(z, self.training)  # [N, num_cond_tokens, D]
-        c = t.unsqueeze(1) + z  # (N, 64, D)
-        x = torch.cat((c, x), dim=1)  # (N, T+64, D)
-        x = x + self.positional_embedding  # (N, T+64, D)
+        x = x + t.unsqueeze(1) + self.positional_embedding[self.num_cond_tokens :]  # (N, T, D)
 
-        # Pass through cross-attention blocks
-        for block in self.blocks:
-            x = block(x, encoder_features=encoder_features)  # (N, T+64, D)
+        # Pass through alternating cross-/self-attention blocks
+        for block, kv in zip(self.blocks, cond_kv):
+            x = block(x, kv=kv)  # (N, T, D)
 
-        x = self.final_layer(x)  # (N, T+64, out_channels)
-        return x[:, self.num_cond_tokens :, :]  # (N, T, C)
+        x = self.final_layer(x)  # (N, T, out_channels)
+        return x
 
-    def forward_with_cfg(self, x, t, z, cfg_scale, encoder_features=None):
+    def forward_with_cfg(self, x, t, z, cfg_scale, cond_kv=None):
         """
         Forward pass with classifier-free guidance for cross-attention DiT.
+        z (and cond_kv) hold the conditional half followed by the unconditional half.
         """
         # https://github.com/openai/glide-text2im/blob/main/notebooks/text2im.ipynb
         half = x[: len(x) // 2]
         combined = torch.cat([half, half], dim=0).to(next(self.x_embedder.parameters()).dtype)
-
-        # Handle encoder features for CFG: conditional + unconditional
-        if encoder_features is not None:
-            # First half: conditional (with encoder features)
-            # Second half: unconditional (without encoder features, set to None)
-            encoder_features_combined = torch.cat([encoder_features, encoder_features], dim=0)
-            # Note: For true CFG, you might want to pass None for the second half:
-            # But this would require modifying the forward pass to handle mixed batches
-        else:
-            encoder_features_combined = None
-
-        model_out = self.forward(combined, t, z, encoder_features=encoder_features_combined)
+        model_out = self.forward(combined, t, z, cond_kv=cond_kv)
         eps, rest = model_out[:, :, : self.in_channels], model_out[:, :, self.in_channels :]
         cond_eps, uncond_eps = torch.split(eps, len(eps) // 2, dim=0)
         half_eps = uncond_eps + cfg_scale * (cond_eps - uncond_eps)
@@ -93,8 +93,9 @@ class LossAwareSampler(ScheduleSampler):
         loss_batches = [th.zeros(max_bs).to(local_losses) for bs in batch_sizes]
         dist.all_gather(timestep_batches, local_ts)
         dist.all_gather(loss_batches, local_losses)
-        timesteps = [x.item() for y, bs in zip(timestep_batches, batch_sizes) for x in y[:bs]]
-        losses = [x.item() for y, bs in zip(loss_batches, batch_sizes) for x in y[:bs]]
+        # one device-to-host copy instead of one .item() sync per element
+        timesteps = th.cat([y[:bs] for y, bs in zip(timestep_batches, batch_sizes)]).tolist()
+        losses = th.cat([y[:bs] for y, bs in zip(loss_batches, batch_sizes)]).tolist()
         self.update_with_all_losses(timesteps, losses)
 
     @abstractmethod
@@ -118,7 +119,7 @@ class LossSecondMomentResampler(LossAwareSampler):
         self.history_per_term = history_per_term
         self.uniform_prob = uniform_prob
         self._loss_history = np.zeros([diffusion.num_timesteps, history_per_term], dtype=np.float64)
-        self._loss_counts = np.zeros([diffusion.num_timesteps], dtype=np.int)
+        self._loss_counts = np.zeros([diffusion.num_timesteps], dtype=np.int64)
 
     def weights(self):
         if not self._warmed_up():
@@ -0,0 +1,205 @@
+"""
+Flow-matching action prediction head (DiT variant).
+
+Provides:
+  - FlowMatchingActionModel: rectified-flow head on top of the DiT backbone used by the diffusion head
+  - get_flow_matching_action_model: factory reading `framework.action_model` + `framework.fm_head_config`
+
+The head shares the DiT size presets (and therefore the forward / forward_with_cfg signatures) with
+ActionModel, so InternVLA_M1 can swap heads without touching the conditioning path.
+"""
+
+import torch
+from torch import nn
+from torch.distributions import Beta
+
+from InternVLA.model.modules.action_model.DiTActionHeader import DiT_models
+
+
+class FlowMatchingActionModel(nn.Module):
+    """
+    Flow-matching temporal action head.
+
+    Components:
+        - DiT transformer backbone (token-wise velocity predictor)
+        - Beta-distributed timestep sampler (biased towards noisy timesteps)
+
+    Responsibilities:
+        - Forward: interpolate noise -> action and predict the velocity
+        - loss(): simple MSE on velocity prediction
+        - sample_loop(): few-step Euler integration from noise to actions
+    """
+
+    def __init__(
+        self,
+        action_hidden_dim,
+        model_type,
+        in_channels,
+        future_action_window_size,
+        past_action_window_size,
+        noise_beta_alpha=1.5,
+        noise_beta_beta=1.0,
+        noise_s=0.999,
+        num_timestep_buckets=1000,
+        num_inference_timesteps=4,
+    ):
+        """
+        Initialize flow-matching head and backbone.
+
+        Args:
+            action_hidden_dim: Hidden size of conditioning tokens (QFormer output dim).
+            model_type: One of {'DiT-S','DiT-B','DiT-L'}.
+            in_channels: Action dimensionality (per timestep).
+            future_action_window_size: Number of future steps modeled.
+            past_action_window_size: Number of past steps possibly encoded (for context).
+            noise_beta_alpha: Alpha of the Beta distribution used to sample training timesteps.
+            noise_beta_beta: Beta of the Beta distribution used to sample training timesteps.
+            noise_s: Scale of the sampled flow time t = (s - u) / s, u ~ Beta on [0, 1], so t lies in [1 - 1/s, 1].
+            num_timestep_buckets: Discretization of t in [0, 1] fed to the timestep embedder.
+            num_inference_timesteps: Default number of Euler steps at inference.
+        """
+        super().__init__()
+        self.in_channels = in_channels
+        self.past_action_window_size = past_action_window_size
+        self.future_action_window_size = future_action_window_size
+        self.token_size = action_hidden_dim  # QFormer output size
+        self.noise_s = noise_s
+        self.num_timestep_buckets = num_timestep_buckets
+        self.num_inference_timesteps = num_inference_timesteps
+        self.beta_dist = Beta(noise_beta_alpha, noise_beta_beta)
+        self.net = DiT_models[model_type](
+            in_channels=in_channels,
+            class_dropout_prob=0.1,
+            learn_sigma=False,
+            future_action_window_size=future_action_window_size,
+            past_action_window_size=past_action_window_size,
+        )
+
+    def sample_time(self, batch_size, device, dtype):
+        """
+        Sample flow times t = (noise_s - u) / noise_s, u ~ Beta (0 = pure noise, 1 = clean action).
+        t lies in [1 - 1/noise_s, 1]: slightly below 0 for noise_s < 1 (down to about -0.001 for 0.999).
+
+        Args:
+            batch_size: Number of timesteps to draw.
+            device: Target device.
+            dtype: Target dtype.
+
+        Returns:
+            torch.Tensor: Flow times [B].
+        """
+        sample = self.beta_dist.sample([batch_size]).to(device=device, dtype=dtype)
+        return (self.noise_s - sample) / self.noise_s
+
+    def discretize_time(self, t):
+        """
+        Map continuous flow time to the integer buckets seen by the DiT timestep embedder.
+
+        Args:
+            t: Flow times [B] in [0, 1].
+
+        Returns:
+            torch.Tensor: Integer timesteps [B].
+        """
+        return (t * self.num_timestep_buckets).long()
+
+    def forward(self, gt_action, condition, repeat=1, **kwargs):
+        """
+        Perform one flow-matching training step.
+
+        Args:
+            gt_action: Ground truth action tensor [B, T, C].
+            condition: Conditioning tokens [B, L, D].
+            repeat: Repeated flow steps per sample; the condition is broadcast inside the DiT (see ActionModel.forward).
+            **kwargs: Ignored (reserved).
+
+        Returns:
+            tuple:
+                velocity_pred: Predicted velocity tensor.
+                velocity: Target velocity (action - noise).
+                timestep: Discretized timesteps used per batch element.
+        """
+        if repeat > 1:
+            gt_action = gt_action.repeat(repeat, 1, 1)  # [R*B, T, C]
+        noise = torch.randn_like(gt_action)  # [B, T, C]
+        t = self.sample_time(gt_action.size(0), device=gt_action.device, dtype=gt_action.dtype)
+        t_expanded = t[:, None, None]
+
+        # straight path from noise (t=0) to action (t=1)
+        x_t = (1 - t_expanded) * noise + t_expanded * gt_action
+        velocity = gt_action - noise
+
+        timestep = self.discretize_time(t)
+        velocity_pred = self.net(x_t, timestep, condition, repeat=repeat)
+
+        assert velocity_pred.shape == velocity.shape == gt_action.shape
+
+        return velocity_pred, velocity, timestep
+
+    def loss(self, velocity_pred, velocity, timestep=None):
+        """
+        Compute MSE velocity prediction loss.
+
+        Args:
+            velocity_pred: Predicted velocity tensor.
+            velocity: Target velocity tensor.
+            timestep: Unused (same signature as ActionModel.loss).
+
+        Returns:
+            torch.Tensor: Scalar loss.
+        """
+        return ((velocity_pred - velocity) ** 2).mean()
+
+    @torch.no_grad()
+    def sample_loop(self, model, noise, model_kwargs=None, num_steps=None):
+        """
+        Integrate the learned velocity field with explicit Euler steps.
+
+        Args:
+            model: Callable (x, t, **model_kwargs) -> velocity, e.g. net.forward or net.forward_with_cfg.
+            noise: Initial Gaussian noise [B, T, C].
+            model_kwargs: Extra keyword arguments for the model (conditioning, cfg_scale).
+            num_steps: Number of Euler steps (defaults to num_inference_timesteps).
+
+        Returns:
+            torch.Tensor: Sampled actions [B, T, C].
+        """
+        model_kwargs = model_kwargs or {}
+        num_steps = num_steps or self.num_inference_timesteps
+        dt = 1.0 / num_steps
+        x = noise
+        for step in range(num_steps):
+            t = torch.full((x.shape[0],), step / num_steps, device=x.device)
+            velocity = model(x, self.discretize_time(t), **model_kwargs)
+            x = x + dt * velocity[:, :, : self.in_channels]
+        return x
+
+
+def get_flow_matching_action_model(config=None):
+    """
+    Factory: build FlowMatchingActionModel from global framework config.
+
+    Args:
+        config: Global config (expects config.framework.action_model and config.framework.fm_head_config).
+            The DiT backbone size and action shapes come from action_model; the flow schedule
+            (noise_beta_alpha / noise_beta_beta / noise_s / num_timestep_buckets / num_inference_timesteps)
+            comes from fm_head_config. Other fm_head_config keys are not used by the DiT backbone.
+
+    Returns:
+        FlowMatchingActionModel: Initialized flow-matching action head.
+    """
+    action_model_cfg = config.framework.action_model
+    fm_cfg = config.framework.get("fm_head_config", {})
+
+    return FlowMatchingActionModel(
+        model_type=action_model_cfg.action_model_type,  # Model type, e.g., 'DiT-B'
+        action_hidden_dim=action_model_cfg.action_hidden_dim,  # Hidden size of action tokens
+        in_channels=action_model_cfg.action_dim,  # Input channel size
+        future_action_window_size=action_model_cfg.future_action_window_size,  # Future action window size
+        past_action_window_size=action_model_cfg.past_action_window_size,  # Past action window size
+        noise_beta_alpha=fm_cfg.get("noise_beta_alpha", 1.5),
+        noise_beta_beta=fm_cfg.get("noise_beta_beta", 1.0),
+        noise_s=fm_cfg.get("noise_s", 0.999),
+        num_timestep_buckets=fm_cfg.get("num_timestep_buckets", 1000),
+        num_inference_timesteps=fm_cfg.get("num_inference_timesteps", 4),
+    )
@@ -4,13 +4,77 @@ import torch.nn.functional as F
 import torch.distributed as dist
 
 
+class FusedCrossAttention(nn.Module):
+    """
+    Cross-attention on top of F.scaled_dot_product_attention.
+
+    Drop-in replacement for nn.MultiheadAttention(batch_first=True) used as cross-attention: parameters
+    are stored under the same names (in_proj_weight / in_proj_bias / out_proj), so checkpoints load into
+    either implementation. K and V are projected with one packed matmul and attention weights are never
+    materialized.
+    """
+
+    def __init__(self, embed_dim, num_heads, dropout=0.0):
+        super().__init__()
+        assert embed_dim % num_heads == 0, f"embed_dim {embed_dim} must be divisible by num_heads {num_heads}"
+        self.embed_dim = embed_dim
+        self.num_heads = num_heads
+        self.dropout = dropout
+        self.in_proj_weight = nn.Parameter(torch.empty(3 * embed_dim, embed_dim))
+        self.in_proj_bias = nn.Parameter(torch.empty(3 * embed_dim))
+        self.out_proj = nn.Linear(embed_dim, embed_dim)
+        # same initialization as nn.MultiheadAttention
+        nn.init.xavier_uniform_(self.in_proj_weight)
+        nn.init.constant_(self.in_proj_bias, 0.0)
+        nn.init.constant_(self.out_proj.bias, 0.0)
+
+    def kv_weight_and_bias(self):
+        """Packed K/V projection parameters: weight [2D, D], bias [2D]."""
+        return self.in_proj_weight[self.embed_dim :], self.in_proj_bias[self.embed_dim :]
+
+    def project_kv(self, key_value):
+        """Project encoder features to packed K/V [B, L, 2D]."""
+        weight, bias = self.kv_weight_and_bias()
+        return F.linear(key_value, weight, bias)
+
+    def forward(self, query, key_value=None, kv_proj=None, attn_mask=None):
+        """
+        Args:
+            query (Tensor): [B, Q, D].
+            key_value (Tensor | None): [B, L, D] encoder features (ignored if kv_proj is given).
+            kv_proj (Tensor | None): [B, L, 2D] packed K/V, e.g. precomputed for several layers at once.
+            attn_mask (Tensor | None): Bool [B, 1, 1, L], True = attend.
+        Returns:
+            Tensor: [B, Q, D].
+        """
+        B, Q, D = query.shape
+        if kv_proj is None:
+            kv_proj = self.project_kv(key_value)
+        L = kv_proj.shape[1]
+        head_dim = D // self.num_heads
+
+        q = F.linear(query, self.in_proj_weight[:D], self.in_proj_bias[:D])
+        q = q.view(B, Q, self.num_heads, head_dim).transpose(1, 2)  # [B, H, Q, hd]
+        k, v = kv_proj.view(B, L, 2, self.num_heads, head_dim).permute(2, 0, 3, 1, 4)  # 2 x [B, H, L, hd]
+
+        out = F.scaled_dot_product_attention(
+            q, k, v, attn_mask=attn_mask, dropout_p=self.dropout if self.training else 0.0
+        )
+        out = out.transpose(1, 2).reshape(B, Q, D)
+        return self.out_proj(out)
+
+
 class CrossAttentionBlock(nn.Module):
-    def __init__(self, hidden_dim, num_heads, mlp_ratio=4.0, dropout=0.1):
+    def __init__(self, hidden_dim, num_heads, mlp_ratio=4.0, dropout=0.1, fused_attention=True):
         super().__init__()
+        self.fused_attention = fused_attention
         self.norm1 = nn.LayerNorm(hidden_dim)
-        self.cross_attn = nn.MultiheadAttention(
-            embed_dim=hidden_dim, num_heads=num_heads, batch_first=True, dropout=dropout
-        )
+        if fused_attention:
+            self.cross_attn = FusedCrossAttention(embed_dim=hidden_dim, num_heads=num_heads, dropout=dropout)
+        else:
+            self.cross_attn = nn.MultiheadAttention(
+                embed_dim=hidden_dim, num_heads=num_heads, batch_first=True, dropout=dropout
+            )
 
         self.norm2 = nn.LayerNorm(hidden_dim)
         self.mlp = nn.Sequential(
@@ -20,13 +84,14 @@ class CrossAttentionBlock(nn.Module):
         )
         self.dropout = nn.Dropout(dropout)
 
-    def forward(self, query, encoder_hidden_state, encoder_attention_mask=None):
+    def forward(self, query, encoder_hidden_state, encoder_attention_mask=None, kv_proj=None):
         """
         Cross-attention block forward.
         Args:
             query (Tensor): Shape [B, Q, D]. Learnable query tokens propagated across layers.
             encoder_hidden_state (Tensor): Shape [B, L, D]. Features from one encoder layer.
             encoder_attention_mask (Tensor | None): Shape [B, L]. 1/True=keep (visible), 0/False=mask. None disables masking.
+            kv_proj (Tensor | None): Shape [B, L, 2D]. Precomputed packed K/V (fused attention only).
         Returns:
             Tensor: Updated query tokens of shape [B, Q, D].
         Details:
@@ -37,6 +102,15 @@ class CrossAttentionBlock(nn.Module):
         q = self.norm1(query)
         kv = encoder_hidden_state
 
+        if self.fused_attention:
+            attn_mask = None
+            if encoder_attention_mask is not None:
+                attn_mask = encoder_attention_mask[:, None, None, :].to(dtype=torch.bool)  # [B, 1, 1, L]
+            attn_output = self.cross_attn(q, kv, kv_proj=kv_proj, attn_mask=attn_mask)
+            query = query + attn_output
+            query = query + self.dropout(self.mlp(self.norm2(query)))
+            return query
+
         if encoder_attention_mask is not None:
             attn_mask = encoder_attention_mask.unsqueeze(1).to(dtype=torch.bool)  # [B, 1, L]
         else:
@@ -50,7 +124,14 @@ class CrossAttentionBlock(nn.Module):
 
 class LayerwiseQFormer(nn.Module):
     def __init__(
-        self, input_hidden_dim=2048, output_hidden_dim=768, num_query_tokens=64, num_layers=37, num_heads=8, config=None
+        self,
+        input_hidden_dim=2048,
+        output_hidden_dim=768,
+        num_query_tokens=64,
+        num_layers=37,
+        num_heads=8,
+        config=None,
+        fused_attention=True,
     ):
         super().__init__()
         self.input_hidden_dim = input_hidden_dim
@@ -58,13 +139,19 @@ class LayerwiseQFormer(nn.Module):
         self.num_query_tokens = num_query_tokens
         self.num_layers = num_layers
         self.config = config
+        self.fused_attention = fused_attention
         # Project input to output dimension
         self.proj = nn.Linear(input_hidden_dim, output_hidden_dim)
         # Learnable query tokens
         self.query_tokens = nn.Parameter(torch.randn(num_query_tokens, output_hidden_dim))
 
         # Independent cross-attention blocks (one per encoder layer)
-        self.layers = nn.ModuleList([CrossAttentionBlock(output_hidden_dim, num_heads) for _ in range(num_layers)])
+        self.layers = nn.ModuleList(
+            [
+                CrossAttentionBlock(output_hidden_dim, num_heads, fused_attention=fused_attention)
+                for _ in range(num_layers)
+            ]
+        )
 
     def forward(self, hidden_states_list, encoder_attention_mask=None):
         """
@@ -78,6 +165,8 @@ class LayerwiseQFormer(nn.Module):
             1. Stack per-layer features to [B, N, L, Din] and linearly project to Dout.
             2. Expand global learnable query tokens to batch: [B, Q, Dout].
             3. Apply cross-attention layer-by-layer: each query attends only to the corresponding encoder layer features.
+               With fused attention, the K/V projections of all layers (independent of the query chain) are
+               computed up front in one batched matmul.
         Notes:
             - Asserts len(hidden_states_list) == num_layers.
             - Does not modify gradient flow of hidden_states_list.
@@ -100,6 +189,16 @@ class LayerwiseQFormer(nn.Module):
         # Expand query tokens for each batch
         query = self.query_tokens.unsqueeze(0).expand(B, -1, -1)  # [B, Q, D]
 
+        if self.fused_attention:
+            # Packed K/V of every layer at once: [B, N, L, Dout] x [N, 2*Dout, Dout] -> [B, N, L, 2*Dout]
+            kv_params = [layer.cross_attn.kv_weight_and_bias() for layer in self.layers]
+            kv_weight = torch.stack([weight for weight, _ in kv_params])
+            kv_bias = torch.stack([bias for _, bias in kv_params])
+            kv_proj = torch.einsum("bnld,ned->bnle", proj_hs, kv_weight) + kv_bias[None, :, None, :]
+            for i, layer in enumerate(self.layers):
+                query = layer(query, hidden_states_list[i], encoder_attention_mask, kv_proj=kv_proj[:, i])
+            return query
+
         # Iterate through each layer and apply cross-attention
         for i, layer in enumerate(self.layers):
             query = layer(query, hidden_states_list[i], encoder_attention_mask)
@@ -181,5 +280,6 @@ def get_layerwise_qformer(num_heads=8, config=None, **kwargs):
         num_layers=num_layers,
         num_heads=num_heads,
         config=config,
+        fused_attention=qformer_cfg.get("fused_attention", True),
     )
     return qformer
@@ -7,10 +7,12 @@ from transformers import Qwen2_5_VLForConditionalGeneration, AutoProcessor
 from transformers.modeling_outputs import CausalLMOutputWithPast
 from typing import Dict, Optional, List
 from torch.nn.utils.rnn import pad_sequence
-from transformers import BatchFeature
+from transformers import BatchFeature, DynamicCache
 
 from qwen_vl_utils import process_vision_info
 
+from InternVLA.model.modules.vlm.token_reduction import reduce_qwenvl_visual_tokens
+
 
 from accelerate.logging import get_logger
 
@@ -103,6 +105,7 @@ class _QWen_VL_Interface(nn.Module):
         output_attentions: Optional[bool] = False,
         output_hidden_states: Optional[bool] = True,
         return_dict: Optional[bool] = True,
+        visual_token_budget: Optional[int] = None,
         **kwargs,
     ) -> CausalLMOutputWithPast:
         """
@@ -120,6 +123,9 @@ class _QWen_VL_Interface(nn.Module):
             output_attentions (bool): Whether to include attention maps.
             output_hidden_states (bool): Must be True if downstream modules consume hidden states.
             return_dict (bool): Return HF dataclass if True; else tuple.
+            visual_token_budget (int | None): If set, every image's visual tokens are merged down to this many
+                tokens before the decoder (see token_reduction.reduce_qwenvl_visual_tokens). The returned
+                sequence (hidden states, logits) is then shorter than input_ids.
             **kwargs: Extra args forwarded to underlying model.
 
         Returns:
@@ -132,6 +138,22 @@ class _QWen_VL_Interface(nn.Module):
         """
 
         with torch.autocast("cuda", dtype=torch.bfloat16):
+            if visual_token_budget is not None and pixel_values is not None and inputs_embeds is None:
+                reduced = reduce_qwenvl_visual_tokens(
+                    self.model,
+                    input_ids=input_ids,
+                    attention_mask=attention_mask,
+                    pixel_values=pixel_values,
+                    image_grid_thw=image_grid_thw,
+                    budget=visual_token_budget,
+                    labels=labels,
+                )
+                input_ids, pixel_values, image_grid_thw = None, None, None
+                inputs_embeds = reduced["inputs_embeds"]
+                attention_mask = reduced["attention_mask"]
+                labels = reduced.get("labels")
+                kwargs["position_ids"] = reduced["position_ids"]
+
             outputs = self.model(
                 input_ids=input_ids,
                 attention_mask=attention_mask,
@@ -175,10 +197,10 @@ class _QWen_VL_Interface(nn.Module):
             GenerateOutput | Model-dependent generation return.
 
         Notes:
-            - Uses autocast(float16); relies on attribute enable_mixed_precision_training.
+            - Autocast(bfloat16), same as forward.
             - For iterative dialogue, caller manages past_key_values externally.
         """
-        with torch.autocast("cuda", enabled=self.enable_mixed_precision_training, dtype=torch.float16):
+        with torch.autocast("cuda", dtype=torch.bfloat16):
             generation_output = self.model.generate(
                 input_ids=input_ids,
                 attention_mask=attention_mask,
@@ -190,6 +212,168 @@ class _QWen_VL_Interface(nn.Module):
             )
         return generation_output
 
+    def _trim_generated(self, new_tokens: torch.LongTensor) -> List[List[int]]:
+        """
+        Cut every generated row at its own stop point (first EOS, or the padding HF appends once a sample
+        has finished, e.g. after a stop string).
+        """
+        generation_config = self.model.generation_config
+        eos_token_id = generation_config.eos_token_id
+        stop_ids = set(eos_token_id if isinstance(eos_token_id, (list, tuple)) else [eos_token_id])
+        if generation_config.pad_token_id is not None:
+            stop_ids.add(generation_config.pad_token_id)
+        stop_ids.discard(None)
+
+        trimmed = []
+        for row in new_tokens.tolist():
+            end = next((i for i, token in enumerate(row) if token in stop_ids), len(row))
+            trimmed.append(row[:end])
+        return trimmed
+
+    @torch.inference_mode()
+    def batch_generate(self, inputs, max_new_tokens: int = 128, stop_strings: Optional[List[str]] = None, **kwargs):
+        """
+        Batched generation over left-padded prompts; every sample stops on its own EOS / stop string.
+
+        Args:
+            inputs (BatchFeature | dict): input_ids / attention_mask (left padded, as built by the processor)
+                and optional pixel_values / image_grid_thw.
+            max_new_tokens (int): Maximum number of new tokens per sample.
+            stop_strings (List[str] | None): Extra strings that end a sample (needs self.processor).
+            **kwargs: Passed to model.generate (e.g. do_sample, temperature).
+
+        Returns:
+            List[List[int]]: Generated token ids per sample, prompt and stop tokens removed.
+        """
+        if stop_strings is not None:
+            kwargs.update(stop_strings=stop_strings, tokenizer=self.processor.tokenizer)
+        prompt_length = inputs["input_ids"].shape[1]
+        output = self.generate(
+            **inputs,
+            max_new_tokens=max_new_tokens,
+            output_hidden_states=False,
+            return_dict_in_generate=True,
+            **kwargs,
+        )
+        return self._trim_generated(output.sequences[:, prompt_length:])
+
+    @torch.inference_mode()
+    def generate_with_shared_prefix(
+        self, inputs, max_new_tokens: int = 128, stop_strings: Optional[List[str]] = None, **kwargs
+    ):
+        """
+        Batched generation for several prompts about the same image(s): the common prefix (system prompt +
+        image tokens) is prefilled once and its KV cache is shared by all prompts.
+
+        Prompt suffixes are padded between the prefix and the suffix (instead of on the left, which would break
+        the shared prefix). Per-sample rope deltas are shifted by the padding so every sample sees exactly the
+        positions of its unbatched prompt.
+
+        Args:
+            inputs (BatchFeature | dict): Processor output for K prompts that use the same images. Only the
+                pixel_values of the first sample are encoded.
+            max_new_tokens (int): Maximum number of new tokens per sample.
+            stop_strings (List[str] | None): Extra strings that end a sample (needs self.processor).
+            **kwargs: Passed to model.generate.
+
+        Returns:
+            List[List[int]]: Generated token ids per sample, prompt and stop tokens removed.
+        """
+        input_ids, attention_mask = inputs["input_ids"], inputs["attention_mask"]
+        num_prompts = input_ids.shape[0]
+        device = input_ids.device
+        rows = [ids[mask.bool()] for ids, mask in zip(input_ids, attention_mask)]
+
+        # longest common prefix, leaving at least one token per prompt to start decoding from
+        max_prefix = min(len(row) for row in rows) - 1
+        prefix_length = 0
+        while prefix_length < max_prefix and all(row[prefix_length] == rows[0][prefix_length] for row in rows):
+            prefix_length += 1
+        suffixes = [row[prefix_length:] for row in rows]
+        image_token_id = self.model.config.image_token_id
+        assert all(
+            (suffix != image_token_id).all() for suffix in suffixes
+        ), "Prompts do not share their image tokens; use batch_generate instead"
+
+        # 1) prefill the shared prefix once
+        image_grid_thw = inputs.get("image_grid_thw")
+        pixel_values = inputs.get("pixel_values")
+        if image_grid_thw is not None:
+            images_per_prompt = image_grid_thw.shape[0] // num_prompts
+            image_grid_thw = image_grid_thw[:images_per_prompt]
+            pixel_values = pixel_values[: int(image_grid_thw.prod(-1).sum())]
+        cache = DynamicCache()
+        with torch.autocast("cuda", dtype=torch.bfloat16):
+            self.model(
+                input_ids=rows[0][None, :prefix_length],
+                attention_mask=torch.ones(1, prefix_length, dtype=attention_mask.dtype, device=device),
+                pixel_values=pixel_values,
+                image_grid_thw=image_grid_thw,
+                past_key_values=cache,
+                use_cache=True,
+                return_dict=True,
+            )
+        prefix_rope_deltas = self.model.model.rope_deltas  # [1, 1]
+
+        # 2) prefix + per-sample padding + suffix
+        pad_token_id = self.model.generation_config.pad_token_id
+        pad_token_id = 0 if pad_token_id is None else pad_token_id
+        max_suffix = max(len(suffix) for suffix in suffixes)
+        batch_ids = torch.full(
+            (num_prompts, prefix_length + max_suffix), pad_token_id, dtype=input_ids.dtype, device=device
+        )
+        batch_mask = torch.zeros_like(batch_ids, dtype=attention_mask.dtype)
+        num_pads = torch.zeros(num_prompts, 1, dtype=torch.long, device=device)
+        for i, suffix in enumerate(suffixes):
+            num_pads[i] = max_suffix - len(suffix)
+            batch_ids[i, :prefix_length] = rows[0][:prefix_length]
+            batch_ids[i, prefix_length + num_pads[i] :] = suffix
+            batch_mask[i, :prefix_length] = 1
+            batch_mask[i, prefix_length + num_pads[i] :] = 1
+
+        # 3) share the prefix cache and decode
+        cache.batch_repeat_interleave(num_prompts)
+        self.model.model.rope_deltas = prefix_rope_deltas - num_pads
+        if stop_strings is not None:
+            kwargs.update(stop_strings=stop_strings, tokenizer=self.processor.tokenizer)
+        output = self.generate(
+            input_ids=batch_ids,
+            attention_mask=batch_mask,
+            past_key_values=cache,
+            max_new_tokens=max_new_tokens,
+            output_hidden_states=False,
+            return_dict_in_generate=True,
+            **kwargs,
+        )
+        return self._trim_generated(output.sequences[:, batch_ids.shape[1] :])
+
+    def build_chat_inputs(self, images, prompts, device=None):
+        """
+        Tokenize plain chat prompts (no CoT template) for generation.
+
+        Args:
+            images (List[List[PIL.Image.Image]]): Length B, images of each prompt.
+            prompts (List[str]): Length B user prompts.
+            device: Device of the returned tensors (defaults to self.model.device).
+
+        Returns:
+            BatchFeature: Left-padded processor outputs on `device`.
+        """
+        assert len(images) == len(prompts), "Images and prompts must have the same length"
+        messages = [
+            [
+                {
+                    "role": "user",
+                    "content": [{"type": "image", "image": img} for img in imgs] + [{"type": "text", "text": prompt}],
+                }
+            ]
+            for imgs, prompt in zip(images, prompts)
+        ]
+        texts = [self.processor.apply_chat_template(m, tokenize=False, add_generation_prompt=True) for m in messages]
+        image_inputs, video_inputs = process_vision_info(messages)
+        inputs = self.processor(text=texts, images=image_inputs, videos=video_inputs, padding=True, return_tensors="pt")
+        return inputs.to(device if device is not None else self.model.device)
+
     def build_qwenvl_inputs(self, images, instructions, **kwargs):
         """
         Construct and tokenize multimodal chat-style inputs for Qwen2.5-VL (batched).
@@ -0,0 +1,174 @@
+"""
+Visual token reduction (similarity-based merging) with a fixed token budget.
+
+Provides:
+  - merge_tokens_to_budget: bipartite soft matching (ToMe-style) applied in rounds until each
+    sequence holds exactly `budget` tokens; merged tokens are size-weighted averages
+  - reduce_qwenvl_visual_tokens: applies the merging to every image of a Qwen2.5-VL batch before the
+    decoder and returns inputs_embeds / attention_mask / position_ids (mrope) / labels for the shorter sequence
+
+Merging is differentiable w.r.t. the token features, so the reduced model trains end to end.
+"""
+
+import torch
+import torch.nn.functional as F
+
+IGNORE_INDEX = -100
+
+
+def _bipartite_merge_round(x, size, pos, r):
+    """
+    One round of bipartite soft matching: merge the r most similar even-indexed tokens into their
+    best-matching odd-indexed token.
+
+    Args:
+        x: Token features [B, N, D] (running averages).
+        size: Number of original tokens each token stands for [B, N, 1].
+        pos: Index (into the original sequence) of the token each entry is anchored at [B, N].
+        r: Number of tokens to remove.
+
+    Returns:
+        tuple: (x, size, pos) with N - r tokens, kept in original order.
+    """
+    D = x.shape[-1]
+    metric = F.normalize(x, dim=-1)
+    scores = metric[:, ::2] @ metric[:, 1::2].transpose(1, 2)  # [B, Na, Nb]
+    node_max, node_idx = scores.max(dim=-1)  # best partner in b for every token in a
+    edge_idx = node_max.argsort(dim=-1, descending=True)
+    unm_idx, src_idx = edge_idx[:, r:], edge_idx[:, :r]
+    dst_idx = node_idx.gather(1, src_idx)
+
+    weighted = x * size
+    xa, xb = weighted[:, ::2], weighted[:, 1::2]
+    sa, sb = size[:, ::2], size[:, 1::2]
+    merged = xa.gather(1, src_idx[..., None].expand(-1, -1, D))
+    xb = xb.scatter_reduce(1, dst_idx[..., None].expand(-1, -1, D), merged, reduce="sum")
+    sb = sb.scatter_reduce(1, dst_idx[..., None], sa.gather(1, src_idx[..., None]), reduce="sum")
+
+    x = torch.cat([xa.gather(1, unm_idx[..., None].expand(-1, -1, D)), xb], dim=1)
+    size = torch.cat([sa.gather(1, unm_idx[..., None]), sb], dim=1)
+    pos = torch.cat([pos[:, ::2].gather(1, unm_idx), pos[:, 1::2]], dim=1)
+
+    order = pos.argsort(dim=1)
+    x = x.gather(1, order[..., None].expand(-1, -1, D)) / size.gather(1, order[..., None])
+    return x, size.gather(1, order[..., None]), pos.gather(1, order)
+
+
+def merge_tokens_to_budget(x, budget):
+    """
+    Merge similar tokens until every sequence has `budget` tokens.
+
+    Args:
+        x: Token features [B, N, D].
+        budget: Target number of tokens per sequence (no-op if >= N).
+
+    Returns:
+        tuple:
+            merged: [B, min(N, budget), D] merged tokens in original order.
+            keep_idx: [B, min(N, budget)] index of the original token each merged token is anchored at
+                (used to pick its position id).
+    """
+    B, N, _ = x.shape
+    pos = torch.arange(N, device=x.device).unsqueeze(0).expand(B, -1)
+    if budget is None or budget >= N:
+        return x, pos
+    assert budget >= 1, f"token budget must be >= 1, got {budget}"
+    size = torch.ones(B, N, 1, device=x.device, dtype=x.dtype)
+    while x.shape[1] > budget:
+        r = min(x.shape[1] - budget, x.shape[1] // 2)
+        x, size, pos = _bipartite_merge_round(x, size, pos, r)
+    return x, pos
+
+
+def reduce_qwenvl_visual_tokens(model, input_ids, attention_mask, pixel_values, image_grid_thw, budget, labels=None):
+    """
+    Encode images with the Qwen2.5-VL vision tower and merge each image's tokens down to `budget`
+    before they reach the decoder.
+
+    Args:
+        model: Qwen2_5_VLForConditionalGeneration.
+        input_ids: [B, T] token ids (left padded) containing image pad tokens.
+        attention_mask: [B, T] 1 = token, 0 = padding.
+        pixel_values: Flattened image patches as produced by the processor.
+        image_grid_thw: [num_images, 3] grid of every image, in batch order.
+        budget: Visual tokens kept per image.
+        labels: Optional [B, T] LM targets, reduced alongside the sequence.
+
+    Returns:
+        dict: inputs_embeds [B, T', D], attention_mask [B, T'], position_ids [3, B, T'] and labels
+            (if given), left padded to the longest reduced sequence. Feed them to model.forward instead of
+            input_ids / pixel_values.
+    """
+    qwen = model.model
+    image_token_id = model.config.image_token_id
+    inputs_embeds = qwen.get_input_embeddings()(input_ids)
+    image_embeds = qwen.visual(pixel_values.type(qwen.visual.dtype), grid_thw=image_grid_thw)
+    image_mask = input_ids == image_token_id
+    inputs_embeds = inputs_embeds.masked_scatter(
+        image_mask.unsqueeze(-1).expand_as(inputs_embeds), image_embeds.to(inputs_embeds.dtype)
+    )
+    position_ids, _ = qwen.get_rope_index(input_ids, image_grid_thw, None, attention_mask=attention_mask)
+
+    merge_size = qwen.visual.spatial_merge_size
+    tokens_per_image = (image_grid_thw.prod(-1) // merge_size**2).tolist()
+
+    image_cursor = 0
+    seq_embeds, seq_positions, seq_labels = [], [], []
+    for b in range(input_ids.shape[0]):
+        keep = attention_mask[b].bool() & ~image_mask[b]
+        embeds_b = inputs_embeds[b]
+        image_positions = image_mask[b].nonzero(as_tuple=True)[0]
+        offset = 0
+        while offset < len(image_positions):
+            num_tokens = tokens_per_image[image_cursor]
+            view_positions = image_positions[offset : offset + num_tokens]
+            merged, keep_idx = merge_tokens_to_budget(embeds_b[view_positions].unsqueeze(0), budget)
+            anchors = view_positions[keep_idx[0]]
+            embeds_b = embeds_b.index_put((anchors,), merged[0])
+            keep[anchors] = True
+            offset += num_tokens
+            image_cursor += 1
+        seq_embeds.append(embeds_b[keep])
+        seq_positions.append(position_ids[:, b, keep])
+        if labels is not None:
+            seq_labels.append(labels[b, keep])
+
+    # left pad, as the processor does
+    max_len = max(len(e) for e in seq_embeds)
+    B, D = len(seq_embeds), inputs_embeds.shape[-1]
+    out_embeds = inputs_embeds.new_zeros(B, max_len, D)
+    out_mask = attention_mask.new_zeros(B, max_len)
+    out_positions = position_ids.new_ones(3, B, max_len)
+    out_labels = labels.new_full((B, max_len), IGNORE_INDEX) if labels is not None else None
+    for b in range(B):
+        L = len(seq_embeds[b])
+        out_embeds[b, max_len - L :] = seq_embeds[b]
+        out_mask[b, max_len - L :] = 1
+        out_positions[:, b, max_len - L :] = seq_positions[b]
+        if labels is not None:
+            out_labels[b, max_len - L :] = seq_labels[b]
+
+    outputs = dict(inputs_embeds=out_embeds, attention_mask=out_mask, position_ids=out_positions)
+    if labels is not None:
+        outputs["labels"] = out_labels
+    return outputs
+
+
+if __name__ == "__main__":
+    # micro-benchmark: merging cost for a batch of 16x16-token views
+    import time
+
+    torch.manual_seed(0)
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    tokens = torch.randn(8, 256, 2048, device=device)
+    for budget in [256, 128, 64, 32, 16]:
+        merged, keep_idx = merge_tokens_to_budget(tokens, budget)
+        if device == "cuda":
+            torch.cuda.synchronize()
+        start = time.perf_counter()
+        for _ in range(10):
+            merge_tokens_to_budget(tokens, budget)
+        if device == "cuda":
+            torch.cuda.synchronize()
+        elapsed = (time.perf_counter() - start) / 10
+        print(f"budget={budget:4d} tokens={merged.shape[1]:4d} merge_time={1000 * elapsed:.2f}ms")
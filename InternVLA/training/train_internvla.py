@@ -324,6 +324,12 @@ class VLATrainer(TrainerUtils):
             instructions = [example["lang"] for example in examples]  # [B, str]
             actions = [example["action"] for example in examples]  # label
 
+            # optional feature cache: the sampler sweep below re-encodes the same batch with the same weights
+            model = self.accelerator.unwrap_model(self.model)
+            feature_cache_mb = self.config.trainer.get("eval_feature_cache_mb", None)
+            if feature_cache_mb:
+                model.enable_feature_cache(max_memory_mb=feature_cache_mb, model_version=f"step_{self.completed_steps}")
+
             # Predict actions using the model
             output_dict = self.model.predict_action(
                 batch_images=batch_images, instructions=instructions, use_ddim=True, num_ddim_steps=20
@@ -338,6 +344,23 @@ class VLATrainer(TrainerUtils):
             score = TrainerUtils.euclidean_distance(normalized_actions, actions)
             average_score = score / num_pots
             step_metrics["mse_score"] = average_score
+
+            # optional few-step sampler sweep in the same unit, e.g. ["ddim:10", "dpm_solver++:5"]
+            for sampler in self.config.trainer.get("eval_samplers", None) or []:
+                sampler_type, num_steps = sampler.split(":")
+                output_dict = self.model.predict_action(
+                    batch_images=batch_images,
+                    instructions=instructions,
+                    use_ddim=True,
+                    num_ddim_steps=int(num_steps),
+                    sampler_type=sampler_type,
+                )
+                score = TrainerUtils.euclidean_distance(output_dict["normalized_actions"], actions)
+                step_metrics[f"mse_score_{sampler_type}_{num_steps}"] = score / num_pots
+            if feature_cache_mb:
+                step_metrics.update(model.feature_cache.metrics())
+                # release the cached (GPU) features until the next eval
+                model.feature_cache = None
         pass
         dist.barrier()  # ensure all processes are synchronized
         return step_metrics
@@ -14,6 +14,14 @@ def main(args) -> None:
         unnorm_key=args.unnorm_key,
         image_size=args.image_size,
         cfg_scale=args.cfg_scale,
+        num_ddim_steps=args.num_ddim_steps,
+        sampler_type=args.sampler_type,
+        warm_start=args.warm_start,
+        warm_start_strength=args.warm_start_strength,
+        vlm_refresh_interval=args.vlm_refresh_interval,
+        vlm_refresh_frame_diff=args.vlm_refresh_frame_diff,
+        feature_cache_mb=args.feature_cache_mb,
+        feature_cache_dir=args.feature_cache_dir,
         use_bf16=args.use_bf16,
         action_ensemble=args.action_ensemble,
         adaptive_ensemble_alpha=args.adaptive_ensemble_alpha,
@@ -45,6 +53,25 @@ def build_argparser():
     parser.add_argument("--unnorm_key", type=str, default="bridge_dataset")
     parser.add_argument("--image_size", nargs=2, type=int, default=[224, 224])
     parser.add_argument("--cfg_scale", type=float, default=1.5)
+    parser.add_argument("--num_ddim_steps", type=int, default=10)
+    parser.add_argument("--sampler_type", type=str, default="ddim", choices=["ddim", "dpm_solver++"])
+    parser.add_argument("--warm_start", action="store_true", help="warm-start DDIM from the previous action chunk")
+    parser.add_argument(
+        "--warm_start_strength", type=float, default=0.5, help="fraction of DDIM steps re-run when warm-starting"
+    )
+    parser.add_argument(
+        "--vlm_refresh_interval", type=int, default=1, help="re-run Qwen-VL every N calls (1 = every call)"
+    )
+    parser.add_argument(
+        "--vlm_refresh_frame_diff",
+        type=float,
+        default=None,
+        help="also refresh when the mean frame difference exceeds this value in [0, 1]",
+    )
+    parser.add_argument(
+        "--feature_cache_mb", type=float, default=None, help="cache condition features of repeated frames (memory MB)"
+    )
+    parser.add_argument("--feature_cache_dir", type=str, default=None, help="optional on-disk tier of the feature cache")
     parser.add_argument("--port", type=int, default=10093)
     parser.add_argument("--use_bf16", type=bool, default=False)  #
     parser.add_argument("--action_ensemble", type=bool, default=False)
@@ -9,6 +9,7 @@ from transforms3d.euler import euler2axangle
 
 from InternVLA.model.framework.M1 import InternVLA_M1 as QwenpiPolicy
 from eval.sim_cogact.adaptive_ensemble import AdaptiveEnsembler
+from tools.vlm_refresh import VLMRefreshPolicy
 
 
 class QwenpiPolicyInterfence:
@@ -22,6 +23,13 @@ class QwenpiPolicyInterfence:
         cfg_scale: float = 1.5,
         use_ddim: bool = True,
         num_ddim_steps: int = 10,
+        sampler_type: str = "ddim",
+        warm_start: bool = False,
+        warm_start_strength: float = 0.5,
+        vlm_refresh_interval: int = 1,
+        vlm_refresh_frame_diff: Optional[float] = None,
+        feature_cache_mb: Optional[float] = None,
+        feature_cache_dir: Optional[str] = None,
         use_bf16: bool = False,
         action_ensemble: bool = False,
         adaptive_ensemble_alpha: float = 0.1,
@@ -37,6 +45,9 @@ class QwenpiPolicyInterfence:
         if use_bf16:
             self.vla = self.vla.to(torch.bfloat16)
         self.vla = self.vla.to("cuda").eval()
+        if feature_cache_mb:
+            # identical (frames, instruction) pairs across retries / repeated evals skip Qwen-VL, DINO and QFormer
+            self.vla.enable_feature_cache(max_memory_mb=feature_cache_mb, disk_dir=feature_cache_dir)
 
         # parameter setup
         self.policy_setup = policy_setup
@@ -46,6 +57,13 @@ class QwenpiPolicyInterfence:
         self.cfg_scale = cfg_scale
         self.use_ddim = use_ddim
         self.num_ddim_steps = num_ddim_steps
+        self.sampler_type = sampler_type
+        if warm_start and sampler_type != "ddim":
+            raise ValueError(f"warm_start is only supported with the ddim sampler, got sampler_type={sampler_type}")
+        if warm_start and self.vla.action_head_type != "diffusion":
+            raise ValueError(f"warm_start is only supported with the diffusion head, got {self.vla.action_head_type}")
+        self.warm_start = warm_start
+        self.warm_start_strength = warm_start_strength
         self.action_ensemble = action_ensemble
         self.adaptive_ensemble_alpha = adaptive_ensemble_alpha
 
@@ -56,6 +74,8 @@ class QwenpiPolicyInterfence:
         self.gripper_action_repeat = 0
         self.sticky_gripper_action = 0.0
         self.previous_gripper_action = None
+        self.previous_normalized_actions = None  # last predicted chunk, used to warm-start diffusion
+        self.vlm_refresh = VLMRefreshPolicy(vlm_refresh_interval, vlm_refresh_frame_diff)  # dual-rate inference
 
         # action ensemble
         if action_ensemble:
@@ -66,6 +86,8 @@ class QwenpiPolicyInterfence:
     def reset(self, task_description: str) -> None:
         """reset policy state"""
         self.task_description = task_description
+        if self.vla.feature_cache is not None:
+            print(f"*** feature cache: {self.vla.feature_cache.metrics()} ***")
         if self.action_ensembler:
             self.action_ensembler.reset()
 
@@ -73,6 +95,21 @@ class QwenpiPolicyInterfence:
         self.gripper_action_repeat = 0
         self.sticky_gripper_action = 0.0
         self.previous_gripper_action = None
+        self.previous_normalized_actions = None
+        self.vlm_refresh.reset()
+
+    @staticmethod
+    def shift_action_chunk(normalized_actions: np.ndarray, executed_steps: int) -> np.ndarray:
+        """
+        shift a chunk forward by the executed steps and pad the tail with the last action
+        :param normalized_actions: (B, T, D) normalized action chunk
+        :param executed_steps: number of actions executed since the chunk was predicted
+        :return: (B, T, D) shifted chunk
+        """
+        executed_steps = min(max(executed_steps, 0), normalized_actions.shape[1] - 1)
+        shifted = normalized_actions[:, executed_steps:]
+        pad = np.repeat(shifted[:, -1:], executed_steps, axis=1)
+        return np.concatenate([shifted, pad], axis=1)
 
     def step(
         self, images, task_description: Optional[str] = None, **kwargs
@@ -91,16 +128,37 @@ class QwenpiPolicyInterfence:
         # ensure image format correct --> here to align data format, including size, requirements and model alignment
         pil_images = self.align_visual_input(images)  # images is a list, with one element
 
+        # warm start from the previous chunk, shifted by the actions executed since (one per step call)
+        init_actions = None
+        if self.warm_start and self.previous_normalized_actions is not None:
+            init_actions = self.shift_action_chunk(
+                self.previous_normalized_actions, kwargs.get("executed_steps", 1)
+            )
+
+        # dual-rate inference: reuse the session's Qwen-VL features until a refresh is due
+        vlm_condition_features = None
+        if self.vlm_refresh.enabled:
+            vlm_condition_features = self.vlm_refresh.step(pil_images, task_description)
+
         # model inference
-        CoT_sentences, normalized_actions = self.vla.predict_action(
-            images=[pil_images],  # batch size = 1
+        output = self.vla.predict_action(
+            batch_images=[pil_images],  # batch size = 1
             instructions=[task_description],
             unnorm_key=self.unnorm_key,
             do_sample=False,
             cfg_scale=self.cfg_scale,
             use_ddim=self.use_ddim,
             num_ddim_steps=self.num_ddim_steps,
+            sampler_type=self.sampler_type,
+            init_actions=init_actions,
+            warm_start_strength=self.warm_start_strength,
+            vlm_condition_features=vlm_condition_features,
+            return_vlm_features=self.vlm_refresh.enabled and vlm_condition_features is None,
         )
+        normalized_actions = output["normalized_actions"]
+        if "vlm_condition_features" in output:
+            self.vlm_refresh.update(output["vlm_condition_features"], pil_images, task_description)
+        self.previous_normalized_actions = normalized_actions
 
         # unnormalize action
         action_norm_stats = self.vla.get_action_stats(self.unnorm_key)
@@ -0,0 +1,74 @@
+from typing import Optional, Sequence
+
+import numpy as np
+from PIL import Image
+
+
+def frame_difference(images: Sequence[Image.Image], reference: Sequence[np.ndarray]) -> float:
+    """Mean absolute pixel difference in [0, 1], taking the largest value over camera views."""
+    diffs = [
+        np.abs(np.asarray(img, dtype=np.int16) - ref).mean() / 255.0 for img, ref in zip(images, reference)
+    ]
+    return float(max(diffs)) if diffs else 0.0
+
+
+class VLMRefreshPolicy:
+    """Decides when the cached Qwen-VL conditioning of one session has to be recomputed.
+
+    The Qwen-VL forward dominates inference latency while the instruction is constant and the scene
+    changes slowly, so its hidden states are kept across calls and refreshed only when:
+      - `refresh_interval` calls have passed since the last refresh,
+      - the instruction changed, or
+      - the frame difference to the frames seen at the last refresh exceeds `frame_diff_threshold`.
+    DINO, QFormer and the action head still run on every call.
+    """
+
+    def __init__(self, refresh_interval: int = 1, frame_diff_threshold: Optional[float] = None) -> None:
+        assert refresh_interval >= 1, f"refresh_interval must be >= 1, got {refresh_interval}"
+        self.refresh_interval = refresh_interval
+        self.frame_diff_threshold = frame_diff_threshold
+        self.num_calls = 0
+        self.num_refreshes = 0
+        self.reset()
+
+    @property
+    def enabled(self) -> bool:
+        return self.refresh_interval > 1 or self.frame_diff_threshold is not None
+
+    def reset(self) -> None:
+        """drop the cached features, e.g. at the start of an episode"""
+        self.features = None
+        self.instruction = None
+        self.reference_frames = None
+        self.calls_since_refresh = 0
+
+    def should_refresh(self, images: Sequence[Image.Image], instruction: str) -> bool:
+        if self.features is None or instruction != self.instruction:
+            return True
+        if self.calls_since_refresh >= self.refresh_interval:
+            return True
+        if self.frame_diff_threshold is not None:
+            return frame_difference(images, self.reference_frames) > self.frame_diff_threshold
+        return False
+
+    def step(self, images: Sequence[Image.Image], instruction: str):
+        """
+        account for one inference call
+        :return: the cached features to reuse, or None if the caller must recompute and `update`
+        """
+        self.num_calls += 1
+        if self.should_refresh(images, instruction):
+            return None
+        self.calls_since_refresh += 1
+        return self.features
+
+    def update(self, features, images: Sequence[Image.Image], instruction: str) -> None:
+        self.features = features
+        self.instruction = instruction
+        self.reference_frames = [np.asarray(img, dtype=np.int16) for img in images]
+        self.calls_since_refresh = 1
+        self.num_refreshes += 1
+
+    @property
+    def refresh_rate(self) -> float:
+        return self.num_refreshes / max(self.num_calls, 1)
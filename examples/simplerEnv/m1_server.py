@@ -26,6 +26,7 @@ class M1Inference:
         cfg_scale: float = 1.5,
         use_ddim: bool = True,
         num_ddim_steps: int = 10,
+        sampler_type: str = "ddim",
         action_ensemble = True,
         adaptive_ensemble_alpha = 0.1,
         host="0.0.0.0",
@@ -63,6 +64,7 @@ class M1Inference:
         print(f"*** policy_setup: {policy_setup}, unnorm_key: {unnorm_key} ***")
         self.use_ddim = use_ddim
         self.num_ddim_steps = num_ddim_steps
+        self.sampler_type = sampler_type
 
 
         self.cfg_scale = cfg_scale # 1.5
@@ -135,6 +137,7 @@ class M1Inference:
             "cfg_scale": self.cfg_scale,
             "use_ddim": self.use_ddim,
             "num_ddim_steps": self.num_ddim_steps,
+            "sampler_type": self.sampler_type,
         }
         
         
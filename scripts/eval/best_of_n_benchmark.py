@@ -0,0 +1,94 @@
+"""
+Latency of best-of-N action sampling: predict_action(num_samples=N) vs N independent predict_action calls.
+
+For each N it reports
+  - naive_ms: N calls (Qwen-VL, DINO, QFormer and the action head all re-run per sample)
+  - batched_ms: one call with num_samples=N (conditioning once, one batched DDIM loop over N noise draws)
+  - condition_ms: the shared conditioning alone (encode_action_condition)
+  - dit_ms: batched_ms - condition_ms, the only part expected to grow with N
+  - sample_spread: mean distance of the N samples to their medoid (how much best-of-N can choose from)
+
+Example:
+    python scripts/eval/best_of_n_benchmark.py \
+        --ckpt_path results/Checkpoints/xxx/checkpoints/steps_20000_pytorch_model.pt --num_samples 1 2 4 8 16
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+import torch
+from PIL import Image
+
+from InternVLA.model.framework.M1 import InternVLA_M1
+
+
+def timed(fn, repeats):
+    fn()  # warmup
+    torch.cuda.synchronize()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        result = fn()
+    torch.cuda.synchronize()
+    return 1000 * (time.perf_counter() - start) / repeats, result
+
+
+def build_argparser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ckpt_path", type=str, required=True)
+    parser.add_argument("--num_samples", nargs="*", type=int, default=[1, 2, 4, 8, 16])
+    parser.add_argument("--num_views", type=int, default=2)
+    parser.add_argument("--cfg_scale", type=float, default=1.5)
+    parser.add_argument("--num_ddim_steps", type=int, default=10)
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=str, default=None, help="optional json file for the results")
+    return parser
+
+
+def main(args):
+    vla = InternVLA_M1.from_pretrained(args.ckpt_path).to("cuda").eval()
+    rng = np.random.default_rng(args.seed)
+    batch_images = [
+        [Image.fromarray(rng.integers(0, 256, (224, 224, 3), dtype=np.uint8)) for _ in range(args.num_views)]
+    ]
+    instructions = ["put the spoon on the towel"]
+    kwargs = dict(cfg_scale=args.cfg_scale, use_ddim=True, num_ddim_steps=args.num_ddim_steps)
+
+    condition_ms, _ = timed(lambda: vla.encode_action_condition(batch_images, instructions), args.repeats)
+    results = []
+    for n in args.num_samples:
+        naive_ms, _ = timed(
+            lambda: [
+                vla.predict_action(batch_images=batch_images, instructions=instructions, **kwargs) for _ in range(n)
+            ],
+            args.repeats,
+        )
+        batched_ms, output = timed(
+            lambda: vla.predict_action(batch_images=batch_images, instructions=instructions, num_samples=n, **kwargs),
+            args.repeats,
+        )
+        spread = 0.0
+        if n > 1:
+            samples = output["all_normalized_actions"][0]
+            spread = float(np.linalg.norm((samples - output["normalized_actions"][0]).reshape(n, -1), axis=-1).mean())
+        result = {
+            "num_samples": n,
+            "naive_ms": naive_ms,
+            "batched_ms": batched_ms,
+            "condition_ms": condition_ms,
+            "dit_ms": batched_ms - condition_ms,
+            "speedup": naive_ms / batched_ms,
+            "sample_spread": spread,
+        }
+        print(json.dumps(result))
+        results.append(result)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main(build_argparser().parse_args())
@@ -0,0 +1,190 @@
+"""
+Dataloader throughput and worker memory of the VLA mixture dataset for the low-dimensional read paths:
+parquet files with every per-worker trajectory cache budget, and (--columnar_store) the memory-mapped columnar store.
+
+For every run it reports, through a torch DataLoader with the mixture's sampling:
+  - samples_per_s: state / action / language reads of a sample (the part the trajectory cache / store serves);
+    with --full_pipeline, the full mixture __getitem__ (video decoding and transforms included)
+  - hits / misses / hit_rate: trajectory cache counters summed over the workers
+  - readers_opened / readers_reused: video reader pool counters summed over the workers (--full_pipeline)
+  - distinct_trajectories_per_batch / distinct_trajectories_per_window: distinct (dataset, trajectory) pairs over
+    the samples of a batch / of --diversity_window consecutive batches, a proxy of the sample diversity the optimizer
+    sees, to compare trajectory-block sampling (--locality_run_lengths > 1) with independent steps
+  - worker_private_mb / worker_pss_mb: mean per-worker private and proportional set size (Linux /proc),
+    memory shared through the page cache is split over the workers in the PSS
+
+A budget of 0 re-reads and re-parses the episode parquet file on every sample (the previous behaviour).
+Every run is repeated for every --locality_run_lengths value.
+
+Example:
+    python -m InternVLA.dataloader.gr00t_lerobot.columnar_store --dataset_paths playground/demo_data/sim_pick_place
+    python scripts/eval/dataloader_benchmark.py --config_yaml InternVLA/config/training/internvla_cotrain_sim_demo.yaml \
+        --trajectory_cache_mb 0 64 --columnar_store --num_batches 50 --num_workers 8
+    python scripts/eval/dataloader_benchmark.py --trajectory_cache_mb 64 --locality_run_lengths 1 4 16 --full_pipeline
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+from omegaconf import OmegaConf
+from torch.utils.data import DataLoader, Dataset, get_worker_info
+
+from InternVLA.dataloader.gr00t_lerobot.video import get_video_reader_pool
+from InternVLA.dataloader.lerobot_datasets import get_vla_dataset
+
+
+class LowDimSteps(Dataset):
+    """Mixture sampling, reading only the non-video modalities of each step."""
+
+    def __init__(self, mixture):
+        self.mixture = mixture
+
+    def __len__(self):
+        return len(self.mixture)
+
+    def __getitem__(self, index):
+        dataset, trajectory_id, base_index = self.mixture.sample_step(index)
+        dataset.curr_traj_data = dataset.get_trajectory_data(trajectory_id)
+        return {
+            key: dataset.get_data_by_modality(trajectory_id, modality, key, base_index)
+            for modality in ["state", "action", "language"]
+            for key in dataset.modality_keys.get(modality, [])
+        }
+
+
+def worker_memory_mb():
+    """(private, pss) MB of the calling process."""
+    memory = {}
+    with open("/proc/self/smaps_rollup", "r") as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) == 3 and fields[2] == "kB":
+                memory[fields[0].rstrip(":")] = int(fields[1]) / 1024
+    return memory["Private_Clean"] + memory["Private_Dirty"], memory["Pss"]
+
+
+def collate_with_cache_stats(batch):
+    """Keep the batch as a list and attach the cache counters and memory of the worker that built it."""
+    worker = get_worker_info()
+    if worker is None:
+        return batch, (0, None, None, None)
+    mixture = worker.dataset.mixture if isinstance(worker.dataset, LowDimSteps) else worker.dataset
+    stats = {dataset.dataset_name: dataset.trajectory_cache_stats() for dataset in mixture.datasets}
+    return batch, (worker.id, stats, get_video_reader_pool().stats(), worker_memory_mb())
+
+
+def distinct_trajectories(mixture, start, stop):
+    """Distinct (dataset, trajectory) pairs over the samples [start, stop) of epoch 0, as a fraction of the samples."""
+    dataset_indices, step_indices = mixture.sampler.sample(0, start, stop)
+    trajectories = {
+        (int(dataset_index), int(mixture.datasets[dataset_index].all_steps.trajectory_ids[step_index]))
+        for dataset_index, step_index in zip(dataset_indices, step_indices)
+    }
+    return len(trajectories) / (stop - start)
+
+
+def build_argparser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--config_yaml", type=str, default="InternVLA/config/training/internvla_cotrain_sim_demo.yaml")
+    parser.add_argument("--trajectory_cache_mb", nargs="*", type=float, default=[0, 64])
+    parser.add_argument("--columnar_store", action="store_true", help="add a run reading the (prebuilt) columnar store")
+    parser.add_argument(
+        "--full_pipeline", action="store_true", help="time the full mixture __getitem__ (needs the videos)"
+    )
+    parser.add_argument("--locality_run_lengths", nargs="*", type=int, default=[1], help="1: independent steps")
+    parser.add_argument("--diversity_window", type=int, default=8, help="consecutive batches of the window diversity")
+    parser.add_argument("--batch_size", type=int, default=16)
+    parser.add_argument("--num_workers", type=int, default=8)
+    parser.add_argument("--num_batches", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=str, default=None, help="optional json file for the results")
+    return parser
+
+
+def main(args):
+    assert args.num_workers > 0, "cache counters are collected from the dataloader workers"
+    cfg = OmegaConf.load(args.config_yaml)
+    runs = [("parquet", budget) for budget in args.trajectory_cache_mb]
+    if args.columnar_store:
+        runs.append(("columnar", 0))
+    runs = [(source, budget, run_length) for source, budget in runs for run_length in args.locality_run_lengths]
+    results = []
+    for source, budget, run_length in runs:
+        data_cfg = cfg.datasets.vla_data.copy()
+        data_cfg.trajectory_cache_mb = budget
+        data_cfg.use_columnar_store = source == "columnar"
+        data_cfg.locality_run_length = run_length
+        data_cfg.per_device_batch_size = args.batch_size
+        data_cfg.num_workers = args.num_workers
+        mixture = get_vla_dataset(data_cfg=data_cfg, seed=args.seed)
+        if source == "columnar":
+            assert all(dataset._columnar_store is not None for dataset in mixture.datasets), (
+                "build the columnar store first"
+            )
+        loader = DataLoader(
+            mixture if args.full_pipeline else LowDimSteps(mixture),
+            batch_size=args.batch_size,
+            num_workers=args.num_workers,
+            collate_fn=collate_with_cache_stats,
+        )
+
+        iterator = iter(loader)
+        for _ in range(args.num_workers):
+            next(iterator)  # worker startup
+        worker_stats, worker_readers, worker_memory = {}, {}, {}
+        num_samples = 0
+        start = time.perf_counter()
+        for _ in range(args.num_batches):
+            batch, (worker_id, stats, readers, memory) = next(iterator)
+            num_samples += len(batch)
+            worker_stats[worker_id], worker_readers[worker_id], worker_memory[worker_id] = stats, readers, memory
+        elapsed = time.perf_counter() - start
+        del iterator
+
+        # latest counters per worker, summed over workers and datasets
+        counters = [s for stats in worker_stats.values() for s in stats.values()]
+        hits = sum(s["hits"] for s in counters)
+        misses = sum(s["misses"] for s in counters)
+        window = args.diversity_window * args.batch_size
+        num_batches = args.num_workers + args.num_batches
+        result = {
+            "source": source,
+            "trajectory_cache_mb": budget,
+            "locality_run_length": run_length,
+            "samples_per_s": num_samples / elapsed,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / max(hits + misses, 1),
+            "readers_opened": sum(readers["opened"] for readers in worker_readers.values()),
+            "readers_reused": sum(readers["reused"] for readers in worker_readers.values()),
+            "distinct_trajectories_per_batch": float(
+                np.mean(
+                    [
+                        distinct_trajectories(mixture, b * args.batch_size, (b + 1) * args.batch_size)
+                        for b in range(num_batches)
+                    ]
+                )
+            ),
+            "distinct_trajectories_per_window": float(
+                np.mean(
+                    [
+                        distinct_trajectories(mixture, w * window, (w + 1) * window)
+                        for w in range(num_batches // args.diversity_window)
+                    ]
+                )
+            ),
+            "worker_private_mb": float(np.mean([memory[0] for memory in worker_memory.values()])),
+            "worker_pss_mb": float(np.mean([memory[1] for memory in worker_memory.values()])),
+        }
+        print(json.dumps(result))
+        results.append(result)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main(build_argparser().parse_args())
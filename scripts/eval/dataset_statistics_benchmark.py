@@ -0,0 +1,242 @@
+"""
+Dataset statistics (`meta/stats_gr00t.json`): the former computation (all parquet files concatenated into one
+DataFrame, exact np.quantile) vs. the streaming, mergeable summaries of `dataset_statistics.py`.
+
+Checks, on the demo dataset and on a synthetic dataset of --num_episodes episodes (normal, heavy-tailed, constant,
+near-zero, narrow range far from zero, binary gripper and integer columns next to a binary annotation column):
+  - every q01 / q99 is within the range tolerance of the exact value:
+    |estimate - exact| <= --range_accuracy x (exact q99 - exact q01), so a narrow range far from zero (2.0..2.0001)
+    does not collapse to q01 == q99
+  - mean / std / min / max match the exact values (rtol 1e-9; the former ones are accumulated in float32, and their std
+    of the narrow column is off by 2x)
+  - incremental updates: computing the first half of the episodes, then all of them, only processes the second half
+    and gives the same result as computing everything at once; rewriting one episode only reprocesses its part
+
+It reports, for the former computation and for every --num_processes value, the build time and the peak resident
+memory of the process (measured in a forked child).
+
+Example:
+    python scripts/eval/dataset_statistics_benchmark.py --num_episodes 2000 --num_processes 1 4
+"""
+
+import argparse
+import json
+import multiprocessing
+import resource
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+
+from InternVLA.dataloader.gr00t_lerobot.dataset_statistics import (
+    DEFAULT_RANGE_ACCURACY,
+    DEFAULT_RELATIVE_ACCURACY,
+    compute_statistics,
+    update_partials,
+)
+from InternVLA.dataloader.gr00t_lerobot.datasets import LE_ROBOT_DATA_FILENAME
+
+DEMO_DATASET = "playground/demo_data/sim_pick_place"
+
+
+def legacy_statistics(parquet_paths: list[Path]) -> dict:
+    """The former `calculate_dataset_statistics`."""
+    all_low_dim_data = pd.concat([pd.read_parquet(path) for path in sorted(parquet_paths)], axis=0)
+    dataset_statistics = {}
+    for le_modality in all_low_dim_data.columns:
+        if le_modality.startswith("annotation."):
+            continue
+        np_data = np.vstack([np.asarray(x, dtype=np.float32) for x in all_low_dim_data[le_modality]])
+        dataset_statistics[le_modality] = {
+            "mean": np.mean(np_data, axis=0).tolist(),
+            "std": np.std(np_data, axis=0).tolist(),
+            "min": np.min(np_data, axis=0).tolist(),
+            "max": np.max(np_data, axis=0).tolist(),
+            "q01": np.quantile(np_data, 0.01, axis=0).tolist(),
+            "q99": np.quantile(np_data, 0.99, axis=0).tolist(),
+        }
+    return dataset_statistics
+
+
+def exact_statistics(parquet_paths: list[Path]) -> dict:
+    """The former statistics of the float32 values, computed in float64."""
+    data = pd.concat([pd.read_parquet(path) for path in sorted(parquet_paths)], axis=0)
+    statistics = {}
+    for name in data.columns:
+        if name.startswith("annotation."):
+            continue
+        values = np.vstack([np.asarray(x, dtype=np.float32) for x in data[name]]).astype(np.float64)
+        statistics[name] = {
+            "mean": np.mean(values, axis=0),
+            "std": np.std(values, axis=0),
+            "min": np.min(values, axis=0),
+            "max": np.max(values, axis=0),
+            "q01": np.quantile(values, 0.01, axis=0),
+            "q99": np.quantile(values, 0.99, axis=0),
+        }
+    return statistics
+
+
+def check_statistics(statistics: dict, expected: dict, exact: dict, range_accuracy: float) -> float:
+    """Assert the tolerances, return the largest quantile error relative to q99 - q01."""
+    assert list(statistics) == list(expected), f"columns differ: {list(statistics)} != {list(expected)}"
+    worst = 0.0
+    for name, column in statistics.items():
+        for key in ["mean", "std", "min", "max"]:
+            assert np.allclose(column[key], exact[name][key], rtol=1e-9, atol=1e-12), (
+                f"{name}.{key}: {column[key]} != {exact[name][key]}"
+            )
+        exact_range = exact[name]["q99"] - exact[name]["q01"]
+        for key, exact_value in [("q01", exact[name]["q01"]), ("q99", exact[name]["q99"])]:
+            error = np.abs(np.asarray(column[key]) - exact_value)
+            # float64 rounding of the interpolation on top of the tolerance
+            bound = range_accuracy * exact_range + 1e-12 * np.maximum(1.0, np.abs(exact_value))
+            assert np.all(error <= bound), f"{name}.{key}: error {error} above {bound}"
+            worst = max(worst, float(np.max(error / np.where(exact_range > 0, exact_range, np.inf))))
+    return worst
+
+
+def write_synthetic_dataset(target: Path, num_episodes: int, seed: int, annotation_bytes: int = 1024):
+    rng = np.random.default_rng(seed)
+    for episode_index in tqdm(range(num_episodes), desc="Writing synthetic episodes"):
+        length = int(rng.integers(20, 200))
+        gripper = np.zeros(length)
+        for toggle in np.sort(rng.integers(length, size=rng.integers(0, 3))):
+            gripper[toggle:] = 1.0 - gripper[toggle]
+        path = target / "data" / f"chunk-{episode_index // 1000:03d}" / f"episode_{episode_index:06d}.parquet"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        pd.DataFrame(
+            {
+                "state.joints": list(rng.normal(loc=rng.normal(size=7), size=(length, 7))),
+                "action.delta_eef_position": list(rng.standard_t(2, size=(length, 3)).astype(np.float32) * 1e-3),
+                "action.constant": list(np.full((length, 2), [0.0, 3.5], dtype=np.float32)),
+                "action.tiny": list(rng.normal(scale=1e-6, size=(length, 2)).astype(np.float32)),
+                "state.narrow": list((2.0 + rng.uniform(0, 1e-4, size=(length, 2))).astype(np.float32)),
+                "action.gripper_close": list(gripper.astype(np.float32)[:, None]),
+                "timestamp": (np.arange(length) / 10).astype(np.float32),
+                "frame_index": np.arange(length),
+                "episode_index": np.full(length, episode_index),
+                "annotation.bbox3d": [rng.bytes(annotation_bytes) for _ in range(length)],
+            }
+        ).to_parquet(path)
+
+
+def measure(fn, *args, **kwargs) -> tuple:
+    """(result, seconds, peak resident MB above the baseline) of fn run in a forked child (and its own children)."""
+    context = multiprocessing.get_context("fork")
+    receiver, sender = context.Pipe(duplex=False)
+
+    def run():
+        baseline = _status_kb("VmRSS")
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        build_s = time.perf_counter() - start
+        # processes forked by fn (multiprocessing pool) are counted as well
+        peak_kb = max(_status_kb("VmHWM"), resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+        sender.send((result, build_s, (peak_kb - baseline) / 1024))
+
+    process = context.Process(target=run)
+    process.start()
+    result = receiver.recv()
+    process.join()
+    return result
+
+
+def _status_kb(field: str) -> int:
+    with open("/proc/self/status", "r") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith(field + ":"))
+
+
+def build_argparser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num_episodes", type=int, default=2000)
+    parser.add_argument("--num_processes", nargs="*", type=int, default=[1, 4])
+    parser.add_argument("--relative_accuracy", type=float, default=DEFAULT_RELATIVE_ACCURACY)
+    parser.add_argument("--range_accuracy", type=float, default=DEFAULT_RANGE_ACCURACY)
+    parser.add_argument("--part_size", type=int, default=256)
+    parser.add_argument("--annotation_bytes", type=int, default=1024, help="synthetic annotation bytes per step")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=str, default=None, help="optional json file for the results")
+    return parser
+
+
+def main(args):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        synthetic = Path(tmp_dir) / "synthetic"
+        write_synthetic_dataset(synthetic, args.num_episodes, args.seed, args.annotation_bytes)
+        for name, dataset_path in [("demo", Path(DEMO_DATASET)), (f"synthetic_{args.num_episodes}", synthetic)]:
+            parquet_paths = sorted(dataset_path.glob(LE_ROBOT_DATA_FILENAME))
+            expected, legacy_s, legacy_mb = measure(legacy_statistics, parquet_paths)
+            exact = exact_statistics(parquet_paths)
+            result = {"dataset": name, "variant": "legacy", "build_s": legacy_s, "peak_mb": legacy_mb}
+            print(json.dumps(result))
+            results.append(result)
+
+            for num_processes in args.num_processes:
+                statistics, build_s, peak_mb = measure(
+                    compute_statistics,
+                    parquet_paths,
+                    relative_accuracy=args.relative_accuracy,
+                    range_accuracy=args.range_accuracy,
+                    num_processes=num_processes,
+                    part_size=args.part_size,
+                )
+                worst = check_statistics(statistics, expected, exact, args.range_accuracy)
+                result = {
+                    "dataset": name,
+                    "variant": f"streaming_{num_processes}_processes",
+                    "build_s": build_s,
+                    "peak_mb": peak_mb,
+                    "max_quantile_error_over_range": worst,
+                }
+                print(json.dumps(result))
+                results.append(result)
+
+            # incremental updates, on a scratch copy of the parquet files
+            copy = Path(tmp_dir) / f"{name}_copy"
+            for path in parquet_paths:
+                (copy / path.relative_to(dataset_path)).parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy2(path, copy / path.relative_to(dataset_path))
+            copy_paths = sorted(copy.glob(LE_ROBOT_DATA_FILENAME))
+            partials_path = copy / "meta" / "stats_partials.pkl"
+            partials_path.parent.mkdir()
+            kwargs = dict(relative_accuracy=args.relative_accuracy, num_processes=1, part_size=args.part_size)
+            half = len(copy_paths) // 2
+            _, first = update_partials(copy_paths[:half], partials_path, **kwargs)
+            start = time.perf_counter()
+            _, second = update_partials(copy_paths, partials_path, **kwargs)
+            update_s = time.perf_counter() - start
+            assert first["processed"] == half and second["processed"] == len(copy_paths) - half, (first, second)
+            incremental = compute_statistics(copy_paths, partials_path, **kwargs)
+            full = compute_statistics(copy_paths, **kwargs)
+            for column in full:
+                for key in full[column]:
+                    assert np.allclose(incremental[column][key], full[column][key], rtol=1e-9, atol=1e-12), (column, key)
+            pd.read_parquet(copy_paths[-1]).to_parquet(copy_paths[-1])
+            _, rewritten = update_partials(copy_paths, partials_path, **kwargs)
+            expected_reprocessed = (len(copy_paths) - half - 1) % args.part_size + 1
+            assert rewritten["processed"] == expected_reprocessed, (rewritten, expected_reprocessed)
+            result = {
+                "dataset": name,
+                "variant": "incremental",
+                "first_half": first,
+                "second_half": second,
+                "second_half_s": update_s,
+                "after_rewriting_one_episode": rewritten,
+                "identical_to_full": True,
+            }
+            print(json.dumps(result))
+            results.append(result)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main(build_argparser().parse_args())
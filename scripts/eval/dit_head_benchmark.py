@@ -0,0 +1,167 @@
+"""
+Cost of the DiT action head presets, per denoising step and per training step.
+
+Two parts, on random inputs (no checkpoint needed):
+  - inference: FLOPs and latency of one denoising step of a CFG pair (batch 2), for DiT-B vs DiT-B-CrossAttn
+    (condition keys / values cached once per request through `precompute_condition`)
+  - training: repeated diffusion steps per sample with `condition.repeat(R)` vs the native `repeat` argument
+    (condition embedded / projected once and broadcast). Reports the parity of both forwards, the bytes of saved
+    activations (counted with saved_tensors_hooks), the peak CUDA memory and the step time
+
+Example:
+    python scripts/eval/dit_head_benchmark.py --model_types DiT-B DiT-B-CrossAttn --repeats 1 2 4 8
+"""
+
+import argparse
+import json
+import time
+
+import torch
+from torch.utils.flop_counter import FlopCounterMode
+
+from InternVLA.model.modules.action_model.DiTActionHeader import DiT_models
+
+
+def synchronize(device: str):
+    if device == "cuda":
+        torch.cuda.synchronize()
+
+
+def build_net(model_type: str, args):
+    return DiT_models[model_type](in_channels=args.action_dim, future_action_window_size=args.action_len - 1).to(
+        args.device
+    )
+
+
+def inference_step_cost(args) -> list[dict]:
+    """FLOPs and latency of one denoising step, batch 2 = one CFG pair."""
+    batch_size = 2
+    x = torch.randn(batch_size, args.action_len, args.action_dim, device=args.device)
+    t = torch.randint(0, 100, (batch_size,), device=args.device)
+    z = torch.randn(batch_size, args.n_cond, args.token_size, device=args.device)
+
+    results = []
+    for model_type in args.model_types:
+        net = build_net(model_type, args).eval()
+        model_kwargs = dict(z=z)
+        with torch.no_grad():
+            if hasattr(net, "precompute_condition"):
+                model_kwargs["cond_kv"] = net.precompute_condition(z)
+            with FlopCounterMode(display=False) as flop_counter:
+                net(x, t, **model_kwargs)
+            for _ in range(3):
+                net(x, t, **model_kwargs)
+            synchronize(args.device)
+            start = time.perf_counter()
+            for _ in range(args.num_iters):
+                net(x, t, **model_kwargs)
+            synchronize(args.device)
+        results.append(
+            {
+                "part": "inference",
+                "model_type": model_type,
+                "gflops_per_step": flop_counter.get_total_flops() / 1e9,
+                "ms_per_step": (time.perf_counter() - start) / args.num_iters * 1e3,
+            }
+        )
+    return results
+
+
+def train_step(net, x, t, z, repeat: int, native: bool) -> int:
+    """One forward / backward; returns the bytes of activations saved for backward (parameters excluded)."""
+    saved = {}
+    parameters = {p.untyped_storage().data_ptr() for p in net.parameters()}
+
+    def pack(tensor):
+        if tensor.untyped_storage().data_ptr() not in parameters:
+            saved[tensor.untyped_storage().data_ptr()] = tensor.untyped_storage().nbytes()
+        return tensor
+
+    z = z.clone().requires_grad_(True)  # stands for the QFormer output
+    with torch.autograd.graph.saved_tensors_hooks(pack, lambda tensor: tensor):
+        if native:
+            out = net(x, t, z, repeat=repeat)
+        else:
+            out = net(x, t, z.repeat(repeat, 1, 1))
+    out.square().mean().backward()
+    return sum(saved.values())
+
+
+def repeated_training_cost(args) -> list[dict]:
+    """Native `repeat` vs `condition.repeat(R)`: parity, saved activations, peak memory and step time."""
+    batch_size = args.batch_size
+    z = torch.randn(batch_size, args.n_cond, args.token_size, device=args.device)
+    results = []
+    for model_type in args.model_types:
+        net = build_net(model_type, args)
+        # parity: without dropout (eval) and with every condition dropped (train, dropout_prob=1)
+        for train, dropout_prob in [(False, 0.1), (True, 1.0)]:
+            net.train(train)
+            net.z_embedder.dropout_prob = dropout_prob
+            x = torch.randn(4 * batch_size, args.action_len, args.action_dim, device=args.device)
+            t = torch.randint(0, 100, (4 * batch_size,), device=args.device)
+            with torch.no_grad():
+                diff = (net(x, t, z, repeat=4) - net(x, t, z.repeat(4, 1, 1))).abs().max().item()
+            results.append(
+                {
+                    "part": "parity",
+                    "model_type": model_type,
+                    "train": train,
+                    "dropout_prob": dropout_prob,
+                    "max_abs_diff": diff,
+                }
+            )
+        net.z_embedder.dropout_prob = 0.1
+        net.train()
+
+        for repeat in args.repeats:
+            x = torch.randn(repeat * batch_size, args.action_len, args.action_dim, device=args.device)
+            t = torch.randint(0, 100, (repeat * batch_size,), device=args.device)
+            for native in [False, True]:
+                train_step(net, x, t, z, repeat, native)  # warmup
+                synchronize(args.device)
+                if args.device == "cuda":
+                    torch.cuda.reset_peak_memory_stats()
+                start = time.perf_counter()
+                activation_bytes = train_step(net, x, t, z, repeat, native)
+                synchronize(args.device)
+                result = {
+                    "part": "training",
+                    "model_type": model_type,
+                    "repeat": repeat,
+                    "native": native,
+                    "saved_activations_mb": activation_bytes / 2**20,
+                    "ms_per_step": (time.perf_counter() - start) * 1e3,
+                }
+                if args.device == "cuda":
+                    result["peak_mb"] = torch.cuda.max_memory_allocated() / 2**20
+                results.append(result)
+    return results
+
+
+def build_argparser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model_types", nargs="*", default=["DiT-B", "DiT-B-CrossAttn"])
+    parser.add_argument("--device", type=str, default="cuda" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--action_len", type=int, default=16)
+    parser.add_argument("--action_dim", type=int, default=7)
+    parser.add_argument("--n_cond", type=int, default=64, help="condition tokens (QFormer queries)")
+    parser.add_argument("--token_size", type=int, default=768)
+    parser.add_argument("--num_iters", type=int, default=20, help="timed denoising steps")
+    parser.add_argument("--batch_size", type=int, default=16, help="training samples before repeat")
+    parser.add_argument("--repeats", nargs="*", type=int, default=[1, 2, 4, 8])
+    parser.add_argument("--output", type=str, default=None, help="optional json file for the results")
+    return parser
+
+
+def main(args):
+    results = inference_step_cost(args) + repeated_training_cost(args)
+    for result in results:
+        print(json.dumps(result))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main(build_argparser().parse_args())
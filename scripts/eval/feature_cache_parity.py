@@ -0,0 +1,91 @@
+"""
+Cached vs uncached predict_action parity for the content-addressed feature cache.
+
+Runs the same (frames, instruction) batch with an identical sampling seed
+  1) without the cache,
+  2) with the cache, cold (all misses),
+  3) with the cache, warm (all hits, memory tier),
+  4) with a fresh cache backed by the disk tier of 3) (all disk hits),
+  5) a batch mixing cached and new samples (partial hits),
+and checks that the normalized actions match the uncached ones. Also reports hit rate / saved time.
+
+Example:
+    python scripts/eval/feature_cache_parity.py \
+        --ckpt_path results/Checkpoints/xxx/checkpoints/steps_20000_pytorch_model.pt
+"""
+
+import argparse
+import json
+import tempfile
+
+import numpy as np
+import torch
+from PIL import Image
+
+from InternVLA.model.framework.M1 import InternVLA_M1
+
+
+def predict(vla, batch_images, instructions, args):
+    torch.manual_seed(args.seed)
+    output = vla.predict_action(
+        batch_images=batch_images,
+        instructions=instructions,
+        cfg_scale=args.cfg_scale,
+        use_ddim=True,
+        num_ddim_steps=args.num_ddim_steps,
+    )
+    return output["normalized_actions"]
+
+
+def build_argparser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ckpt_path", type=str, required=True)
+    parser.add_argument("--batch_size", type=int, default=4)
+    parser.add_argument("--num_views", type=int, default=2)
+    parser.add_argument("--cfg_scale", type=float, default=1.5)
+    parser.add_argument("--num_ddim_steps", type=int, default=10)
+    parser.add_argument(
+        "--atol", type=float, default=1e-3, help="bf16 kernels may differ slightly between batch sizes (partial hits)"
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    return parser
+
+
+def main(args):
+    vla = InternVLA_M1.from_pretrained(args.ckpt_path).to("cuda").eval()
+
+    rng = np.random.default_rng(args.seed)
+    batch_images = [
+        [Image.fromarray(rng.integers(0, 256, (224, 224, 3), dtype=np.uint8)) for _ in range(args.num_views)]
+        for _ in range(2 * args.batch_size)
+    ]
+    instructions = [f"put the object number {i} in the basket" for i in range(2 * args.batch_size)]
+    first, second = slice(0, args.batch_size), slice(args.batch_size // 2, args.batch_size // 2 + args.batch_size)
+
+    reference = predict(vla, batch_images[first], instructions[first], args)
+    reference_second = predict(vla, batch_images[second], instructions[second], args)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as disk_dir:
+        cache = vla.enable_feature_cache(max_memory_mb=1024, disk_dir=disk_dir)
+        for name in ["cold", "warm"]:
+            actions = predict(vla, batch_images[first], instructions[first], args)
+            results[name] = float(np.abs(actions - reference).max())
+        results["memory"] = cache.metrics()
+
+        cache = vla.enable_feature_cache(max_memory_mb=1024, disk_dir=disk_dir)
+        actions = predict(vla, batch_images[first], instructions[first], args)
+        results["disk"] = float(np.abs(actions - reference).max())
+        actions = predict(vla, batch_images[second], instructions[second], args)
+        results["partial"] = float(np.abs(actions - reference_second).max())
+        results["disk_and_partial"] = cache.metrics()
+    vla.feature_cache = None
+
+    print(json.dumps(results, indent=2))
+    for name in ["cold", "warm", "disk", "partial"]:
+        assert results[name] <= args.atol, f"{name}: cached actions differ from uncached by {results[name]}"
+    print("feature cache parity ok")
+
+
+if __name__ == "__main__":
+    main(build_argparser().parse_args())
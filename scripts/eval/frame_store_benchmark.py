@@ -0,0 +1,137 @@
+"""
+Sample throughput reading video frames from the pre-resized frame store (`frame_store.py`) vs. decoding the mp4s.
+
+The dataset is copied to a temporary directory (meta/ copied, data/ and videos/ symlinked), keeping only the
+episodes whose every video exists, and its frame store is built there. It reports
+  - build_s / store_mb / mp4_mb: building the store and its size on disk next to the mp4 files
+  - samples_per_s: video part of LeRobotMixtureDataset.__getitem__ (get_step_data, transforms, PIL resize to
+    224x224) for random steps, over a torch DataLoader, with use_frame_store=False and True
+  - parity_max_abs_diff: max pixel difference of the resulting 224x224 images between the two, for the same steps
+
+Example:
+    python scripts/eval/frame_store_benchmark.py --num_workers 1 4
+"""
+
+import argparse
+import json
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+from torch.utils.data import DataLoader, Dataset
+
+from InternVLA.dataloader.gr00t_lerobot.frame_store import _video_episodes, build_frame_store
+from InternVLA.dataloader.lerobot_datasets import make_LeRobotSingleDataset
+
+DEMO_DATASET = "playground/demo_data/sim_pick_place"
+
+
+def copy_complete_episodes(dataset_path: Path, target: Path):
+    """Scratch copy of a dataset restricted to the episodes whose every video exists."""
+    videos = _video_episodes(dataset_path)
+    with open(dataset_path / "meta" / "episodes.jsonl", "r") as f:
+        episodes = [json.loads(line) for line in f]
+    complete = [
+        episode
+        for episode in episodes
+        if all(episode["episode_index"] in {episode_id for episode_id, _ in paths} for paths in videos.values())
+    ]
+    assert complete, f"No episode of {dataset_path} has all its videos"
+    target.mkdir(parents=True)
+    shutil.copytree(dataset_path / "meta", target / "meta", ignore=shutil.ignore_patterns("steps_*", "keyframe_index"))
+    with open(target / "meta" / "episodes.jsonl", "w") as f:
+        f.writelines(json.dumps(episode) + "\n" for episode in complete)
+    for name in ["data", "videos"]:
+        (target / name).symlink_to((dataset_path / name).resolve())
+    return [episode["episode_index"] for episode in complete]
+
+
+class VideoSamples(Dataset):
+    def __init__(self, dataset, steps):
+        self.dataset, self.steps = dataset, steps
+
+    def __len__(self):
+        return len(self.steps)
+
+    def __getitem__(self, index):
+        trajectory_id, base_index = self.steps[index]
+        data = self.dataset.transforms(self.dataset.get_step_data(trajectory_id, base_index))
+        return [
+            np.asarray(Image.fromarray(data[video_key][0]).resize((224, 224)))
+            for video_key in self.dataset.modality_keys["video"]
+        ]
+
+
+def build_argparser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dataset_path", type=str, default=DEMO_DATASET)
+    parser.add_argument("--robot_type", type=str, default="demo_sim_franka_delta_joints")
+    parser.add_argument("--num_workers", nargs="*", type=int, default=[1, 4])
+    parser.add_argument("--num_samples", type=int, default=400)
+    parser.add_argument("--num_parity_samples", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=str, default=None, help="optional json file for the results")
+    return parser
+
+
+def main(args):
+    dataset_path = Path(args.dataset_path)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        copy_path = Path(tmp_dir) / dataset_path.name
+        episodes = copy_complete_episodes(dataset_path, copy_path)
+
+        start = time.perf_counter()
+        summary = build_frame_store(copy_path)
+        build_s = time.perf_counter() - start
+        mp4_mb = sum(path.stat().st_size for paths in _video_episodes(copy_path).values() for _, path in paths) / 2**20
+        result = {"episodes": episodes, "build_s": build_s, "store_mb": summary["mb"], "mp4_mb": mp4_mb, **summary}
+        print(json.dumps(result))
+        results.append(result)
+
+        datasets = {
+            use_frame_store: make_LeRobotSingleDataset(
+                Path(tmp_dir), copy_path.name, args.robot_type, use_frame_store=use_frame_store
+            )
+            for use_frame_store in [False, True]
+        }
+        rng = np.random.default_rng(args.seed)
+        all_steps = datasets[False].all_steps
+        steps = [all_steps[i] for i in rng.integers(len(all_steps), size=args.num_samples)]
+
+        max_abs_diff = 0
+        for trajectory_id, base_index in steps[: args.num_parity_samples]:
+            decoded, stored = (
+                VideoSamples(datasets[use_frame_store], [(trajectory_id, base_index)])[0]
+                for use_frame_store in [False, True]
+            )
+            for decoded_image, stored_image in zip(decoded, stored):
+                max_abs_diff = max(max_abs_diff, int(np.abs(decoded_image.astype(np.int32) - stored_image).max()))
+
+        for num_workers in args.num_workers:
+            for use_frame_store, dataset in datasets.items():
+                loader = DataLoader(VideoSamples(dataset, steps), batch_size=1, num_workers=num_workers, collate_fn=len)
+                start = time.perf_counter()
+                num_samples = sum(loader)
+                elapsed = time.perf_counter() - start
+                result = {
+                    "use_frame_store": use_frame_store,
+                    # cameras actually read from the store (transforms that crop first decode the mp4)
+                    "frame_store_keys": sorted(dataset._frame_store_keys),
+                    "num_workers": num_workers,
+                    "samples_per_s": num_samples / elapsed,
+                    "parity_max_abs_diff": max_abs_diff,
+                }
+                print(json.dumps(result))
+                results.append(result)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main(build_argparser().parse_args())
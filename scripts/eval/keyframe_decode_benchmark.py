@@ -0,0 +1,171 @@
+"""
+Random-access decoding of the torchvision_av backend: keyframe-aware GOP decoding (`decode_frames_at_indices`)
+vs. the previous loop (seek to the keyframe before the first timestamp, then decode forward and keep frames
+until the last timestamp is reached or len(timestamps) frames were read), reimplemented on PyAV since newer
+torchvision no longer ships torchvision.io.VideoReader.
+
+Correctness: for every video, all frames are decoded sequentially once, then --num_checks random requests are
+decoded through `get_frames_by_timestamps` and compared with the full decoding (must be identical).
+
+Throughput: for every request pattern (a window of consecutive frames, like delta indices, or frames at random
+timestamps) it reports requests_per_s of the previous loop, of exact forward decoding from the keyframe before the
+first requested frame to the last one ("forward"), and of the keyframe-aware path, and exact_fraction: the fraction
+of the correctness requests for which the method returned exactly the requested frames.
+
+Example:
+    python scripts/eval/keyframe_decode_benchmark.py --num_frames 1 4 16
+"""
+
+import argparse
+import glob
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import av
+import numpy as np
+
+from InternVLA.dataloader.gr00t_lerobot.video import KeyframeIndex, get_frames_by_timestamps
+
+DEMO_VIDEOS = "playground/demo_data/sim_pick_place/videos/chunk-*/*/episode_*.mp4"
+
+
+def decode_all_frames(video_path):
+    with av.open(video_path) as container:
+        return np.stack([frame.to_ndarray(format="rgb24") for frame in container.decode(video=0)])
+
+
+def legacy_frames_by_timestamps(video_path, timestamps):
+    """The previous torchvision_av path: keyframe seek, then forward decoding for len(timestamps) frames."""
+    with av.open(video_path) as container:
+        stream = container.streams.video[0]
+        container.seek(int(timestamps[0] / stream.time_base), stream=stream, backward=True, any_frame=False)
+        loaded_frames = []
+        for frame in container.decode(stream):
+            loaded_frames.append(frame.to_ndarray(format="rgb24"))
+            if frame.time >= timestamps[-1]:
+                break
+            if len(loaded_frames) >= len(timestamps):
+                break
+    return np.stack(loaded_frames)
+
+
+def forward_frames_by_timestamps(video_path, keyframe_index, indices):
+    """Exact frames without a keyframe table: seek before the first frame, decode forward up to the last one."""
+    wanted = set(keyframe_index.pts[indices].tolist())
+    decoded = {}
+    with av.open(video_path) as container:
+        stream = container.streams.video[0]
+        container.seek(int(keyframe_index.pts[indices[0]]), stream=stream, backward=True, any_frame=False)
+        for frame in container.decode(stream):
+            if frame.pts in wanted:
+                decoded[frame.pts] = frame.to_ndarray(format="rgb24")
+            if frame.pts >= keyframe_index.pts[indices[-1]]:
+                break
+    return np.stack([decoded[pts] for pts in keyframe_index.pts[indices].tolist()])
+
+
+def make_requests(rng, keyframe_index, num_requests, num_frames, pattern):
+    frame_ts = keyframe_index.frame_timestamps
+    requests = []
+    for _ in range(num_requests):
+        if pattern == "window":
+            start = rng.integers(len(frame_ts) - num_frames + 1)
+            indices = np.arange(start, start + num_frames)
+        else:
+            indices = np.sort(rng.integers(len(frame_ts), size=num_frames))
+        requests.append((indices, frame_ts[indices].astype(np.float32)))
+    return requests
+
+
+def build_argparser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--video_paths", nargs="*", type=str, default=None, help=f"defaults to {DEMO_VIDEOS}")
+    parser.add_argument("--num_frames", nargs="*", type=int, default=[1, 4, 16], help="frames per request")
+    parser.add_argument("--patterns", nargs="*", type=str, default=["window", "random"])
+    parser.add_argument("--num_requests", type=int, default=100)
+    parser.add_argument("--num_checks", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=str, default=None, help="optional json file for the results")
+    return parser
+
+
+def main(args):
+    video_paths = args.video_paths or sorted(glob.glob(DEMO_VIDEOS))
+    assert video_paths, "no videos found"
+    rng = np.random.default_rng(args.seed)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache_paths = {path: Path(tmp_dir) / f"{i}.npz" for i, path in enumerate(video_paths)}
+
+        start = time.perf_counter()
+        keyframe_indices = {path: KeyframeIndex.from_video(path) for path in video_paths}
+        build_ms = 1e3 * (time.perf_counter() - start) / len(video_paths)
+        for path, keyframe_index in keyframe_indices.items():
+            keyframe_index.save(cache_paths[path], path)
+        gop_lengths = [len(index) / max(index.is_keyframe.sum(), 1) for index in keyframe_indices.values()]
+        result = {"videos": len(video_paths), "index_build_ms_per_video": build_ms}
+        print(json.dumps({**result, "mean_gop_length": float(np.mean(gop_lengths))}))
+
+        # exact frames vs. full sequential decoding, for the new path (must match) and the previous one
+        legacy_exact = {}
+        for path in video_paths:
+            all_frames = decode_all_frames(path)
+            assert len(all_frames) == len(keyframe_indices[path]), (
+                f"{len(all_frames)=} != {len(keyframe_indices[path])=}"
+            )
+            for num_frames in args.num_frames:
+                for pattern in args.patterns:
+                    requests = make_requests(rng, keyframe_indices[path], args.num_checks, num_frames, pattern)
+                    for indices, timestamps in requests:
+                        frames = get_frames_by_timestamps(
+                            path, timestamps, "torchvision_av", keyframe_index_path=cache_paths[path]
+                        )
+                        assert np.array_equal(frames, all_frames[indices]), (
+                            f"{path}: frames {indices} differ from full decoding"
+                        )
+                        legacy = legacy_frames_by_timestamps(path, timestamps)
+                        exact = legacy.shape == frames.shape and np.array_equal(legacy, frames)
+                        legacy_exact.setdefault((pattern, num_frames), []).append(exact)
+        requests_per_video = args.num_checks * len(args.num_frames) * len(args.patterns)
+        print(json.dumps({"correctness": "identical to full decoding", "requests_per_video": requests_per_video}))
+
+        for num_frames in args.num_frames:
+            for pattern in args.patterns:
+                requests = []
+                for path in video_paths:
+                    path_requests = make_requests(rng, keyframe_indices[path], args.num_requests, num_frames, pattern)
+                    requests += [(path, *request) for request in path_requests]
+                requests = [requests[i] for i in rng.permutation(len(requests))]
+                for method in ["legacy", "forward", "keyframe_index"]:
+                    start = time.perf_counter()
+                    for path, indices, timestamps in requests:
+                        if method == "legacy":
+                            legacy_frames_by_timestamps(path, timestamps)
+                        elif method == "forward":
+                            forward_frames_by_timestamps(path, keyframe_indices[path], indices)
+                        else:
+                            get_frames_by_timestamps(
+                                path, timestamps, "torchvision_av", keyframe_index_path=cache_paths[path]
+                            )
+                    elapsed = time.perf_counter() - start
+                    result = {
+                        "method": method,
+                        "pattern": pattern,
+                        "num_frames": num_frames,
+                        "requests_per_s": len(requests) / elapsed,
+                        "exact_fraction": (
+                            float(np.mean(legacy_exact[(pattern, num_frames)])) if method == "legacy" else 1.0
+                        ),
+                    }
+                    print(json.dumps(result))
+                    results.append(result)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main(build_argparser().parse_args())
@@ -0,0 +1,159 @@
+"""
+Index generation of LeRobotMixtureDataset on a synthetic mixture: per-index SHA-256 seeding + `rng.choice`
+(previous `sample_step`) vs. MixtureSampler (alias table, one vectorized draw per block of indices).
+
+It reports
+  - per_index_us: mean cost of looking up consecutive indices one by one, as dataloader workers do
+  - epoch_s: generating the (dataset, step) pairs of a whole epoch (--epoch_size samples)
+  - max_weight_error: max |empirical dataset frequency - sampling weight| over the epoch
+and checks that the alias table reproduces the weights, that samples only depend on (seed, epoch, index) (same
+after a fresh sampler, different across epochs), and that steps are uniform within a dataset.
+
+For every --run_lengths value (1: MixtureSampler, > 1: TrajectoryBlockSampler over synthetic trajectories) it then
+replays the samples of --num_batches batches in the order each of --num_workers dataloader workers reads them and
+reports
+  - loads_per_sample: trajectory loads (parquet reads / video opens) per sample with a per-worker LRU of
+    --cache_trajectories trajectories (trajectory cache / video reader pool)
+  - distinct_<n>_batches: distinct trajectories over the samples of n consecutive batches, as a fraction of the
+    samples (1 batch, one batch per worker, run_length batches per worker)
+  - max_weight_error / step_bin_ratio: the mixture weights and uniform steps are preserved
+
+Example:
+    python scripts/eval/mixture_sampler_benchmark.py --num_datasets 30 --epoch_size 10000000 --run_lengths 1 4 16
+"""
+
+import argparse
+import json
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from InternVLA.dataloader.gr00t_lerobot.datasets import safe_hash
+from InternVLA.dataloader.gr00t_lerobot.mixture_sampler import MixtureSampler, TrajectoryBlockSampler
+
+
+def legacy_sample(weights, lengths, seed, epoch, index):
+    rng = np.random.default_rng(safe_hash((epoch, index, seed)))
+    dataset_index = rng.choice(len(weights), p=weights)
+    return dataset_index, rng.choice(lengths[dataset_index])
+
+
+def build_argparser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num_datasets", type=int, default=30)
+    parser.add_argument("--epoch_size", type=int, default=10_000_000)
+    parser.add_argument("--num_lookups", type=int, default=20_000, help="indices looked up one by one")
+    parser.add_argument("--run_lengths", nargs="*", type=int, default=[1, 4, 16])
+    parser.add_argument("--batch_size", type=int, default=16)
+    parser.add_argument("--num_workers", type=int, default=8)
+    parser.add_argument("--num_batches", type=int, default=20_000)
+    parser.add_argument("--cache_trajectories", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=str, default=None, help="optional json file for the results")
+    return parser
+
+
+def main(args):
+    rng = np.random.default_rng(args.seed)
+    lengths = rng.integers(10_000, 1_000_000, size=args.num_datasets)
+    weights = rng.uniform(0.1, 1.0, size=args.num_datasets) * lengths
+    weights /= weights.sum()
+    sampler = MixtureSampler(weights, lengths, args.seed)
+
+    # checks
+    assert np.allclose(sampler.alias_table.probabilities(), weights), "alias table does not reproduce the weights"
+    fresh = MixtureSampler(weights, lengths, args.seed)
+    for epoch in [0, 3]:
+        for start, stop in [(0, 1000), (123_456, 200_000)]:
+            a, b = sampler.sample(epoch, start, stop), fresh.sample(epoch, start, stop)
+            assert all(np.array_equal(x, y) for x, y in zip(a, b)), "samples depend on more than (seed, epoch, index)"
+            assert [sampler(epoch, i) for i in range(start, start + 10)] == list(zip(*[x[:10].tolist() for x in a]))
+    assert not np.array_equal(sampler.sample(0, 0, 1000)[0], sampler.sample(1, 0, 1000)[0]), "epochs are identical"
+
+    results = []
+    for name in ["legacy", "mixture_sampler"]:
+        start = time.perf_counter()
+        for index in range(args.num_lookups):
+            if name == "legacy":
+                legacy_sample(weights, lengths, args.seed, 0, index)
+            else:
+                sampler(1, index)
+        per_index_us = 1e6 * (time.perf_counter() - start) / args.num_lookups
+
+        result = {"sampler": name, "per_index_us": per_index_us}
+        if name == "legacy":
+            result["epoch_s"] = per_index_us * args.epoch_size / 1e6
+            result["epoch_s_extrapolated"] = True
+        else:
+            start = time.perf_counter()
+            dataset_indices, step_indices = sampler.sample(2, 0, args.epoch_size)
+            result["epoch_s"] = time.perf_counter() - start
+            frequencies = np.bincount(dataset_indices, minlength=args.num_datasets) / args.epoch_size
+            result["max_weight_error"] = float(np.abs(frequencies - weights).max())
+            # steps of the smallest dataset, in 10 equal bins
+            smallest = np.argmin(lengths)
+            steps = step_indices[dataset_indices == smallest]
+            assert steps.max() < lengths[smallest]
+            bins = np.bincount(steps * 10 // lengths[smallest], minlength=10)
+            result["step_bin_ratio"] = float(bins.min() / bins.max())
+        print(json.dumps(result))
+        results.append(result)
+
+    # trajectory-block sampling over synthetic trajectories of 200-600 steps
+    trajectory_offsets = [
+        np.concatenate([[0], np.cumsum(rng.integers(200, 600, size=length // 200))]) for length in lengths
+    ]
+    lengths = np.array([offsets[-1] for offsets in trajectory_offsets])
+    trajectory_ids = [np.repeat(np.arange(len(offsets) - 1), np.diff(offsets)) for offsets in trajectory_offsets]
+    num_samples = args.num_batches * args.batch_size
+    for run_length in args.run_lengths:
+        if run_length == 1:
+            sampler = MixtureSampler(weights, lengths, args.seed)
+        else:
+            sampler = TrajectoryBlockSampler(
+                weights, lengths, trajectory_offsets, args.seed, run_length, args.batch_size, args.num_workers
+            )
+        dataset_indices, step_indices = sampler.sample(0, 0, num_samples)
+        trajectories = dataset_indices * 1_000_000 + np.concatenate(
+            [trajectory_ids[d][s : s + 1] for d, s in zip(dataset_indices.tolist(), step_indices.tolist())]
+        )
+
+        # replay: batch g is built by worker g mod num_workers, reading its samples in order
+        loads = 0
+        for worker in range(args.num_workers):
+            batches = trajectories.reshape(args.num_batches, args.batch_size)[worker :: args.num_workers]
+            cache = OrderedDict()
+            for trajectory in batches.ravel().tolist():
+                if trajectory in cache:
+                    cache.move_to_end(trajectory)
+                    continue
+                loads += 1
+                cache[trajectory] = True
+                if len(cache) > args.cache_trajectories:
+                    cache.popitem(last=False)
+
+        frequencies = np.bincount(dataset_indices, minlength=args.num_datasets) / num_samples
+        largest = np.argmax(frequencies)
+        bins = np.bincount(step_indices[dataset_indices == largest] * 10 // lengths[largest], minlength=10)
+        result = {
+            "run_length": run_length,
+            "loads_per_sample": loads / num_samples,
+            "max_weight_error": float(np.abs(frequencies - weights).max()),
+            "step_bin_ratio": float(bins.min() / bins.max()),
+        }
+        for window in sorted({1, args.num_workers, args.num_workers * max(args.run_lengths)}):
+            windows = trajectories[: num_samples // (window * args.batch_size) * window * args.batch_size]
+            windows = windows.reshape(-1, window * args.batch_size)
+            distinct = np.mean([len(np.unique(w)) for w in windows])
+            result[f"distinct_{window}_batches"] = float(distinct / windows.shape[1])
+        print(json.dumps(result))
+        results.append(result)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main(build_argparser().parse_args())
@@ -0,0 +1,141 @@
+"""
+Startup cost of the merged mixture statistics (`LeRobotMixtureDataset.update_metadata`): merging the metadata of
+every dataset at each launch vs. loading it from the cache keyed by its inputs (`cached_statistics_path`).
+
+The largest named mixture of `mixtures.py` (or --data_mix) is rebuilt from the demo dataset: one scratch copy per
+mixture entry (meta/ copied, data/ and videos/ symlinked), with the statistics of each copy scaled differently so
+that the merge has distinct inputs. It reports, over --repeats calls,
+  - merge_ms: update_metadata without cache
+  - miss_ms: first call with an empty cache directory (merge + write)
+  - hit_ms: later calls, loading the cached file
+and checks that the cached metadata equals the merged one and that the key changes (cache miss) when a sampling
+weight, the statistics of one dataset or the percentile mixing method change.
+
+Example:
+    python scripts/eval/mixture_statistics_cache_benchmark.py --repeats 50
+"""
+
+import argparse
+import json
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from InternVLA.dataloader.gr00t_lerobot.datasets import LE_ROBOT_STATS_FILENAME, LeRobotMixtureDataset
+from InternVLA.dataloader.gr00t_lerobot.mixtures import DATASET_NAMED_MIXTURES
+from InternVLA.dataloader.lerobot_datasets import make_LeRobotSingleDataset
+
+DEMO_DATASET = "playground/demo_data/sim_pick_place"
+
+
+def copy_scaled_dataset(dataset_path: Path, target: Path, scale: float):
+    """Scratch copy of a dataset with its statistics multiplied by `scale`."""
+    target.mkdir(parents=True)
+    shutil.copytree(dataset_path / "meta", target / "meta", ignore=shutil.ignore_patterns("steps_*", "keyframe_index"))
+    for name in ["data", "videos"]:
+        (target / name).symlink_to((dataset_path / name).resolve())
+    with open(target / LE_ROBOT_STATS_FILENAME, "r") as f:
+        statistics = json.load(f)
+    for column in statistics.values():
+        for key, values in column.items():
+            column[key] = (np.asarray(values) * scale).tolist()
+    with open(target / LE_ROBOT_STATS_FILENAME, "w") as f:
+        json.dump(statistics, f)
+
+
+def time_ms(fn, repeats: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return 1e3 * (time.perf_counter() - start) / repeats
+
+
+def dump(merged_metadata: dict) -> dict:
+    return {tag: metadata.model_dump(mode="json") for tag, metadata in merged_metadata.items()}
+
+
+def cache_files(cache_dir: Path) -> set:
+    return set(cache_dir.glob("merged_metadata_*.json"))
+
+
+def build_argparser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data_mix", type=str, default=None, help="default: the named mixture with the most datasets")
+    parser.add_argument("--robot_type", type=str, default="demo_sim_franka_delta_joints")
+    parser.add_argument("--percentile_mixing_method", type=str, default="min_max")
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--output", type=str, default=None, help="optional json file for the results")
+    return parser
+
+
+def main(args):
+    data_mix = args.data_mix or max(DATASET_NAMED_MIXTURES, key=lambda name: len(DATASET_NAMED_MIXTURES[name]))
+    mixture_spec = DATASET_NAMED_MIXTURES[data_mix]
+    metadata_config = {"percentile_mixing_method": args.percentile_mixing_method}
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_root = Path(tmp_dir) / "data"
+        data_mixture = []
+        for index, (name, weight, _) in enumerate(mixture_spec):
+            copy_name = f"{index:02d}_{name}"
+            copy_scaled_dataset(Path(DEMO_DATASET), data_root / copy_name, 1.0 + 0.1 * index)
+            data_mixture.append((make_LeRobotSingleDataset(data_root, copy_name, args.robot_type), weight))
+        mixture = LeRobotMixtureDataset(data_mixture, mode="train", metadata_config=metadata_config)
+        merged = dump(mixture.merged_metadata)
+
+        cache_dir = Path(tmp_dir) / "mixture_statistics_cache"
+        merge_ms = time_ms(lambda: mixture.update_metadata(metadata_config), args.repeats)
+        miss_ms = time_ms(lambda: mixture.update_metadata(metadata_config, cache_dir), 1)
+        assert len(cache_files(cache_dir)) == 1
+        hit_ms = time_ms(lambda: mixture.update_metadata(metadata_config, cache_dir), args.repeats)
+        assert dump(mixture.merged_metadata) == merged, "cached merged metadata differs from the merged one"
+        assert len(cache_files(cache_dir)) == 1, "cache hit wrote a new file"
+
+        # invalidation: every input change is a miss (a new file), and gives the freshly merged metadata
+        original_weights = mixture._dataset_sampling_weights.copy()
+        changed_weights = original_weights * np.linspace(1.0, 2.0, len(original_weights))
+        changed_weights /= changed_weights.sum()
+        other_method = "weighted_average" if args.percentile_mixing_method == "min_max" else "min_max"
+        changes = [("percentile_mixing_method", original_weights, {"percentile_mixing_method": other_method})]
+        if len(original_weights) > 1:
+            changes.insert(0, ("weights", changed_weights, metadata_config))
+        for name, weights, config in changes:
+            mixture._dataset_sampling_weights = weights
+            before = cache_files(cache_dir)
+            mixture.update_metadata(config, cache_dir)
+            cached = dump(mixture.merged_metadata)
+            mixture.update_metadata(config)
+            assert len(cache_files(cache_dir) - before) == 1, f"changing {name} did not invalidate the cache"
+            assert cached == dump(mixture.merged_metadata)
+        dataset = mixture.datasets[0]
+        dataset._metadata = dataset.metadata.model_copy(deep=True)
+        dataset._metadata.statistics.state[next(iter(dataset._metadata.statistics.state))].max *= 2
+        before = cache_files(cache_dir)
+        mixture.update_metadata(metadata_config, cache_dir)
+        assert len(cache_files(cache_dir) - before) == 1, (
+            "changing the statistics of a dataset did not invalidate the cache"
+        )
+
+        result = {
+            "data_mix": data_mix,
+            "num_datasets": len(mixture_spec),
+            "merge_ms": merge_ms,
+            "miss_ms": miss_ms,
+            "hit_ms": hit_ms,
+            "saved_ms": merge_ms - hit_ms,
+            "identical": True,
+            "invalidated_by": [name for name, _, _ in changes] + ["dataset_statistics"],
+        }
+        print(json.dumps(result))
+        results.append(result)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main(build_argparser().parse_args())
@@ -0,0 +1,175 @@
+"""
+Numeric parity and per-call cost of the precompiled state / action kernels in `transform/state_action.py`.
+
+  - Normalizer: the fused offset / scale kernels (`fused=True`) against the default masked implementation, for
+    every mode, with degenerate dimensions (q01 == q99, std == 0, min == max), for
+    [D], [T, D] and [B, T, D] inputs in float32 and float64
+  - RotationTransform: the NumPy conversions (`use_numpy=True`) against the pytorch3d ones, for every pair of
+    representations (euler angles in every convention), forward and inverse
+
+Both are opt-in through `StateActionTransform(fused_kernels=True)`; run this with the torch / pytorch3d of the
+training environment before enabling it (e.g. the sign convention of matrix_to_quaternion changed across pytorch3d
+versions). Parity failures raise; the max error per normalizer mode / rotation pair and the timings (us per call,
+old vs new) are printed as json lines.
+
+Example:
+    python scripts/eval/normalizer_kernel_benchmark.py --repeats 2000
+"""
+
+import argparse
+import itertools
+import json
+import time
+
+import numpy as np
+import pytorch3d
+import pytorch3d.transforms as pt
+import torch
+
+from InternVLA.dataloader.gr00t_lerobot.schema import RotationType
+from InternVLA.dataloader.gr00t_lerobot.transform.state_action import Normalizer, RotationTransform
+
+MODES = ["q99", "mean_std", "min_max", "scale", "binary"]
+SHAPES = {"sample": (), "chunk": (16,), "batch": (32, 16)}
+
+
+def make_statistics(rng: np.random.Generator, dim: int) -> dict:
+    """Statistics of a [dim] state with its first dimensions degenerate and a narrow range far from zero."""
+    low = rng.uniform(-5, 0, dim)
+    high = low + rng.uniform(0.1, 5, dim)
+    mean, std = (low + high) / 2, rng.uniform(0.1, 2, dim)
+    low[0], high[0], std[0] = 1.0, 1.0, 0.0  # q01 == q99, min == max, std == 0
+    low[1], high[1] = 0.0, 0.0  # max(|min|, |max|) == 0
+    low[2], high[2] = 2.0, 2.0001  # narrow range far from zero
+    return {
+        "min": low.tolist(),
+        "max": high.tolist(),
+        "q01": low.tolist(),
+        "q99": high.tolist(),
+        "mean": mean.tolist(),
+        "std": std.tolist(),
+    }
+
+
+def pytorch3d_apply(funcs: list, x: torch.Tensor) -> torch.Tensor:
+    """The pytorch3d conversions of a RotationTransform, as applied before the NumPy ones."""
+    for func in funcs:
+        x = func(x)
+    return x
+
+
+def rotation_reps() -> list[str]:
+    return [rotation_type.value for rotation_type in RotationType]
+
+
+def random_rotation(rep: str, leading: tuple, dtype: torch.dtype) -> torch.Tensor:
+    matrix = pt.random_rotations(int(np.prod(leading)), dtype=torch.float64).reshape(leading + (3, 3))
+    if rep == "matrix":
+        return matrix.to(dtype)
+    return pytorch3d_apply(RotationTransform(from_rep="matrix", to_rep=rep).forward_funcs, matrix).to(dtype)
+
+
+def as_matrix(rep: str, x: torch.Tensor) -> torch.Tensor:
+    if rep == "matrix":
+        return x
+    return pytorch3d_apply(RotationTransform(from_rep=rep, to_rep="matrix").forward_funcs, x.to(torch.float64))
+
+
+def assert_rotation_close(rep: str, output: torch.Tensor, expected: torch.Tensor, atol: float, name: str) -> float:
+    assert output.dtype == expected.dtype, f"{name}: {output.dtype} != {expected.dtype}"
+    assert output.shape == expected.shape, f"{name}: {output.shape} != {expected.shape}"
+    if rep == "quaternion":
+        # q and -q are the same rotation
+        output = torch.where((output * expected).sum(-1, keepdim=True) < 0, -output, output)
+    if rep.startswith("euler_angles") or rep == "axis_angle":
+        # several angles describe the same rotation (wrap-around at +-pi, gimbal lock): compare the rotations
+        output, expected = as_matrix(rep, output), as_matrix(rep, expected)
+    error = (output.double() - expected.double()).abs().max().item()
+    assert error <= atol, f"{name}: max error {error}"
+    return error
+
+
+def us_per_call(fn, x: torch.Tensor, repeats: int) -> float:
+    fn(x)  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn(x)
+    return 1e6 * (time.perf_counter() - start) / repeats
+
+
+def check_normalizers(args, rng: np.random.Generator):
+    max_errors = {}
+    for mode, (shape_name, leading), dtype in itertools.product(MODES, SHAPES.items(), [torch.float32, torch.float64]):
+        statistics = make_statistics(rng, args.dim)
+        reference = Normalizer(mode=mode, statistics=dict(statistics))
+        normalizer = Normalizer(mode=mode, statistics=dict(statistics), fused=True)
+        x = torch.from_numpy(rng.uniform(-8, 8, leading + (args.dim,))).to(dtype)
+        x[..., 0] = 1.0  # exactly on the degenerate statistic
+        x[..., 2] = torch.from_numpy(rng.uniform(1.99995, 2.00015, leading))  # around the narrow range
+        expected = reference.forward(x.clone())
+        output = normalizer.forward(x.clone())
+        atol = 1e-5 if dtype == torch.float32 else 1e-12
+        assert output.dtype == expected.dtype and output.shape == expected.shape, mode
+        error = (output - expected).abs().max().item()
+        assert error <= atol * max(1.0, expected.abs().max().item()), f"{mode} {shape_name} {dtype}: max error {error}"
+        max_errors[mode] = max(max_errors.get(mode, 0.0), error)
+        # inf on the degenerate dimensions: set to 0 (min_max, scale), clamped (q99) or kept (mean_std), never NaN
+        timed, x = x, x.clone()
+        x[..., :2] = float("inf")
+        expected = reference.forward(x.clone())
+        output = normalizer.forward(x.clone())
+        sentinels = dict(nan=-12345.0, posinf=12345.0, neginf=-54321.0)
+        error = (torch.nan_to_num(output, **sentinels) - torch.nan_to_num(expected, **sentinels)).abs().max().item()
+        assert error <= atol * max(1.0, expected[..., 2:].abs().max().item()), f"{mode} {shape_name} {dtype}: inf input"
+        if dtype == torch.float32:
+            old_us = us_per_call(reference.forward, timed, args.repeats)
+            new_us = us_per_call(normalizer.forward, timed, args.repeats)
+            result = {"normalizer": mode, "shape": shape_name, "old_us": old_us, "new_us": new_us}
+            print(json.dumps({**result, "speedup": old_us / new_us}))
+    print(json.dumps({"normalizer_parity": True, "max_error": max_errors}))
+
+
+def check_rotations(args):
+    max_errors = {}
+    for from_rep, to_rep in itertools.permutations(rotation_reps(), 2):
+        if from_rep.startswith("euler_angles") and to_rep.startswith("euler_angles"):
+            continue  # RotationTransform maps between kinds of representation
+        transform = RotationTransform(from_rep=from_rep, to_rep=to_rep, use_numpy=True)
+        for (shape_name, leading), dtype in itertools.product(SHAPES.items(), [torch.float32, torch.float64]):
+            atol = 1e-4 if dtype == torch.float32 else 1e-9
+            x = random_rotation(from_rep, leading, dtype)
+            name = f"{from_rep}->{to_rep} {shape_name} {dtype}"
+            output = transform.forward(x)
+            expected = pytorch3d_apply(transform.forward_funcs, x)
+            forward_error = assert_rotation_close(to_rep, output, expected, atol, name)
+            expected = pytorch3d_apply(transform.inverse_funcs, output)
+            inverse_error = assert_rotation_close(from_rep, transform.inverse(output), expected, atol, f"{name} inverse")
+            pair = f"{from_rep}->{to_rep}"
+            max_errors[pair] = max(max_errors.get(pair, 0.0), forward_error, inverse_error)
+            if dtype == torch.float32 and shape_name != "batch":
+                old_us = us_per_call(lambda x: pytorch3d_apply(transform.forward_funcs, x), x, args.repeats)
+                new_us = us_per_call(transform.forward, x, args.repeats)
+                result = {"rotation": pair, "shape": shape_name, "old_us": old_us, "new_us": new_us}
+                print(json.dumps({**result, "speedup": old_us / new_us}))
+    print(json.dumps({"rotation_parity": True, "max_error": max_errors}))
+
+
+def build_argparser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dim", type=int, default=7, help="dimension of the normalized states")
+    parser.add_argument("--repeats", type=int, default=2000, help="calls per timing")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser
+
+
+def main(args):
+    assert args.dim >= 3, "--dim must leave room for the degenerate and narrow-range dimensions"
+    torch.manual_seed(args.seed)
+    rng = np.random.default_rng(args.seed)
+    print(json.dumps({"torch": torch.__version__, "pytorch3d": pytorch3d.__version__}))
+    check_normalizers(args, rng)
+    check_rotations(args)
+
+
+if __name__ == "__main__":
+    main(build_argparser().parse_args())
@@ -0,0 +1,81 @@
+"""
+Parity and latency of the LayerwiseQFormer cross-attention: fused SDPA (`FusedCrossAttention`) vs
+nn.MultiheadAttention, on random hidden states with the same state dict loaded into both.
+
+Reports the max abs difference of the two outputs and the forward time of each implementation.
+
+Example:
+    python scripts/eval/qformer_attention_benchmark.py --num_layers 4 --batch_size 8 --seq_len 600
+"""
+
+import argparse
+import json
+import time
+
+import torch
+
+from InternVLA.model.modules.projector.QFormer import LayerwiseQFormer
+
+
+def build_argparser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--device", type=str, default="cuda" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--num_layers", type=int, default=4)
+    parser.add_argument("--batch_size", type=int, default=8)
+    parser.add_argument("--seq_len", type=int, default=600, help="~ Qwen tokens + 2 views x 256 DINO tokens")
+    parser.add_argument("--input_hidden_dim", type=int, default=2048)
+    parser.add_argument("--output_hidden_dim", type=int, default=768)
+    parser.add_argument("--num_query_tokens", type=int, default=64)
+    parser.add_argument("--num_heads", type=int, default=8)
+    parser.add_argument("--num_iters", type=int, default=20, help="timed forwards")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser
+
+
+def main(args):
+    torch.manual_seed(args.seed)
+    models = {
+        fused_attention: LayerwiseQFormer(
+            args.input_hidden_dim,
+            args.output_hidden_dim,
+            args.num_query_tokens,
+            args.num_layers,
+            args.num_heads,
+            fused_attention=fused_attention,
+        )
+        .to(args.device)
+        .eval()
+        for fused_attention in [False, True]
+    }
+    models[True].load_state_dict(models[False].state_dict())  # checkpoints are interchangeable
+    models[False].load_state_dict(models[True].state_dict())
+
+    hidden_states_list = [
+        torch.randn(args.batch_size, args.seq_len, args.input_hidden_dim, device=args.device)
+        for _ in range(args.num_layers)
+    ]
+    with torch.no_grad():
+        max_abs_diff = (models[False](hidden_states_list) - models[True](hidden_states_list)).abs().max().item()
+    print(json.dumps({"max_abs_diff": max_abs_diff}))
+
+    for fused_attention, model in models.items():
+        with torch.no_grad():
+            for _ in range(3):
+                model(hidden_states_list)
+            if args.device == "cuda":
+                torch.cuda.synchronize()
+            start = time.perf_counter()
+            for _ in range(args.num_iters):
+                model(hidden_states_list)
+            if args.device == "cuda":
+                torch.cuda.synchronize()
+        result = {
+            "attention": "fused_sdpa" if fused_attention else "nn.MultiheadAttention",
+            "device": args.device,
+            "ms_per_forward": 1000 * (time.perf_counter() - start) / args.num_iters,
+        }
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main(build_argparser().parse_args())
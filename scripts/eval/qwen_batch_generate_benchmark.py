@@ -0,0 +1,151 @@
+"""
+Generation throughput of the Qwen2.5-VL interface on a tiny random model (no checkpoint needed): per-prompt
+generation vs left-padded `batch_generate` vs `generate_with_shared_prefix` (K prompts sharing one image).
+
+Greedy outputs of the batched and shared-prefix paths are first checked against per-prompt generation (raises on
+mismatch), then tokens/s is reported per batch size as json lines.
+
+Example:
+    python scripts/eval/qwen_batch_generate_benchmark.py --batch_sizes 1 2 4 8 16 --max_new_tokens 32
+"""
+
+import argparse
+import json
+import time
+
+import torch
+from torch import nn
+from transformers import Qwen2_5_VLConfig, Qwen2_5_VLForConditionalGeneration
+
+from InternVLA.model.modules.vlm.QWen2_5 import IMAGE_TOKEN_INDEX, VIDEO_TOKEN_INDEX, _QWen_VL_Interface
+
+VISION_START_TOKEN_INDEX = 151652
+
+
+def tiny_qwen_vl(device: str) -> _QWen_VL_Interface:
+    """The interface around a randomly initialized 4-layer Qwen2.5-VL with the real token ids."""
+    config = Qwen2_5_VLConfig(
+        vocab_size=151680,
+        hidden_size=128,
+        intermediate_size=256,
+        num_hidden_layers=4,
+        num_attention_heads=4,
+        num_key_value_heads=2,
+        image_token_id=IMAGE_TOKEN_INDEX,
+        video_token_id=VIDEO_TOKEN_INDEX,
+        vision_start_token_id=VISION_START_TOKEN_INDEX,
+        rope_scaling={"type": "mrope", "mrope_section": [4, 6, 6]},
+        vision_config=dict(
+            depth=2, hidden_size=64, intermediate_size=128, num_heads=2, out_hidden_size=128, fullatt_block_indexes=[1]
+        ),
+        eos_token_id=151645,
+        pad_token_id=151643,
+    )
+    qwen_vl = _QWen_VL_Interface.__new__(_QWen_VL_Interface)
+    nn.Module.__init__(qwen_vl)
+    qwen_vl.model = Qwen2_5_VLForConditionalGeneration._from_config(config, attn_implementation="sdpa").to(device).eval()
+    qwen_vl.model.generation_config.eos_token_id = config.eos_token_id
+    qwen_vl.model.generation_config.pad_token_id = config.pad_token_id
+    qwen_vl.processor = None
+    return qwen_vl
+
+
+class PromptBatches:
+    """Prompts sharing one image and a text prefix, with questions of different lengths."""
+
+    def __init__(self, device: str, pad_token_id: int):
+        self.device = device
+        self.pad_token_id = pad_token_id
+        self.grid_thw = torch.tensor([[1, 16, 16]], device=device)  # 64 image tokens after 2x2 merge
+        num_image_tokens = int(self.grid_thw.prod()) // 4
+        self.pixel_values = torch.randn(int(self.grid_thw.prod()), 3 * 2 * 14 * 14, device=device)
+        self.prefix = torch.cat(
+            [
+                torch.randint(0, 1000, (8,)),
+                torch.tensor([VISION_START_TOKEN_INDEX] + [IMAGE_TOKEN_INDEX] * num_image_tokens),
+            ]
+        )
+
+    def batch(self, num_prompts: int) -> dict:
+        """Left padded like the processor."""
+        rows = [torch.cat([self.prefix, torch.randint(0, 1000, (4 + 3 * (i % 4),))]) for i in range(num_prompts)]
+        max_len = max(len(r) for r in rows)
+        input_ids = torch.full((num_prompts, max_len), self.pad_token_id)
+        attention_mask = torch.zeros_like(input_ids)
+        for i, r in enumerate(rows):
+            input_ids[i, max_len - len(r) :] = r
+            attention_mask[i, max_len - len(r) :] = 1
+        return dict(
+            input_ids=input_ids.to(self.device),
+            attention_mask=attention_mask.to(self.device),
+            pixel_values=self.pixel_values.repeat(num_prompts, 1),
+            image_grid_thw=self.grid_thw.repeat(num_prompts, 1),
+        )
+
+    def sample(self, inputs: dict, i: int) -> dict:
+        """Prompt i of a batch, unpadded."""
+        mask = inputs["attention_mask"][i].bool()
+        return dict(
+            input_ids=inputs["input_ids"][i][mask][None],
+            attention_mask=inputs["attention_mask"][i][mask][None],
+            pixel_values=self.pixel_values,
+            image_grid_thw=self.grid_thw,
+        )
+
+
+def timed(fn, device: str, repeats: int) -> float:
+    fn()
+    if device == "cuda":
+        torch.cuda.synchronize()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    if device == "cuda":
+        torch.cuda.synchronize()
+    return (time.perf_counter() - start) / repeats
+
+
+def build_argparser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--device", type=str, default="cuda" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--batch_sizes", nargs="*", type=int, default=[1, 2, 4, 8, 16])
+    parser.add_argument("--max_new_tokens", type=int, default=32)
+    parser.add_argument("--repeats", type=int, default=3, help="timed calls per measurement")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser
+
+
+def main(args):
+    torch.manual_seed(args.seed)
+    qwen_vl = tiny_qwen_vl(args.device)
+    prompts = PromptBatches(args.device, qwen_vl.model.generation_config.pad_token_id)
+    gen_kwargs = dict(max_new_tokens=args.max_new_tokens, min_new_tokens=args.max_new_tokens, do_sample=False)
+
+    # parity: batched / shared-prefix greedy decoding == per-prompt greedy decoding
+    inputs = prompts.batch(4)
+    single = [qwen_vl.batch_generate(prompts.sample(inputs, i), **gen_kwargs)[0] for i in range(4)]
+    assert qwen_vl.batch_generate(inputs, **gen_kwargs) == single, "batched generation differs from per-prompt"
+    assert qwen_vl.generate_with_shared_prefix(inputs, **gen_kwargs) == single, "shared prefix differs from per-prompt"
+    print(json.dumps({"parity": True}))
+
+    for batch_size in args.batch_sizes:
+        inputs = prompts.batch(batch_size)
+        num_tokens = batch_size * args.max_new_tokens
+        t_loop = timed(
+            lambda: [qwen_vl.batch_generate(prompts.sample(inputs, i), **gen_kwargs) for i in range(batch_size)],
+            args.device,
+            args.repeats,
+        )
+        t_batch = timed(lambda: qwen_vl.batch_generate(inputs, **gen_kwargs), args.device, args.repeats)
+        t_shared = timed(lambda: qwen_vl.generate_with_shared_prefix(inputs, **gen_kwargs), args.device, args.repeats)
+        result = {
+            "batch_size": batch_size,
+            "per_prompt_tokens_per_s": num_tokens / t_loop,
+            "batched_tokens_per_s": num_tokens / t_batch,
+            "shared_prefix_tokens_per_s": num_tokens / t_shared,
+        }
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main(build_argparser().parse_args())
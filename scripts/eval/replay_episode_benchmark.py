@@ -0,0 +1,212 @@
+"""
+Offline closed-loop replay benchmark for InternVLA-M1 inference modes.
+
+Replays recorded demo episodes step by step (one predict_action call per frame, as the
+policy server does) and reports, per inference mode:
+  - nfe: action-head model evaluations per call
+  - latency_ms: mean wall-clock time of predict_action
+  - smoothness: mean |chunk_t[:-1] - chunk_{t-1}[1:]| over the overlapping part of consecutive chunks
+  - action_mse: MSE of the predicted normalized chunk against the recorded (normalized) actions
+  - vlm_refresh_rate: fraction of calls that ran the Qwen-VL forward (dual-rate modes)
+  - seq_len: Qwen-VL decoder sequence length (visual token budget modes)
+
+Sampling noise is re-seeded identically per call so that modes differ only in what they reuse.
+
+Example:
+    python scripts/eval/replay_episode_benchmark.py \
+        --ckpt_path results/Checkpoints/xxx/checkpoints/steps_20000_pytorch_model.pt \
+        --num_episodes 5 --num_ddim_steps 10 --warm_start_strengths 0.3 0.5 \
+        --vlm_refresh_intervals 2 4 8 --vlm_refresh_frame_diff 0.05 --visual_token_budgets 16 32 64
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+from PIL import Image
+
+from InternVLA.model.framework.M1 import InternVLA_M1
+from InternVLA.dataloader.lerobot_datasets import make_LeRobotSingleDataset
+from InternVLA.dataloader.gr00t_lerobot.mixtures import DATASET_NAMED_MIXTURES
+from deployment.model_server.tools.vlm_refresh import VLMRefreshPolicy
+
+# model_interface imports its siblings as `tools.*`, as when the policy server runs from deployment/model_server
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "deployment" / "model_server"))
+from deployment.model_server.tools.model_interface import QwenpiPolicyInterfence  # noqa: E402
+
+
+def iter_episode(dataset, trajectory_id, max_steps=None):
+    """Yield (images, instruction, normalized action chunk) for consecutive steps of one episode."""
+    trajectory_index = dataset.get_trajectory_index(trajectory_id)
+    num_steps = int(dataset.trajectory_lengths[trajectory_index])
+    if max_steps is not None:
+        num_steps = min(num_steps, max_steps)
+    for base_index in range(num_steps):
+        data = dataset.transforms(dataset.get_step_data(trajectory_id, base_index))
+        images = [Image.fromarray(data[key][0]).resize((224, 224)) for key in dataset.modality_keys["video"]]
+        instruction = data[dataset.modality_keys["language"][0]][0]
+        action = np.concatenate([data[key] for key in dataset.modality_keys["action"]], axis=1)
+        yield images, instruction, action
+
+
+def decoder_sequence_length(vla, images, instruction, visual_token_budget=None):
+    """Qwen-VL decoder sequence length for one sample, with every view merged down to the budget."""
+    inputs = vla.qwen_vl_interface.build_qwenvl_inputs(images=[images], instructions=[instruction])
+    seq_len = inputs["input_ids"].shape[1]
+    num_image_tokens = int((inputs["input_ids"] == vla.qwen_vl_interface.model.config.image_token_id).sum())
+    if visual_token_budget is None:
+        return seq_len
+    per_view = num_image_tokens // len(images)
+    return seq_len - num_image_tokens + len(images) * min(per_view, visual_token_budget)
+
+
+def replay_mode(vla, dataset, trajectory_ids, mode, args):
+    """Replay all episodes under one inference mode and aggregate metrics."""
+    latencies, smoothness, mse, nfes, seq_lens = [], [], [], [], []
+    default_budget = vla.visual_token_budget
+    vla.visual_token_budget = mode.get("visual_token_budget", default_budget)
+    vlm_refresh = VLMRefreshPolicy(mode.get("vlm_refresh_interval", 1), mode.get("vlm_refresh_frame_diff"))
+    for trajectory_id in trajectory_ids:
+        previous_chunk = None
+        vlm_refresh.reset()
+        for step, (images, instruction, gt_action) in enumerate(
+            iter_episode(dataset, trajectory_id, args.max_steps_per_episode)
+        ):
+            kwargs = dict(
+                cfg_scale=args.cfg_scale,
+                use_ddim=True,
+                num_ddim_steps=args.num_ddim_steps,
+            )
+            nfe = args.num_ddim_steps
+            if step == 0:
+                seq_lens.append(decoder_sequence_length(vla, images, instruction, vla.visual_token_budget))
+            if mode["warm_start_strength"] is not None and previous_chunk is not None:
+                kwargs["init_actions"] = QwenpiPolicyInterfence.shift_action_chunk(previous_chunk, 1)
+                kwargs["warm_start_strength"] = mode["warm_start_strength"]
+                nfe = max(int(round(mode["warm_start_strength"] * args.num_ddim_steps)), 1)
+
+            torch.manual_seed(args.seed + step)
+            if torch.cuda.is_available():
+                torch.cuda.synchronize()
+            start = time.perf_counter()
+            if vlm_refresh.enabled:
+                kwargs["vlm_condition_features"] = vlm_refresh.step(images, instruction)
+                kwargs["return_vlm_features"] = kwargs["vlm_condition_features"] is None
+            output = vla.predict_action(batch_images=[images], instructions=[instruction], **kwargs)
+            if "vlm_condition_features" in output:
+                vlm_refresh.update(output["vlm_condition_features"], images, instruction)
+            chunk = output["normalized_actions"]
+            if torch.cuda.is_available():
+                torch.cuda.synchronize()
+            latencies.append(time.perf_counter() - start)
+            nfes.append(nfe)
+
+            horizon = min(chunk.shape[1], gt_action.shape[0])
+            mse.append(float(np.mean((chunk[0, :horizon] - gt_action[:horizon]) ** 2)))
+            if previous_chunk is not None:
+                smoothness.append(float(np.mean(np.abs(chunk[0, :-1] - previous_chunk[0, 1:]))))
+            previous_chunk = chunk
+
+    vla.visual_token_budget = default_budget
+    return {
+        "mode": mode["name"],
+        "nfe": float(np.mean(nfes)),
+        "latency_ms": 1000 * float(np.mean(latencies)),
+        "smoothness": float(np.mean(smoothness)) if smoothness else float("nan"),
+        "action_mse": float(np.mean(mse)),
+        "vlm_refresh_rate": vlm_refresh.refresh_rate if vlm_refresh.enabled else 1.0,
+        "seq_len": float(np.mean(seq_lens)),
+        "num_calls": len(latencies),
+    }
+
+
+def build_argparser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ckpt_path", type=str, required=True)
+    parser.add_argument("--data_root_dir", type=str, default="playground/demo_data")
+    parser.add_argument("--data_mix", type=str, default="demo_sim_pick_place")
+    parser.add_argument("--num_episodes", type=int, default=5)
+    parser.add_argument("--max_steps_per_episode", type=int, default=None)
+    parser.add_argument("--cfg_scale", type=float, default=1.5)
+    parser.add_argument("--num_ddim_steps", type=int, default=10)
+    parser.add_argument(
+        "--cold_ddim_steps", nargs="*", type=int, default=[], help="extra cold-start baselines with fewer steps"
+    )
+    parser.add_argument("--warm_start_strengths", nargs="*", type=float, default=[0.5])
+    parser.add_argument(
+        "--vlm_refresh_intervals", nargs="*", type=int, default=[], help="dual-rate modes: re-run Qwen-VL every N calls"
+    )
+    parser.add_argument(
+        "--vlm_refresh_frame_diff",
+        type=float,
+        default=None,
+        help="dual-rate modes: also refresh above this frame difference",
+    )
+    parser.add_argument(
+        "--visual_token_budgets",
+        nargs="*",
+        type=int,
+        default=[],
+        help="modes merging each view's Qwen image tokens to N",
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=str, default=None, help="optional json file for the results")
+    return parser
+
+
+def main(args):
+    vla = InternVLA_M1.from_pretrained(args.ckpt_path).to("cuda").eval()
+
+    d_name, _, robot_type = DATASET_NAMED_MIXTURES[args.data_mix][0]
+    dataset = make_LeRobotSingleDataset(Path(args.data_root_dir), d_name, robot_type)
+    dataset.set_transforms_metadata(dataset.metadata)
+    dataset.transforms.eval()
+    trajectory_ids = dataset.trajectory_ids[: args.num_episodes]
+
+    modes = [
+        {"name": f"cold_ddim{args.num_ddim_steps}", "warm_start_strength": None, "num_ddim_steps": args.num_ddim_steps}
+    ]
+    modes += [{"name": f"cold_ddim{n}", "warm_start_strength": None, "num_ddim_steps": n} for n in args.cold_ddim_steps]
+    modes += [
+        {"name": f"warm_ddim{args.num_ddim_steps}_s{s}", "warm_start_strength": s, "num_ddim_steps": args.num_ddim_steps}
+        for s in args.warm_start_strengths
+    ]
+    diff_suffix = f"_diff{args.vlm_refresh_frame_diff}" if args.vlm_refresh_frame_diff is not None else ""
+    modes += [
+        {
+            "name": f"dual_rate_n{n}{diff_suffix}",
+            "warm_start_strength": None,
+            "num_ddim_steps": args.num_ddim_steps,
+            "vlm_refresh_interval": n,
+            "vlm_refresh_frame_diff": args.vlm_refresh_frame_diff,
+        }
+        for n in args.vlm_refresh_intervals
+    ]
+    modes += [
+        {
+            "name": f"token_budget{k}",
+            "warm_start_strength": None,
+            "num_ddim_steps": args.num_ddim_steps,
+            "visual_token_budget": k,
+        }
+        for k in args.visual_token_budgets
+    ]
+
+    results = []
+    for mode in modes:
+        mode_args = argparse.Namespace(**{**vars(args), "num_ddim_steps": mode["num_ddim_steps"]})
+        result = replay_mode(vla, dataset, trajectory_ids, mode, mode_args)
+        print(json.dumps(result))
+        results.append(result)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main(build_argparser().parse_args())
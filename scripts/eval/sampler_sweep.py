@@ -0,0 +1,166 @@
+"""
+Few-step sampler sweep of the action diffusion head: DDIM vs multistep DPM-Solver++ at several step counts.
+
+Two parts:
+  - analytic: a Gaussian "action" distribution N(mu, s^2) whose exact noise prediction is known in closed form,
+    sampled through the repo's GaussianDiffusion schedule and samplers. The reference is the exact
+    probability-flow ODE solution of the same initial noise, so the error is the solver error alone.
+  - demo data (with --ckpt_path): predict_action on consecutive steps of demo episodes with every sampler and the
+    same initial noise, MSE of the normalized chunks against the recorded actions, and latency.
+
+Example:
+    python scripts/eval/sampler_sweep.py --ckpt_path results/Checkpoints/xxx/checkpoints/steps_20000_pytorch_model.pt
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+
+from InternVLA.model.modules.action_model import create_diffusion
+
+
+class GaussianEpsModel(torch.nn.Module):
+    """Exact noise prediction for x_0 ~ N(mu, s^2) (per dimension) under the diffusion schedule."""
+
+    def __init__(self, diffusion, mu: torch.Tensor, s: torch.Tensor):
+        super().__init__()
+        self.register_buffer("alphas", torch.from_numpy(diffusion.sqrt_alphas_cumprod))
+        self.register_buffer("sigmas", torch.from_numpy(diffusion.sqrt_one_minus_alphas_cumprod))
+        self.register_buffer("mu", mu)
+        self.register_buffer("s", s)
+
+    def forward(self, x, t):
+        alpha, sigma = self.alphas[t].view(-1, 1, 1), self.sigmas[t].view(-1, 1, 1)
+        pred_xstart = self.mu + alpha * self.s**2 / (alpha**2 * self.s**2 + sigma**2) * (x - alpha * self.mu)
+        return (x - alpha * pred_xstart) / sigma
+
+
+def sample(sampler: str, diffusion_steps: int, model_fn, noise: torch.Tensor, model_kwargs: dict) -> torch.Tensor:
+    """Sample with "ddim:<steps>" or "dpm_solver++:<steps>", as predict_action does."""
+    sampler_type, num_steps = sampler.split(":")
+    if sampler_type == "dpm_solver++":
+        diffusion = create_diffusion(
+            timestep_respacing="", diffusion_steps=diffusion_steps, sigma_small=True, learn_sigma=False
+        )
+        return diffusion.dpm_solver_sample_loop(
+            model_fn, noise.shape, noise, num_steps=int(num_steps), clip_denoised=False, model_kwargs=model_kwargs,
+            device=noise.device,
+        )
+    assert sampler_type == "ddim", f"Unknown sampler: {sampler}"
+    diffusion = create_diffusion(
+        timestep_respacing=f"ddim{num_steps}", diffusion_steps=diffusion_steps, sigma_small=True, learn_sigma=False
+    )
+    return diffusion.ddim_sample_loop(
+        model_fn, noise.shape, noise, clip_denoised=False, model_kwargs=model_kwargs, device=noise.device, eta=0.0
+    )
+
+
+def analytic_sweep(args) -> list[dict]:
+    generator = torch.Generator().manual_seed(args.seed)
+    shape = (args.analytic_samples, args.horizon, args.action_dim)
+    mu = torch.rand(shape[1:], generator=generator, dtype=torch.float64) * 1.6 - 0.8
+    s = torch.rand(shape[1:], generator=generator, dtype=torch.float64) * 0.48 + 0.02
+    noise = torch.randn(shape, generator=generator, dtype=torch.float64)
+    diffusion = create_diffusion(
+        timestep_respacing="", diffusion_steps=args.diffusion_steps, sigma_small=True, learn_sigma=False
+    )
+    model = GaussianEpsModel(diffusion, mu, s)
+    # the probability-flow ODE keeps the standardized value (x_t - alpha_t mu) / sqrt(alpha_t^2 s^2 + sigma_t^2)
+    alpha_T, sigma_T = diffusion.sqrt_alphas_cumprod[-1], diffusion.sqrt_one_minus_alphas_cumprod[-1]
+    reference = mu + s * (noise - alpha_T * mu) / torch.sqrt(alpha_T**2 * s**2 + sigma_T**2)
+    results = []
+    for sampler in args.samplers:
+        samples = sample(sampler, args.diffusion_steps, model, noise.clone(), {})
+        rmse = float(torch.sqrt(torch.mean((samples - reference) ** 2)))
+        results.append({"part": "analytic", "sampler": sampler, "rmse_vs_ode": rmse})
+    return results
+
+
+def demo_sweep(args) -> list[dict]:
+    from replay_episode_benchmark import iter_episode
+
+    from InternVLA.dataloader.gr00t_lerobot.mixtures import DATASET_NAMED_MIXTURES
+    from InternVLA.dataloader.lerobot_datasets import make_LeRobotSingleDataset
+    from InternVLA.model.framework.M1 import InternVLA_M1
+
+    vla = InternVLA_M1.from_pretrained(args.ckpt_path).to("cuda").eval()
+    d_name, _, robot_type = DATASET_NAMED_MIXTURES[args.data_mix][0]
+    dataset = make_LeRobotSingleDataset(Path(args.data_root_dir), d_name, robot_type)
+    dataset.set_transforms_metadata(dataset.metadata)
+    dataset.transforms.eval()
+    steps = [
+        step
+        for trajectory_id in dataset.trajectory_ids[: args.num_episodes]
+        for step in iter_episode(dataset, trajectory_id, args.max_steps_per_episode)
+    ]
+
+    results = []
+    for sampler in args.samplers:
+        sampler_type, num_steps = sampler.split(":")
+        mse, latencies = [], []
+        for index, (images, instruction, gt_action) in enumerate(steps):
+            torch.manual_seed(args.seed + index)  # same initial noise for every sampler
+            torch.cuda.synchronize()
+            start = time.perf_counter()
+            output = vla.predict_action(
+                batch_images=[images],
+                instructions=[instruction],
+                cfg_scale=args.cfg_scale,
+                use_ddim=True,
+                num_ddim_steps=int(num_steps),
+                sampler_type=sampler_type,
+            )
+            torch.cuda.synchronize()
+            latencies.append(time.perf_counter() - start)
+            chunk = output["normalized_actions"]
+            horizon = min(chunk.shape[1], gt_action.shape[0])
+            mse.append(float(np.mean((chunk[0, :horizon] - gt_action[:horizon]) ** 2)))
+        results.append(
+            {
+                "part": "demo",
+                "sampler": sampler,
+                "action_mse": float(np.mean(mse)),
+                "latency_ms": 1000 * float(np.mean(latencies)),
+                "num_calls": len(mse),
+            }
+        )
+    return results
+
+
+def build_argparser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--samplers", nargs="*", default=["ddim:10", "ddim:20", "dpm_solver++:3", "dpm_solver++:5", "dpm_solver++:8"]
+    )
+    parser.add_argument("--diffusion_steps", type=int, default=1000)
+    parser.add_argument("--analytic_samples", type=int, default=4096)
+    parser.add_argument("--horizon", type=int, default=16)
+    parser.add_argument("--action_dim", type=int, default=7)
+    parser.add_argument("--ckpt_path", type=str, default=None, help="also sweep predict_action on the demo data")
+    parser.add_argument("--data_root_dir", type=str, default="playground/demo_data")
+    parser.add_argument("--data_mix", type=str, default="demo_sim_pick_place")
+    parser.add_argument("--num_episodes", type=int, default=5)
+    parser.add_argument("--max_steps_per_episode", type=int, default=None)
+    parser.add_argument("--cfg_scale", type=float, default=1.5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=str, default=None, help="optional json file for the results")
+    return parser
+
+
+def main(args):
+    results = analytic_sweep(args)
+    if args.ckpt_path is not None:
+        results += demo_sweep(args)
+    for result in results:
+        print(json.dumps(result))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main(build_argparser().parse_args())
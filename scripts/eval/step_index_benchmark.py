@@ -0,0 +1,186 @@
+"""
+Step index benchmark on a synthetic dataset: pickled list of (trajectory_id, base_index) tuples + np.where lookups
+(previous) vs. StepIndex arrays (.npy, memory-mapped) + TrajectoryPositions lookups.
+
+For each variant it reports
+  - build_s: building the index from per-trajectory kept base indices
+  - save_s / load_s / file_mb: writing and re-loading the cache files
+  - lookup_us: one sample lookup, step -> (trajectory_id, base_index) -> trajectory position
+  - worker_private_mb: mean private memory per dataloader worker after each worker looked up its share of
+    --num_lookups random samples (pages shared with the main process are not counted)
+
+Example:
+    python scripts/eval/step_index_benchmark.py --num_steps 1000000 --num_workers 8
+"""
+
+import argparse
+import json
+import os
+import pickle
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from torch.utils.data import DataLoader, Dataset, get_worker_info
+
+from InternVLA.dataloader.gr00t_lerobot.step_index import StepIndex, TrajectoryPositions
+
+
+def private_memory_mb():
+    """Private (not shared with other processes) memory of the calling process, from /proc/self/smaps_rollup."""
+    memory = {}
+    with open("/proc/self/smaps_rollup", "r") as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) == 3 and fields[2] == "kB":
+                memory[fields[0].rstrip(":")] = int(fields[1]) / 1024
+    return memory["Private_Clean"] + memory["Private_Dirty"]
+
+
+class LegacyLookup:
+    def __init__(self, steps, trajectory_ids):
+        self.steps, self.trajectory_ids = steps, trajectory_ids
+
+    def __call__(self, index):
+        trajectory_id, base_index = self.steps[index]
+        return np.where(self.trajectory_ids == trajectory_id)[0][0], base_index
+
+
+class ArrayLookup:
+    def __init__(self, steps, trajectory_ids):
+        self.steps, self.positions = steps, TrajectoryPositions(trajectory_ids)
+
+    def __call__(self, index):
+        trajectory_id, base_index = self.steps[index]
+        return self.positions(trajectory_id), base_index
+
+
+class RandomLookups(Dataset):
+    """Sample i looks up a pseudo-random step; the batch carries the worker's private memory."""
+
+    def __init__(self, lookup, num_steps, num_lookups):
+        self.lookup, self.num_steps, self.num_lookups = lookup, num_steps, num_lookups
+
+    def __len__(self):
+        return self.num_lookups
+
+    def __getitem__(self, index):
+        return self.lookup((index * 2654435761) % self.num_steps)
+
+
+def collate_with_memory(batch):
+    worker = get_worker_info()
+    return worker.id, private_memory_mb()
+
+
+def synthetic_trajectories(num_steps, seed):
+    """Trajectory ids (with gaps, like filtered datasets) and kept base indices summing to about num_steps."""
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(200, 600, size=num_steps // 400 + 1)
+    lengths = lengths[: np.searchsorted(np.cumsum(lengths), num_steps) + 1]
+    trajectory_ids = np.sort(rng.choice(2 * len(lengths), size=len(lengths), replace=False))
+    return trajectory_ids, [np.arange(length, dtype=np.int32) for length in lengths]
+
+
+def measure(name, build, save, load, make_lookup, trajectory_ids, args):
+    start = time.perf_counter()
+    index = build()
+    build_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    paths = save(index)
+    save_s = time.perf_counter() - start
+    del index
+    start = time.perf_counter()
+    index = load()
+    load_s = time.perf_counter() - start
+
+    lookup = make_lookup(index, trajectory_ids)
+    rng = np.random.default_rng(args.seed)
+    samples = rng.integers(0, len(index), size=args.num_timed_lookups)
+    start = time.perf_counter()
+    for sample in samples:
+        lookup(int(sample))
+    lookup_us = 1e6 * (time.perf_counter() - start) / len(samples)
+
+    loader = DataLoader(
+        RandomLookups(lookup, len(index), args.num_lookups),
+        batch_size=args.num_lookups // (args.num_workers * 4),
+        num_workers=args.num_workers,
+        collate_fn=collate_with_memory,
+    )
+    worker_memory = {}
+    for worker_id, memory in loader:
+        worker_memory[worker_id] = memory
+    result = {
+        "index": name,
+        "num_steps": len(index),
+        "build_s": build_s,
+        "save_s": save_s,
+        "load_s": load_s,
+        "file_mb": sum(os.path.getsize(path) for path in paths) / 2**20,
+        "lookup_us": lookup_us,
+        "worker_private_mb": float(np.mean(list(worker_memory.values()))),
+    }
+    print(json.dumps(result))
+    return result
+
+
+def build_argparser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num_steps", type=int, default=1_000_000)
+    parser.add_argument("--num_workers", type=int, default=8)
+    parser.add_argument("--num_lookups", type=int, default=400_000, help="random lookups spread over the workers")
+    parser.add_argument("--num_timed_lookups", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=str, default=None, help="optional json file for the results")
+    return parser
+
+
+def main(args):
+    trajectory_ids, base_indices = synthetic_trajectories(args.num_steps, args.seed)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pkl_path = Path(tmp_dir) / "steps.pkl"
+        prefix = Path(tmp_dir) / "steps"
+
+        def build_legacy():
+            steps = []
+            for trajectory_id, indices in zip(trajectory_ids, base_indices):
+                for base_index in indices:
+                    steps.append((int(trajectory_id), int(base_index)))
+            return steps
+
+        def save_legacy(steps):
+            with open(pkl_path, "wb") as f:
+                pickle.dump({"config_key": "synthetic", "steps": steps}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            return [pkl_path]
+
+        def load_legacy():
+            with open(pkl_path, "rb") as f:
+                return pickle.load(f)["steps"]
+
+        def save_arrays(steps):
+            steps.save(prefix)
+            return list(StepIndex.paths(prefix))
+
+        results = [
+            measure("pickled_tuples", build_legacy, save_legacy, load_legacy, LegacyLookup, trajectory_ids, args),
+            measure(
+                "step_index_npy",
+                lambda: StepIndex.from_trajectories(trajectory_ids, base_indices),
+                save_arrays,
+                lambda: StepIndex.load(prefix),
+                ArrayLookup,
+                trajectory_ids,
+                args,
+            ),
+        ]
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main(build_argparser().parse_args())
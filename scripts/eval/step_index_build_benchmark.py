@@ -0,0 +1,199 @@
+"""
+Steps-index construction of LeRobotSingleDataset (delete_pause_frame): the former per-step Python loop vs. the
+vectorized pause detection (`get_moving_base_indices`), in one process and fanned out over processes per chunk of
+trajectories (`_get_all_steps_multi_process`).
+
+The index of every variant must be identical to the former loop, which is re-implemented here as the reference;
+this is checked on the demo dataset (with and without delete_pause_frame) and on a synthetic dataset of
+--num_episodes parquet episodes written to a temporary directory from the demo metadata. The synthetic episodes
+hold pauses, gripper toggles, NaN gripper values, delta positions at float32(EPSILON), empty language instructions
+and invalid task indices, next to a state column and a binary annotation column of --annotation_bytes per step
+(the demo episodes carry ~6 KB of bbox / trace annotations per step).
+
+For every variant it reports build_s and trajectories_per_s. The former loop reads whole parquet files, the new
+path only the language and action columns it needs.
+
+Example:
+    python scripts/eval/step_index_build_benchmark.py --num_episodes 10000 --num_processes 2 4 8
+"""
+
+import argparse
+import json
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+
+from InternVLA.dataloader.gr00t_lerobot.datasets import EPSILON
+from InternVLA.dataloader.gr00t_lerobot.step_index import StepIndex
+from InternVLA.dataloader.lerobot_datasets import make_LeRobotSingleDataset
+
+DEMO_DATASET = "playground/demo_data/sim_pick_place"
+
+
+def legacy_all_steps(dataset) -> StepIndex:
+    """The former `_get_all_steps_single_process` loop."""
+    kept_trajectory_ids, kept_base_indices = [], []
+    has_language_modality = 'language' in dataset.modality_keys and len(dataset.modality_keys['language']) > 0
+    for trajectory_id, trajectory_length in zip(dataset.trajectory_ids, dataset.trajectory_lengths):
+        data = dataset.get_trajectory_data(trajectory_id)
+        if has_language_modality:
+            dataset.curr_traj_data = data
+            try:
+                language_instruction = dataset.get_language(trajectory_id, dataset.modality_keys['language'][0], 0)
+                if not language_instruction or language_instruction[0] == "":
+                    continue
+            except Exception:
+                continue
+        if dataset.delete_pause_frame:
+            delta_position_values, gripper_values = dataset._get_position_and_gripper_values(data)
+            delta_position_values = np.asarray(delta_position_values).tolist()
+            gripper_values = np.asarray(gripper_values).tolist()
+            previous_gripper = gripper_values[0]
+            base_indices = []
+            for base_index in range(trajectory_length):
+                if base_index >= len(delta_position_values) or base_index >= len(gripper_values):
+                    break
+                has_translation_change = np.any(np.abs(delta_position_values[base_index]) > EPSILON)
+                previous = previous_gripper if base_index == 0 else gripper_values[base_index - 1]
+                has_gripper_change = gripper_values[base_index] != previous
+                if has_translation_change or has_gripper_change:
+                    base_indices.append(base_index)
+            base_indices = np.asarray(base_indices, dtype=np.int32)
+        else:
+            base_indices = np.arange(trajectory_length, dtype=np.int32)
+        kept_trajectory_ids.append(trajectory_id)
+        kept_base_indices.append(base_indices)
+    return StepIndex.from_trajectories(kept_trajectory_ids, kept_base_indices)
+
+
+def write_synthetic_dataset(target: Path, num_episodes: int, seed: int, annotation_bytes: int = 1024):
+    """Demo metadata, `num_episodes` random parquet episodes with the columns read by the steps index."""
+    rng = np.random.default_rng(seed)
+    meta = Path(DEMO_DATASET) / "meta"
+    (target / "meta").mkdir(parents=True)
+    for name in ["info.json", "modality.json", "stats.json", "stats_gr00t.json"]:
+        shutil.copy(meta / name, target / "meta" / name)
+    with open(meta / "tasks.jsonl", "r") as f:
+        tasks = [json.loads(line) for line in f]
+    tasks.append({"task_index": len(tasks), "task": ""})
+    with open(target / "meta" / "tasks.jsonl", "w") as f:
+        f.writelines(json.dumps(task) + "\n" for task in tasks)
+    with open(target / "meta" / "info.json", "r") as f:
+        info = json.load(f)
+
+    episodes = []
+    for episode_index in tqdm(range(num_episodes), desc="Writing synthetic episodes"):
+        length = int(rng.integers(20, 200))
+        delta_position = rng.normal(scale=2e-3, size=(length, 3))
+        # pauses: runs of (almost) zero motion
+        for _ in range(rng.integers(0, 4)):
+            start = rng.integers(length)
+            delta_position[start : start + rng.integers(1, 30)] = rng.normal(scale=1e-4, size=3)
+        delta_position[rng.random(length) < 0.02] = np.float32(EPSILON)
+        gripper = np.zeros(length)
+        for toggle in np.sort(rng.integers(length, size=rng.integers(0, 3))):
+            gripper[toggle:] = 1.0 - gripper[toggle]
+        if rng.random() < 0.01:
+            gripper[rng.integers(length)] = np.nan
+        task_index = rng.choice([int(rng.integers(len(tasks) - 1)), len(tasks) - 1, len(tasks)], p=[0.98, 0.01, 0.01])
+        episode_chunk = episode_index // info["chunks_size"]
+        path = target / info["data_path"].format(episode_chunk=episode_chunk, episode_index=episode_index)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        pd.DataFrame(
+            {
+                "action.delta_eef_position": list(delta_position.astype(np.float32)),
+                "action.gripper_close": list(gripper.astype(np.float32)[:, None]),
+                "timestamp": (np.arange(length) / info["fps"]).astype(np.float32),
+                "frame_index": np.arange(length),
+                "episode_index": np.full(length, episode_index),
+                "task_index": np.full(length, task_index),
+                "state.joints": list(rng.normal(size=(length, 7))),
+                "annotation.bbox3d": [rng.bytes(annotation_bytes) for _ in range(length)],
+            }
+        ).to_parquet(path)
+        episodes.append({"episode_index": episode_index, "tasks": [], "length": length})
+    with open(target / "meta" / "episodes.jsonl", "w") as f:
+        f.writelines(json.dumps(episode) + "\n" for episode in episodes)
+
+
+def build_argparser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num_episodes", type=int, default=10_000)
+    parser.add_argument("--num_processes", nargs="*", type=int, default=[2, 4, 8])
+    parser.add_argument("--annotation_bytes", type=int, default=1024, help="synthetic annotation bytes per step")
+    parser.add_argument("--robot_type", type=str, default="demo_sim_franka_delta_joints")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=str, default=None, help="optional json file for the results")
+    return parser
+
+
+def assert_identical(steps: StepIndex, expected: StepIndex, name: str):
+    assert np.array_equal(steps.trajectory_ids, expected.trajectory_ids), f"{name}: trajectory ids differ"
+    assert np.array_equal(steps.base_indices, expected.base_indices), f"{name}: base indices differ"
+    assert steps.base_indices.dtype == expected.base_indices.dtype, f"{name}: {steps.base_indices.dtype=}"
+
+
+def main(args):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # demo dataset, in a scratch copy so that no cached index is written next to it
+        demo_copy = Path(tmp_dir) / "demo" / Path(DEMO_DATASET).name
+        shutil.copytree(DEMO_DATASET, demo_copy, ignore=shutil.ignore_patterns("videos", "steps_*", "keyframe_index"))
+        for delete_pause_frame in [False, True]:
+            dataset = make_LeRobotSingleDataset(
+                demo_copy.parent,
+                demo_copy.name,
+                args.robot_type,
+                delete_pause_frame=delete_pause_frame,
+                trajectory_cache_mb=0,
+            )
+            expected = legacy_all_steps(dataset)
+            assert_identical(dataset._get_all_steps_single_process(), expected, "demo single process")
+            assert_identical(dataset._get_all_steps_multi_process(2, num_chunks=3), expected, "demo multi process")
+        print(json.dumps({"dataset": "demo", "identical": True}))
+
+        synthetic = Path(tmp_dir) / "synthetic" / "synthetic_pick_place"
+        write_synthetic_dataset(synthetic, args.num_episodes, args.seed, args.annotation_bytes)
+        dataset = make_LeRobotSingleDataset(
+            synthetic.parent, synthetic.name, args.robot_type, delete_pause_frame=True, trajectory_cache_mb=0
+        )
+        variants = [
+            ("legacy_loop", lambda: legacy_all_steps(dataset)),
+            ("vectorized", dataset._get_all_steps_single_process),
+        ]
+        variants += [
+            (f"vectorized_{n}_processes", lambda n=n: dataset._get_all_steps_multi_process(n))
+            for n in args.num_processes
+        ]
+        expected = None
+        for name, build in variants:
+            start = time.perf_counter()
+            steps = build()
+            build_s = time.perf_counter() - start
+            if expected is None:
+                expected = steps
+            assert_identical(steps, expected, name)
+            result = {
+                "dataset": f"synthetic_{args.num_episodes}",
+                "variant": name,
+                "build_s": build_s,
+                "trajectories_per_s": len(dataset.trajectory_ids) / build_s,
+                "steps": len(steps),
+                "kept_trajectories": len(np.unique(steps.trajectory_ids)),
+                "identical": True,
+            }
+            print(json.dumps(result))
+            results.append(result)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main(build_argparser().parse_args())
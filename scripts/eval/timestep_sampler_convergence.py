@@ -0,0 +1,191 @@
+"""
+Convergence of diffusion training timestep samplers: uniform vs loss-aware ("loss-second-moment").
+
+Trains a tiny DiT action head on CPU on the demo dataset (action chunks conditioned on the robot state only, read
+straight from the parquet files; no VLM / video decoding; the tail of every episode is held out) once per sampler
+with identical seeds, and reports the held-out action MSE (DDIM sampling, normalized actions) against training steps,
+plus the first step at which each run reaches the uniform run's final held-out MSE.
+
+Example:
+    python scripts/eval/timestep_sampler_convergence.py --data_dir playground/demo_data/sim_pick_place \
+        --max_steps 1500 --eval_interval 100
+"""
+
+import argparse
+import glob
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import torch
+from torch import nn
+
+from InternVLA.model.modules.action_model.DiTActionHeader import ActionModel
+from InternVLA.model.modules.action_model.DiT_modules.models import DiT
+
+STATE_KEYS = ["state.joints"]
+ACTION_KEYS = ["action.delta_joints", "action.gripper_close"]  # demo_sim_franka_delta_joints
+
+
+def load_windows(files, chunk_size, heldout_fraction):
+    """
+    (state [N, S], action chunk [N, chunk_size, A]) for every step, padding chunks with the last action.
+    The last `heldout_fraction` of every episode is held out (the demo set has too few episodes for an
+    episode-level split); chunks of training steps never reach into it.
+    """
+    splits = {"train": ([], []), "heldout": ([], [])}
+    for path in files:
+        df = pd.read_parquet(path, columns=STATE_KEYS + ACTION_KEYS)
+        state = np.concatenate([np.stack(df[key].to_numpy()) for key in STATE_KEYS], axis=1)
+        action = np.concatenate([np.stack(df[key].to_numpy()) for key in ACTION_KEYS], axis=1)
+        split = int(len(df) * (1 - heldout_fraction))
+        for name, (start, end) in {"train": (0, split), "heldout": (split, len(df))}.items():
+            index = np.minimum(np.arange(start, end)[:, None] + np.arange(chunk_size)[None], end - 1)
+            splits[name][0].append(state[start:end])
+            splits[name][1].append(action[index])
+    return {
+        name: (np.concatenate(states).astype(np.float32), np.concatenate(chunks).astype(np.float32))
+        for name, (states, chunks) in splits.items()
+    }
+
+
+class StateConditionedHead(nn.Module):
+    """state -> condition tokens -> diffusion action head"""
+
+    def __init__(self, state_dim, action_dim, chunk_size, schedule_sampler, num_tokens=4, token_size=64):
+        super().__init__()
+        self.num_tokens, self.token_size = num_tokens, token_size
+        self.encoder = nn.Sequential(nn.Linear(state_dim, 256), nn.GELU(), nn.Linear(256, num_tokens * token_size))
+        self.action_model = ActionModel(
+            action_hidden_dim=token_size,
+            model_type="DiT-S",
+            in_channels=action_dim,
+            future_action_window_size=chunk_size - 1,
+            past_action_window_size=0,
+            schedule_sampler=schedule_sampler,
+        )
+        # tiny backbone for CPU experiments, built directly instead of registering a DiT_models preset
+        self.action_model.net = DiT(
+            depth=2,
+            hidden_size=128,
+            num_heads=4,
+            token_size=token_size,
+            n_conditon_token=num_tokens,
+            in_channels=action_dim,
+            class_dropout_prob=0.1,
+            learn_sigma=False,
+            future_action_window_size=chunk_size - 1,
+            past_action_window_size=0,
+        )
+
+    def condition(self, state):
+        return self.encoder(state).view(-1, self.num_tokens, self.token_size)
+
+    def training_loss(self, state, actions):
+        noise_pred, noise, timestep = self.action_model(actions, self.condition(state))
+        return self.action_model.loss(noise_pred, noise, timestep)
+
+    @torch.no_grad()
+    def sample(self, state, num_ddim_steps):
+        if self.action_model.ddim_diffusion is None:
+            self.action_model.create_ddim(ddim_step=num_ddim_steps)
+        z = self.condition(state)
+        noise = torch.randn(
+            state.shape[0], self.action_model.future_action_window_size + 1, self.action_model.in_channels
+        )
+        return self.action_model.ddim_diffusion.ddim_sample_loop(
+            self.action_model.net.forward,
+            noise.shape,
+            noise,
+            clip_denoised=False,
+            model_kwargs=dict(z=z),
+            progress=False,
+            device=z.device,
+            eta=0.0,
+        )
+
+
+def train(schedule_sampler, data, args):
+    torch.manual_seed(args.seed)
+    np.random.seed(args.seed)
+    (train_state, train_action), (eval_state, eval_action) = data
+    model = StateConditionedHead(train_state.shape[1], train_action.shape[2], args.chunk_size, schedule_sampler)
+    optimizer = torch.optim.AdamW(model.parameters(), lr=args.lr)
+    generator = torch.Generator().manual_seed(args.seed)
+    curve = []
+    for step in range(1, args.max_steps + 1):
+        index = torch.randint(0, len(train_state), (args.batch_size,), generator=generator)
+        loss = model.training_loss(train_state[index], train_action[index])
+        optimizer.zero_grad()
+        loss.backward()
+        optimizer.step()
+        if step % args.eval_interval == 0:
+            model.eval()
+            torch.manual_seed(args.seed + step)
+            mse = float(((model.sample(eval_state, args.num_ddim_steps) - eval_action) ** 2).mean())
+            model.train()
+            curve.append({"step": step, "heldout_mse": mse, "train_loss": loss.item()})
+            print(json.dumps({"sampler": schedule_sampler, **curve[-1]}))
+    return curve
+
+
+def build_argparser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data_dir", type=str, default="playground/demo_data/sim_pick_place")
+    parser.add_argument("--heldout_fraction", type=float, default=0.2, help="tail of every episode held out")
+    parser.add_argument("--num_eval_windows", type=int, default=128)
+    parser.add_argument("--chunk_size", type=int, default=16)
+    parser.add_argument("--batch_size", type=int, default=64)
+    parser.add_argument("--lr", type=float, default=1e-3)
+    parser.add_argument("--max_steps", type=int, default=1500)
+    parser.add_argument("--eval_interval", type=int, default=100)
+    parser.add_argument("--num_ddim_steps", type=int, default=10)
+    parser.add_argument("--samplers", nargs="*", default=["uniform", "loss-second-moment"])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=str, default=None, help="optional json file for the curves")
+    return parser
+
+
+def main(args):
+    torch.set_num_threads(min(8, os.cpu_count()))
+    files = sorted(glob.glob(os.path.join(args.data_dir, "data", "chunk-*", "*.parquet")))
+    windows = load_windows(files, args.chunk_size, args.heldout_fraction)
+    (train_state, train_action), (eval_state, eval_action) = windows["train"], windows["heldout"]
+
+    # normalize with training statistics
+    state_mean, state_std = train_state.mean(0), train_state.std(0) + 1e-6
+    action_mean, action_std = train_action.mean((0, 1)), train_action.std((0, 1)) + 1e-6
+    eval_index = np.linspace(0, len(eval_state) - 1, args.num_eval_windows).astype(int)
+    data = (
+        (
+            torch.from_numpy((train_state - state_mean) / state_std),
+            torch.from_numpy((train_action - action_mean) / action_std),
+        ),
+        (
+            torch.from_numpy((eval_state[eval_index] - state_mean) / state_std),
+            torch.from_numpy((eval_action[eval_index] - action_mean) / action_std),
+        ),
+    )
+
+    curves = {sampler: train(sampler, data, args) for sampler in args.samplers}
+
+    # first step reaching the final held-out MSE of the first (reference) sampler
+    target = curves[args.samplers[0]][-1]["heldout_mse"]
+    summary = {}
+    for sampler, curve in curves.items():
+        reached = [point["step"] for point in curve if point["heldout_mse"] <= target]
+        summary[sampler] = {
+            "final_heldout_mse": curve[-1]["heldout_mse"],
+            "best_heldout_mse": min(point["heldout_mse"] for point in curve),
+            f"steps_to_{args.samplers[0]}_final": reached[0] if reached else None,
+        }
+    print(json.dumps(summary, indent=2))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"curves": curves, "summary": summary}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main(build_argparser().parse_args())
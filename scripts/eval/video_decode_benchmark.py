@@ -0,0 +1,139 @@
+"""
+Video decode throughput per backend, re-opening the video on every sample (previous behaviour, --pool_size 0)
+vs. the per-worker VideoReaderPool (open readers and frame timestamps kept across samples).
+
+Every sample picks a random video and a random window of --frames_per_sample consecutive frame timestamps,
+like the dataloader does for one camera of one step, and decodes it through `get_frames_by_timestamps`.
+With --run_lengths > 1, runs of that many consecutive samples read the same video (trajectory-local sampling).
+For every backend / run length / worker count / pool size it reports frames_per_s over a torch DataLoader.
+
+Before timing, the frames of a few samples are decoded with and without the pool and compared, and the binary
+search timestamp -> frame mapping is checked against the previous argmin.
+
+Example:
+    python scripts/eval/video_decode_benchmark.py --backends decord opencv torchvision_av --num_workers 1 4 8
+"""
+
+import argparse
+import glob
+import json
+import time
+
+import av
+import numpy as np
+from torch.utils.data import DataLoader, Dataset
+
+from InternVLA.dataloader.gr00t_lerobot.video import get_frames_by_timestamps, nearest_frame_indices
+
+DEMO_VIDEOS = "playground/demo_data/sim_pick_place/videos/chunk-*/*/episode_*.mp4"
+
+
+def video_timestamps(video_path):
+    """Nominal frame timestamps (frame index / fps), like the `timestamp` column of LeRobot episodes."""
+    with av.open(video_path) as container:
+        stream = container.streams.video[0]
+        return np.arange(stream.frames) / float(stream.average_rate)
+
+
+class DecodeSamples(Dataset):
+    def __init__(self, videos, num_samples, frames_per_sample, backend, pool_size, seed, run_length=1):
+        rng = np.random.default_rng(seed)
+        self.samples = []
+        for i in range(num_samples):
+            if i % run_length == 0:
+                video_path, timestamps = videos[rng.integers(len(videos))]
+            start = rng.integers(len(timestamps) - frames_per_sample + 1)
+            self.samples.append((video_path, timestamps[start : start + frames_per_sample].astype(np.float32)))
+        self.backend, self.pool_size = backend, pool_size
+
+    def __len__(self):
+        return len(self.samples)
+
+    def __getitem__(self, index):
+        video_path, timestamps = self.samples[index]
+        frames = get_frames_by_timestamps(video_path, timestamps, self.backend, max_open_readers=self.pool_size)
+        return len(frames)
+
+
+def check_parity(videos, backend, args):
+    """Max abs pixel difference between pooled and re-opened decoding of the same samples."""
+    samples = DecodeSamples(videos, args.num_parity_samples, args.frames_per_sample, backend, 0, args.seed + 1).samples
+    max_diff = 0
+    for pool_size in [0, args.pool_size]:
+        decoded = [get_frames_by_timestamps(path, ts, backend, max_open_readers=pool_size) for path, ts in samples]
+        if pool_size == 0:
+            reference = decoded
+        else:
+            for frames, expected in zip(decoded, reference):
+                assert frames.shape == expected.shape, f"{frames.shape=} != {expected.shape=}"
+                max_diff = max(max_diff, int(np.abs(frames.astype(np.int32) - expected).max()))
+    return max_diff
+
+
+def build_argparser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--video_paths", nargs="*", type=str, default=None, help=f"defaults to {DEMO_VIDEOS}")
+    parser.add_argument("--backends", nargs="*", type=str, default=["decord", "opencv", "torchvision_av"])
+    parser.add_argument("--num_workers", nargs="*", type=int, default=[1, 4, 8])
+    parser.add_argument("--pool_size", type=int, default=8)
+    parser.add_argument("--num_samples", type=int, default=400)
+    parser.add_argument("--frames_per_sample", type=int, default=1)
+    parser.add_argument("--run_lengths", nargs="*", type=int, default=[1, 25], help="consecutive samples per video")
+    parser.add_argument("--num_parity_samples", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=str, default=None, help="optional json file for the results")
+    return parser
+
+
+def main(args):
+    video_paths = args.video_paths or sorted(glob.glob(DEMO_VIDEOS))
+    assert video_paths, "no videos found"
+    videos = [(path, video_timestamps(path)) for path in video_paths]
+
+    # binary search vs. the previous O(frames x timestamps) argmin
+    rng = np.random.default_rng(args.seed)
+    for _, frame_ts in videos:
+        queries = rng.uniform(-0.1, frame_ts[-1] + 0.1, size=1000).astype(np.float32)
+        queries[:10] = frame_ts[:10].astype(np.float32)
+        expected = np.abs(frame_ts[:, None].astype(np.float32) - queries).argmin(axis=0)
+        assert np.array_equal(nearest_frame_indices(frame_ts.astype(np.float32), queries), expected)
+
+    results = []
+    for backend in args.backends:
+        try:
+            get_frames_by_timestamps(videos[0][0], videos[0][1][:1], backend, max_open_readers=0)
+        except Exception as e:
+            result = {"backend": backend, "skipped": f"{type(e).__name__}: {e}"}
+            print(json.dumps(result))
+            results.append(result)
+            continue
+        max_abs_diff = check_parity(videos, backend, args)
+        for run_length in args.run_lengths:
+            for num_workers in args.num_workers:
+                for pool_size in [0, args.pool_size]:
+                    samples = DecodeSamples(
+                        videos, args.num_samples, args.frames_per_sample, backend, pool_size, args.seed, run_length
+                    )
+                    # contiguous sample ranges per worker, so that runs are not split over the workers
+                    loader = DataLoader(samples, batch_size=run_length, num_workers=num_workers, collate_fn=sum)
+                    start = time.perf_counter()
+                    num_frames = sum(loader)
+                    elapsed = time.perf_counter() - start
+                    result = {
+                        "backend": backend,
+                        "run_length": run_length,
+                        "num_workers": num_workers,
+                        "pool_size": pool_size,
+                        "frames_per_s": num_frames / elapsed,
+                        "parity_max_abs_diff": max_abs_diff,
+                    }
+                    print(json.dumps(result))
+                    results.append(result)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main(build_argparser().parse_args())